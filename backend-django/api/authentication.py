@@ -0,0 +1,75 @@
+"""
+JWT Authentication - versioned, revocable tokens with cached users
+
+Tokens carry the user's token_version as `ver`. Requests are authenticated
+without a database query: the jti is checked against the in-memory
+denylist and the user comes from services.revocation's cache.
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .services import revocation
+
+
+VERSION_CLAIM = 'ver'
+
+
+class RevocableTokenMixin:
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        if revocation.is_revoked(self.get(api_settings.JTI_CLAIM)):
+            raise TokenError(_('Token is revoked'))
+
+    def blacklist(self):
+        revocation.revoke(self)
+
+
+class VersionedAccessToken(RevocableTokenMixin, AccessToken):
+    pass
+
+
+class VersionedRefreshToken(RevocableTokenMixin, RefreshToken):
+    access_token_class = VersionedAccessToken
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[VERSION_CLAIM] = user.token_version
+        return token
+
+
+def token_user(token):
+    """Active user for a token's claims, or raise AuthenticationFailed"""
+    try:
+        user_id = int(token[api_settings.USER_ID_CLAIM])
+    except (KeyError, ValueError):
+        raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    user = revocation.get_user(user_id, token.get(VERSION_CLAIM, 0))
+    if user is None:
+        raise AuthenticationFailed(_('Token is revoked'), code='token_revoked')
+    if not user.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves users from the cache"""
+
+    def get_user(self, validated_token):
+        return token_user(validated_token)
+
+
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses revoked or outdated refresh tokens; rotated ones are denylisted"""
+    token_class = VersionedRefreshToken
+
+    def validate(self, attrs):
+        token_user(self.token_class(attrs['refresh']))
+        return super().validate(attrs)
@@ -0,0 +1,39 @@
+"""
+Stock checkpoints and ledger consistency
+
+    python manage.py checkpoint_stock                 # nightly: write checkpoints
+    python manage.py checkpoint_stock --check         # report current_stock vs ledger drift
+    python manage.py checkpoint_stock --check --fix   # record reconciling adjustments
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from ...services import stock_ledger
+
+
+class Command(BaseCommand):
+    help = 'Write per-item stock checkpoints or check the movement ledger for drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lag-minutes', type=int, default=5,
+                            help='Checkpoint this far behind now to skip in-flight movements')
+        parser.add_argument('--check', action='store_true')
+        parser.add_argument('--fix', action='store_true',
+                            help='With --check, add adjustment movements so the ledger matches')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            count, taken_at = stock_ledger.create_checkpoints(timedelta(minutes=options['lag_minutes']))
+            self.stdout.write(self.style.SUCCESS(f"Wrote {count} checkpoints as of {taken_at:%Y-%m-%d %H:%M:%S}"))
+            return
+
+        drift = stock_ledger.find_drift()
+        for row in drift:
+            self.stdout.write(
+                f"{row['sku']}: current_stock {row['current_stock']}, ledger {row['ledger_stock']}"
+            )
+        if drift and options['fix']:
+            stock_ledger.fix_drift(drift, performed_by='Ledger check')
+            self.stdout.write(f"Recorded {len(drift)} reconciling adjustments")
+        self.stdout.write(self.style.SUCCESS(f"{len(drift)} items drifted from the ledger"))
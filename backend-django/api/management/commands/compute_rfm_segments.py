@@ -0,0 +1,20 @@
+"""
+Nightly RFM segmentation of customers
+
+    python manage.py compute_rfm_segments
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...services import rfm
+
+
+class Command(BaseCommand):
+    help = 'Score every customer on recency, frequency and spend and store their segment'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        customers = rfm.compute()
+        self.stdout.write(f"Segmented {customers} customers in {time.monotonic() - started:.1f}s")
+        self.stdout.write(self.style.SUCCESS('Done'))
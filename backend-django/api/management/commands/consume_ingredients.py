@@ -0,0 +1,51 @@
+"""
+Ingredient consumption from confirmed orders
+
+    python manage.py consume_ingredients                      # consume every pending order
+    python manage.py consume_ingredients --since 2024-01-01   # ignore older orders
+    python manage.py consume_ingredients --forecast           # print days until each ingredient runs out
+"""
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...services import bom
+
+
+class Command(BaseCommand):
+    help = 'Deduct ingredient stock for confirmed orders via the fragrance bill of materials'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--since', help='Only consume orders placed on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--forecast', action='store_true')
+        parser.add_argument('--days', type=int, default=30, help='Forecast demand window')
+
+    def handle(self, *args, **options):
+        if options['forecast']:
+            for row in bom.forecast(options['days']):
+                days_left = '-' if row['days_left'] is None else f"{row['days_left']} days"
+                self.stdout.write(
+                    f"{row['name']}: {row['stock_quantity']} {row['unit']}, "
+                    f"{row['daily_usage']} {row['unit']}/day, {days_left}"
+                )
+            return
+
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since must be YYYY-MM-DD')
+            since = timezone.make_aware(datetime.combine(since, time.min))
+
+        matrix = bom.BillOfMaterials()
+        total = 0
+        while True:
+            count = bom.consume_batch(options['batch_size'], since=since, bom=matrix)
+            if not count:
+                break
+            total += count
+            self.stdout.write(f"Consumed {count} orders")
+        self.stdout.write(self.style.SUCCESS(f"Consumed ingredients for {total} orders"))
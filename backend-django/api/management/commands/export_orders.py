@@ -0,0 +1,60 @@
+"""
+Order export to a file, using the same stream as /orders/admin/export/
+
+    python manage.py export_orders --output csv --from 2026-01-01 --path orders.csv
+    python manage.py export_orders --output jsonl --path /dev/null   # benchmark
+
+Reports rows/second on completion; the export is expected to sustain at
+least TARGET_ROWS_PER_SECOND on a warm database.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from ...models import Order
+from ...services.order_export import iter_order_rows, EXPORT_FORMATS
+
+
+TARGET_ROWS_PER_SECOND = 50000
+
+
+class Command(BaseCommand):
+    help = 'Stream orders to a CSV/JSONL file and report throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--from', dest='date_from')
+        parser.add_argument('--to', dest='date_to')
+        parser.add_argument('--status', nargs='*', choices=list(dict(Order.STATUS_CHOICES)))
+        parser.add_argument('--path', required=True)
+
+    def handle(self, *args, **options):
+        dates = []
+        for key in ('date_from', 'date_to'):
+            value = options[key]
+            parsed = parse_date(value) if value else None
+            if value and parsed is None:
+                raise CommandError(f"{value} is not a YYYY-MM-DD date")
+            dates.append(parsed)
+
+        rows = 0
+
+        def counted(chunks):
+            nonlocal rows
+            for chunk in chunks:
+                rows += len(chunk)
+                yield chunk
+
+        writer, _ = EXPORT_FORMATS[options['output']]
+        started = time.monotonic()
+        with open(options['path'], 'w', newline='') as handle:
+            for piece in writer(counted(iter_order_rows(*dates, options['status']))):
+                handle.write(piece)
+        elapsed = max(time.monotonic() - started, 1e-9)
+
+        rate = rows / elapsed
+        style = self.style.SUCCESS if rate >= TARGET_ROWS_PER_SECOND or rows < TARGET_ROWS_PER_SECOND else self.style.WARNING
+        self.stdout.write(style(
+            f"{rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s, target {TARGET_ROWS_PER_SECOND:,})"
+        ))
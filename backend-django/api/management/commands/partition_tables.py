@@ -0,0 +1,275 @@
+"""
+Monthly range partitioning for append-heavy tables
+
+    python manage.py partition_tables convert            # one-off conversion
+    python manage.py partition_tables ensure --months 3  # run daily (cron)
+    python manage.py partition_tables detach --before 2025-01
+    python manage.py partition_tables status
+
+Partitions are named <table>_pYYYYMM and bounded on created_at at month
+starts in settings.TIME_ZONE. A <table>_default partition catches rows
+outside the pre-created range; `ensure` moves any rows it caught for a
+month into that month's partition when creating it.
+
+Every index of the original table (Meta.indexes, foreign key and unique
+indexes) is recreated on the partitioned table under its original name.
+Postgres requires every unique constraint on a partitioned table to include
+the partition key, so after conversion:
+  - the primary key becomes (id, created_at)
+  - orders.order_number is indexed but no longer unique in the database
+  - foreign keys pointing at a converted table (e.g. payments.order_id,
+    order_items.order_id) are dropped; Django still enforces on_delete
+"""
+import re
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+
+PARTITIONED_TABLES = ['orders', 'order_items', 'stock_movements']
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=timezone.get_current_timezone())
+
+
+def partition_name(table, month):
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+        [table]
+    )
+    return cursor.fetchone() is not None
+
+
+def list_partitions(cursor, table):
+    """[(partition name, estimated rows), ...]"""
+    cursor.execute(
+        """
+        SELECT child.relname, child.reltuples::bigint
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(%s)
+        ORDER BY child.relname
+        """,
+        [table]
+    )
+    return cursor.fetchall()
+
+
+def create_partition(cursor, table, month):
+    """
+    Create the partition for `month` unless it exists. Rows the default
+    partition already holds for that month are moved into it first, since
+    Postgres refuses a new partition that would overlap them.
+    """
+    name = partition_name(table, month)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return 0
+
+    bounds = [month_bound(month), month_bound(add_months(month, 1))]
+    default = f"{table}_default"
+    cursor.execute("SELECT to_regclass(%s)", [default])
+    if cursor.fetchone()[0] is None:
+        cursor.execute(
+            f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+            bounds
+        )
+        return 0
+
+    cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+        """,
+        bounds
+    )
+    moved = cursor.rowcount
+    cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+    return moved
+
+
+def copy_indexes(cursor, source, target):
+    """
+    Recreate `source`'s indexes on `target` under their original names; the
+    source's own indexes are renamed out of the way. Unique indexes become
+    plain ones unless they include created_at (the partition key).
+    """
+    cursor.execute(
+        """
+        SELECT i.indexrelid, c.relname, pg_get_indexdef(i.indexrelid), i.indisunique
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = to_regclass(%s) AND NOT i.indisprimary
+        ORDER BY c.relname
+        """,
+        [source]
+    )
+    indexes = cursor.fetchall()
+    on_source = re.compile(rf' ON (ONLY )?(\S+\.)?{source} ')
+    for oid, name, definition, unique in indexes:
+        cursor.execute(f"ALTER INDEX {name} RENAME TO {source}_{oid}_idx")
+        definition = on_source.sub(f' ON {target} ', definition, count=1)
+        if unique and 'created_at' not in definition:
+            definition = definition.replace('CREATE UNIQUE INDEX', 'CREATE INDEX', 1)
+        cursor.execute(definition)
+    return [name for _, name, _, _ in indexes]
+
+
+class Command(BaseCommand):
+    help = 'Convert, extend and archive monthly partitions of orders, order_items and stock_movements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['convert', 'ensure', 'detach', 'status'])
+        parser.add_argument('--tables', nargs='+', choices=PARTITIONED_TABLES,
+                            default=PARTITIONED_TABLES)
+        parser.add_argument('--months', type=int, default=3,
+                            help='Months to create ahead of the current one')
+        parser.add_argument('--before', help='Detach partitions older than this month (YYYY-MM)')
+        parser.add_argument('--archive-schema', default='archive')
+        parser.add_argument('--drop-legacy', action='store_true',
+                            help='Drop the original table after conversion')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning requires PostgreSQL')
+
+        self.current_month = timezone.localdate().replace(day=1)
+        handler = getattr(self, f"handle_{options['action']}")
+        for table in options['tables']:
+            handler(table, options)
+
+    def handle_convert(self, table, options):
+        legacy = f"{table}_legacy"
+        with transaction.atomic(), connection.cursor() as cursor:
+            if is_partitioned(cursor, table):
+                self.stdout.write(f"{table}: already partitioned")
+                return
+
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+
+            # Incoming FKs cannot reference a key without created_at
+            cursor.execute(
+                """
+                SELECT conrelid::regclass::text, conname FROM pg_constraint
+                WHERE contype = 'f' AND confrelid = to_regclass(%s)
+                """,
+                [legacy]
+            )
+            for referencing, name in cursor.fetchall():
+                cursor.execute(f"ALTER TABLE {referencing} DROP CONSTRAINT {name}")
+                self.stdout.write(f"{table}: dropped {referencing}.{name}")
+
+            cursor.execute(
+                """
+                SELECT conname, pg_get_constraintdef(oid), confrelid::regclass::text
+                FROM pg_constraint
+                WHERE contype = 'f' AND conrelid = to_regclass(%s)
+                """,
+                [legacy]
+            )
+            outgoing = cursor.fetchall()
+
+            cursor.execute(
+                f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS "
+                f"INCLUDING IDENTITY INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+                f"PARTITION BY RANGE (created_at)"
+            )
+            cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)")
+
+            # SERIAL columns keep using the legacy sequence; move its ownership
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+            sequence = cursor.fetchone()[0]
+            if sequence is None:
+                cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [legacy])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+            cursor.execute(f"SELECT MIN(created_at) FROM {legacy}")
+            oldest = cursor.fetchone()[0]
+            month = timezone.localtime(oldest).date().replace(day=1) if oldest else self.current_month
+            last = add_months(self.current_month, options['months'])
+            while month <= last:
+                create_partition(cursor, table, month)
+                month = add_months(month, 1)
+            cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+            cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+            copied = cursor.rowcount
+            indexes = copy_indexes(cursor, legacy, table)
+            cursor.execute(
+                f"SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)",
+                [sequence]
+            )
+
+            for name, definition, target in outgoing:
+                if is_partitioned(cursor, target):
+                    continue
+                cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+            if options['drop_legacy']:
+                cursor.execute(f"DROP TABLE {legacy}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{table}: partitioned, {copied} rows and {len(indexes)} indexes copied"
+        ))
+
+    def handle_ensure(self, table, options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not is_partitioned(cursor, table):
+                raise CommandError(f"{table} is not partitioned; run convert first")
+            for offset in range(options['months'] + 1):
+                month = add_months(self.current_month, offset)
+                moved = create_partition(cursor, table, month)
+                if moved:
+                    self.stdout.write(f"{table}: moved {moved} rows from {table}_default "
+                                      f"to {partition_name(table, month)}")
+        self.stdout.write(f"{table}: partitions ensured through "
+                          f"{add_months(self.current_month, options['months']):%Y-%m}")
+
+    def handle_detach(self, table, options):
+        if not options['before']:
+            raise CommandError('--before YYYY-MM is required')
+        try:
+            cutoff = datetime.strptime(options['before'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError('--before must be YYYY-MM')
+        schema = options['archive_schema']
+
+        with connection.cursor() as cursor:
+            partitions = list_partitions(cursor, table)
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+
+        prefix = f"{table}_p"
+        for name, _ in partitions:
+            if not name.startswith(prefix):
+                continue
+            month = datetime.strptime(name[len(prefix):], '%Y%m').date()
+            if month >= cutoff:
+                continue
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                cursor.execute(f"ALTER TABLE {name} SET SCHEMA {schema}")
+            self.stdout.write(f"{table}: moved {name} to {schema}")
+
+    def handle_status(self, table, options):
+        with connection.cursor() as cursor:
+            if not is_partitioned(cursor, table):
+                self.stdout.write(f"{table}: not partitioned")
+                return
+            for name, estimate in list_partitions(cursor, table):
+                self.stdout.write(f"{table}: {name} (~{max(estimate, 0)} rows)")
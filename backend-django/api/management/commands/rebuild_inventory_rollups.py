@@ -0,0 +1,19 @@
+"""
+Recompute inventory rollups from the Inventory table
+
+    python manage.py rebuild_inventory_rollups
+
+The stats endpoint seeds the rollups on first use; run this after bulk
+imports or direct SQL edits that bypass the API.
+"""
+from django.core.management.base import BaseCommand
+
+from ...services import inventory_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-location and per-size inventory rollups'
+
+    def handle(self, *args, **options):
+        rows = inventory_rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(rows)} inventory rollup rows"))
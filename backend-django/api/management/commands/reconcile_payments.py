@@ -0,0 +1,63 @@
+"""
+Daily payment reconciliation against a gateway settlement file
+
+    python manage.py reconcile_payments settlement-2026-10-17.csv --report mismatches.csv
+    python manage.py reconcile_payments settlement-2026-10-17.csv --apply
+"""
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services import reconciliation
+
+
+class Command(BaseCommand):
+    help = 'Reconcile Payment rows against a gateway settlement CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--report', help='Write mismatches to this CSV file')
+        parser.add_argument('--apply', action='store_true',
+                            help='Correct payment statuses to the settled status')
+        parser.add_argument('--chunk-size', type=int, default=reconciliation.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        counts = {}
+        corrections = []
+
+        try:
+            source = open(options['path'], newline='')
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        report = open(options['report'], 'w', newline='') if options['report'] else None
+        try:
+            writer = None
+            if report:
+                writer = csv.DictWriter(report, reconciliation.REPORT_COLUMNS, extrasaction='ignore')
+                writer.writeheader()
+
+            with source:
+                lines = reconciliation.read_settlement(source)
+                for mismatch in reconciliation.reconcile(lines, options['chunk_size']):
+                    counts[mismatch['issue']] = counts.get(mismatch['issue'], 0) + 1
+                    if writer:
+                        writer.writerow(mismatch)
+                    if mismatch['issue'] in ('amount_mismatch', 'status_mismatch'):
+                        corrections.append(mismatch)
+        finally:
+            if report:
+                report.close()
+
+        for issue, count in sorted(counts.items()):
+            self.stdout.write(f"{issue}: {count}")
+
+        if options['apply'] and corrections:
+            updated = reconciliation.apply_corrections(corrections)
+            self.stdout.write(f"Corrected {updated} payment statuses")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciliation finished in {time.monotonic() - started:.1f}s"
+        ))
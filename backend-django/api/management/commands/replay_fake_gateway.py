@@ -0,0 +1,57 @@
+"""
+Replay fake gateway webhooks against /payments/webhook/
+
+    python manage.py replay_fake_gateway --limit 10000 --duplicates 0.2
+
+Sends a signed payment.captured event for each pending online payment, plus
+a share of duplicate deliveries, in shuffled order through the in-process
+test client, then reports the ingestion rate. Run
+run_payment_webhook_worker --once afterwards to apply them.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from ...models import Payment
+from ...services.payments import FakeGateway
+
+
+class Command(BaseCommand):
+    help = 'Replay signed fake-gateway webhook events at a high rate'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=1000)
+        parser.add_argument('--duplicates', type=float, default=0.1,
+                            help='Share of events delivered twice')
+
+    def handle(self, *args, **options):
+        if not settings.PAYMENT_WEBHOOK_SECRET:
+            raise CommandError('Set PAYMENT_WEBHOOK_SECRET first')
+
+        gateway = FakeGateway()
+        deliveries = [
+            gateway.event(payment)
+            for payment in Payment.objects.filter(status='pending').exclude(method='cod')[:options['limit']]
+        ]
+        deliveries += random.sample(deliveries, int(len(deliveries) * options['duplicates']))
+        random.shuffle(deliveries)
+
+        client = Client()
+        results = {}
+        started = time.monotonic()
+        for body, headers in deliveries:
+            response = client.post(
+                '/api/v1/payments/webhook/', data=body,
+                content_type='application/json', **headers
+            )
+            key = response.json().get('status', response.status_code)
+            results[key] = results.get(key, 0) + 1
+        elapsed = max(time.monotonic() - started, 1e-9)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(deliveries)} deliveries in {elapsed:.2f}s "
+            f"({len(deliveries) / elapsed:,.0f}/s): {results}"
+        ))
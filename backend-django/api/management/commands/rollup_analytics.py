@@ -0,0 +1,38 @@
+"""
+Analytics rollups (analytics_daily, analytics_products, cohort_retention)
+
+    python manage.py rollup_analytics          # recompute days touched since the last run
+    python manage.py rollup_analytics --full   # recompute every day
+    python manage.py rollup_analytics --days 7 # also recompute the last 7 days
+
+Run once on deploy to build the tables, then schedule hourly or nightly;
+dashboards add today's live figures themselves.
+Order lines still missing a cost basis are costed first and their days
+recomputed, so margins pick them up.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...services import analytics, cohorts, margins
+
+
+class Command(BaseCommand):
+    help = 'Incrementally roll up daily and per-product analytics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute all days and cohorts')
+        parser.add_argument('--days', type=int, default=0,
+                            help='Additionally recompute this many recent days')
+
+    def handle(self, *args, **options):
+        costed_days = margins.backfill_costs()
+        count = analytics.run(full=options['full'], extra_days=costed_days)
+        if options['days']:
+            today = timezone.localdate()
+            count += analytics.rollup_days(
+                today - timedelta(days=n) for n in range(options['days'])
+            )
+        months = cohorts.run(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {count} days and {months} cohort months"))
@@ -0,0 +1,37 @@
+"""
+Outbox worker - drains outbox_events and runs their side effects
+
+    python manage.py run_outbox_worker                 # run forever
+    python manage.py run_outbox_worker --once          # drain what is due, then exit
+
+Several workers may run side by side; rows are claimed with SKIP LOCKED.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ...services import outbox
+
+
+class Command(BaseCommand):
+    help = 'Drain the transactional outbox in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when nothing is due')
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            close_old_connections()
+            claimed = outbox.drain(options['batch_size'])
+            processed += claimed
+            if claimed < options['batch_size']:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} outbox events"))
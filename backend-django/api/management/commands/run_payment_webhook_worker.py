@@ -0,0 +1,55 @@
+"""
+Payment webhook worker pool
+
+    python manage.py run_payment_webhook_worker --workers 4
+    python manage.py run_payment_webhook_worker --once
+
+Worker i of N owns the shards where shard % N == i, so all events of one
+gateway transaction are applied by the same thread, in order.
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from ...models import PaymentWebhookEvent
+from ...services import payments
+
+
+class Command(BaseCommand):
+    help = 'Apply queued payment gateway webhook events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--poll-interval', type=float, default=0.5)
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        workers = max(1, min(options['workers'], PaymentWebhookEvent.SHARD_COUNT))
+        counts = [0] * workers
+        threads = [
+            threading.Thread(target=self.run_worker, args=(index, workers, counts, options))
+            for index in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {sum(counts)} webhook events"))
+
+    def run_worker(self, index, workers, counts, options):
+        shards = [s for s in range(PaymentWebhookEvent.SHARD_COUNT) if s % workers == index]
+        try:
+            while True:
+                close_old_connections()
+                claimed = payments.process_batch(shards, options['batch_size'])
+                counts[index] += claimed
+                if claimed < options['batch_size']:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        finally:
+            connection.close()
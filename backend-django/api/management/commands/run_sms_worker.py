@@ -0,0 +1,58 @@
+"""
+SMS worker - delivers queued sms_messages through settings.SMS_PROVIDER
+
+    python manage.py run_sms_worker                 # all messages, most urgent first
+    python manage.py run_sms_worker --lane otp      # OTPs only
+    python manage.py run_sms_worker --once          # send what is due, then exit
+
+Run one OTP-lane worker beside the general ones so logins never queue
+behind promotional sends. Rows are claimed with SKIP LOCKED.
+"""
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from ...models import SmsMessage
+from ...services import sms
+
+
+LANES = {
+    'all': None,
+    'otp': SmsMessage.PRIORITY_OTP,
+}
+
+
+class Command(BaseCommand):
+    help = 'Send queued SMS messages in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lane', choices=sorted(LANES), default='all')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when nothing is due')
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            provider = sms.get_provider_class()()
+        except ImproperlyConfigured as exc:
+            raise CommandError(f'No SMS provider to send with: {exc}')
+        provider.open()
+        processed = 0
+        try:
+            while True:
+                close_old_connections()
+                claimed = sms.dispatch(
+                    provider, options['batch_size'], max_priority=LANES[options['lane']]
+                )
+                processed += claimed
+                if claimed < options['batch_size']:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        finally:
+            provider.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} SMS messages"))
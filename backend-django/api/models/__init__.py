@@ -1,34 +1,46 @@
 """
 RIMAE Models - PostgreSQL Database Schema
 """
-from .user import User, OTP
+from .user import User, OTP, RevokedToken
 from .product import Product, ProductImage, Category
-from .fragrance import Fragrance, FragranceImage, Ingredient, FragranceNote
+from .fragrance import Fragrance, FragranceImage, Ingredient, FragranceNote, IngredientConsumption
 from .order import Order, OrderItem
 from .address import Address
 from .cart import Cart, CartItem
 from .wishlist import Wishlist
 from .review import Review
-from .payment import Payment
-from .notification import Notification
+from .payment import Payment, PaymentWebhookEvent
+from .notification import Notification, NotificationReadState, NotificationReceipt
 from .settings import BrandSettings
 from .banner import Banner, MarqueeSetting
-from .inventory import Inventory, StockMovement
+from .inventory import (
+    Inventory, StockMovement, InventoryRollup, StockCheckpoint, ReorderSuggestion
+)
 from .asset import Asset
+from .outbox import OutboxEvent
+from .sms import SmsMessage
+from .analytics import (
+    AnalyticsDaily, AnalyticsProduct, AnalyticsStaleDay, CohortRetention, CustomerSegment,
+    RollupWatermark
+)
 
 __all__ = [
-    'User', 'OTP',
+    'User', 'OTP', 'RevokedToken',
     'Product', 'ProductImage', 'Category',
-    'Fragrance', 'FragranceImage', 'Ingredient', 'FragranceNote',
+    'Fragrance', 'FragranceImage', 'Ingredient', 'FragranceNote', 'IngredientConsumption',
     'Order', 'OrderItem',
     'Address',
     'Cart', 'CartItem',
     'Wishlist',
     'Review',
-    'Payment',
-    'Notification',
+    'Payment', 'PaymentWebhookEvent',
+    'Notification', 'NotificationReadState', 'NotificationReceipt',
     'BrandSettings',
     'Banner', 'MarqueeSetting',
-    'Inventory', 'StockMovement',
+    'Inventory', 'StockMovement', 'InventoryRollup', 'StockCheckpoint', 'ReorderSuggestion',
     'Asset',
+    'OutboxEvent',
+    'SmsMessage',
+    'AnalyticsDaily', 'AnalyticsProduct', 'AnalyticsStaleDay', 'CohortRetention', 'CustomerSegment',
+    'RollupWatermark',
 ]
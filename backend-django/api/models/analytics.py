@@ -0,0 +1,204 @@
+"""
+Analytics Models - daily rollups filled by the rollup_analytics job
+"""
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class AnalyticsDaily(models.Model):
+    """Store-wide totals for one local (Asia/Kolkata) day"""
+    date = models.DateField(unique=True)
+
+    # Orders
+    total_orders = models.IntegerField(default=0)
+    paid_orders = models.IntegerField(default=0)
+    completed_orders = models.IntegerField(default=0)
+    cancelled_orders = models.IntegerField(default=0)
+
+    # Revenue
+    gross_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    net_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    refunded_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    # Users
+    new_users = models.IntegerField(default=0)
+    active_users = models.IntegerField(default=0)
+
+    # Products
+    custom_perfumes = models.IntegerField(default=0)
+
+    # Traffic
+    page_views = models.IntegerField(default=0)
+    unique_visitors = models.IntegerField(default=0)
+
+    # Conversion
+    cart_additions = models.IntegerField(default=0)
+    checkouts_started = models.IntegerField(default=0)
+    checkouts_completed = models.IntegerField(default=0)
+    conversion_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+
+    # Average
+    avg_order_value = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    # HyperLogLog sketches (services.hll) behind unique_visitors and
+    # active_users; merge them to count distinct values across days
+    visitors_sketch = models.BinaryField(null=True, blank=True)
+    active_users_sketch = models.BinaryField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'analytics_daily'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: {self.total_orders} orders"
+
+
+class AnalyticsProduct(models.Model):
+    """Per-day funnel and sales for one product or fragrance"""
+    date = models.DateField()
+    fragrance = models.ForeignKey(
+        'Fragrance',
+        on_delete=models.CASCADE,
+        related_name='daily_analytics',
+        null=True,
+        blank=True
+    )
+    product = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='daily_analytics',
+        null=True,
+        blank=True
+    )
+
+    views = models.IntegerField(default=0)
+    cart_adds = models.IntegerField(default=0)
+    purchases = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    # Cost of goods sold from OrderItem.unit_cost, and the revenue of the
+    # lines that had a cost basis (margin is only meaningful over those)
+    cogs = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    costed_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'analytics_products'
+        ordering = ['-date']
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(fragrance__isnull=False) | models.Q(product__isnull=False),
+                name='analytics_products_target_check'
+            ),
+            # Partial unique indexes are the ON CONFLICT targets for upserts
+            models.UniqueConstraint(
+                fields=['date', 'product'],
+                condition=models.Q(product__isnull=False),
+                name='analytics_products_product_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['date', 'fragrance'],
+                condition=models.Q(fragrance__isnull=False, product__isnull=True),
+                name='analytics_products_fragrance_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        target = f"product {self.product_id}" if self.product_id else f"fragrance {self.fragrance_id}"
+        return f"{self.date} {target}: {self.purchases} sold"
+
+
+class CohortRetention(models.Model):
+    """
+    Customers of one acquisition cohort (month of first order) active in a
+    later month. repeat_customers is set on the cohort's own month only.
+    """
+    cohort_month = models.DateField()
+    order_month = models.DateField()
+    months_since = models.IntegerField()
+    customers = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    repeat_customers = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'cohort_retention'
+        ordering = ['cohort_month', 'months_since']
+        unique_together = ['cohort_month', 'order_month']
+
+    def __str__(self):
+        return f"{self.cohort_month:%Y-%m} +{self.months_since}: {self.customers} customers"
+
+
+class CustomerSegment(models.Model):
+    """Nightly RFM (recency, frequency, monetary) scores and segment per customer"""
+    SEGMENT_CHOICES = [
+        ('champions', 'Champions'),
+        ('loyal', 'Loyal'),
+        ('potential_loyalists', 'Potential Loyalists'),
+        ('new_customers', 'New Customers'),
+        ('promising', 'Promising'),
+        ('need_attention', 'Need Attention'),
+        ('about_to_sleep', 'About to Sleep'),
+        ('at_risk', 'At Risk'),
+        ('cant_lose', "Can't Lose"),
+        ('hibernating', 'Hibernating'),
+    ]
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='segment'
+    )
+    recency_days = models.IntegerField()
+    frequency = models.IntegerField()
+    monetary = models.DecimalField(max_digits=14, decimal_places=2)
+    r_score = models.SmallIntegerField()
+    f_score = models.SmallIntegerField()
+    m_score = models.SmallIntegerField()
+    segment = models.CharField(max_length=30, choices=SEGMENT_CHOICES, db_index=True)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'customer_segments'
+        ordering = ['segment']
+
+    def __str__(self):
+        return f"{self.user_id}: {self.segment} ({self.r_score}{self.f_score}{self.m_score})"
+
+
+class RollupWatermark(models.Model):
+    """High-water mark of source changes already folded into a rollup"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'rollup_watermarks'
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
+
+
+class AnalyticsStaleDay(models.Model):
+    """
+    A local day whose rollups must be recomputed because rows were deleted,
+    which the updated_at-based change scan cannot see
+    """
+    date = models.DateField(primary_key=True)
+    marked_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'analytics_stale_days'
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date} (stale since {self.marked_at})"
@@ -132,3 +132,19 @@ class FragranceNote(models.Model):
     class Meta:
         db_table = 'fragrance_notes'
         unique_together = ['fragrance', 'ingredient', 'note_type']
+
+
+class IngredientConsumption(models.Model):
+    """Ingredients deducted for an order (ingredient id -> ml), one row per order"""
+    order = models.OneToOneField(
+        'Order',
+        on_delete=models.CASCADE,
+        related_name='ingredient_consumption',
+        db_constraint=False  # orders may be partitioned (see partition_tables)
+    )
+    quantities = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ingredient_consumptions'
+        ordering = ['-created_at']
@@ -71,6 +71,78 @@ class StockMovement(models.Model):
     class Meta:
         db_table = 'stock_movements'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['inventory', 'created_at'], name='stock_mov_inv_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.type.upper()} {self.quantity} - {self.inventory.sku}"
+
+
+class StockCheckpoint(models.Model):
+    """Stock level per item as of `taken_at`, derived from the movement ledger"""
+    inventory = models.ForeignKey(
+        Inventory,
+        on_delete=models.CASCADE,
+        related_name='checkpoints'
+    )
+    stock = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'stock_checkpoints'
+        ordering = ['-taken_at']
+        unique_together = ['inventory', 'taken_at']
+
+    def __str__(self):
+        return f"{self.inventory_id} @ {self.taken_at:%Y-%m-%d %H:%M}: {self.stock}"
+
+
+class InventoryRollup(models.Model):
+    """Maintained inventory totals per location and per size"""
+    DIMENSION_CHOICES = [
+        ('location', 'Location'),
+        ('size', 'Size'),
+    ]
+
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=100, blank=True)
+    item_count = models.IntegerField(default=0)
+    total_units = models.BigIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    low_stock_count = models.IntegerField(default=0)
+    out_of_stock_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'inventory_rollups'
+        ordering = ['dimension', 'key']
+        unique_together = ['dimension', 'key']
+
+    def __str__(self):
+        return f"{self.dimension}={self.key or '-'}: {self.total_units} units"
+
+
+class ReorderSuggestion(models.Model):
+    """Nightly sales-velocity based reorder recommendation per SKU"""
+    inventory = models.OneToOneField(
+        Inventory,
+        on_delete=models.CASCADE,
+        related_name='reorder_suggestion'
+    )
+    avg_daily_sales = models.FloatField(default=0)
+    demand_std = models.FloatField(default=0)
+    safety_stock = models.IntegerField(default=0)
+    reorder_point = models.IntegerField(default=0)
+    suggested_quantity = models.IntegerField(default=0)
+    days_of_cover = models.FloatField(null=True, blank=True)  # Null when nothing sells
+    window_days = models.IntegerField()
+    lead_time_days = models.IntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'reorder_suggestions'
+        ordering = ['days_of_cover']
+
+    def __str__(self):
+        return f"{self.inventory_id}: reorder at {self.reorder_point}"
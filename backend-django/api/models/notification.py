@@ -1,5 +1,10 @@
 """
 Notification Model
+
+Broadcasts are a single row (user NULL) however many users see them, so
+their read state is kept per user: NotificationReadState holds a watermark
+(every notification with id <= read_through counts as read) and
+NotificationReceipt records broadcasts read individually above it.
 """
 from django.db import models
 from django.conf import settings
@@ -25,6 +30,7 @@ class Notification(models.Model):
     title = models.CharField(max_length=200)
     message = models.TextField()
     
+    # Only meaningful for a user's own notifications; see NotificationReceipt
     is_read = models.BooleanField(default=False)
     is_broadcast = models.BooleanField(default=False)
     
@@ -35,6 +41,55 @@ class Notification(models.Model):
     class Meta:
         db_table = 'notifications'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notifications_user_idx'),
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_broadcast=True),
+                name='notifications_broadcast_idx'
+            ),
+            models.Index(
+                fields=['user'],
+                condition=models.Q(is_read=False),
+                name='notifications_unread_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.type}: {self.title}"
+
+
+class NotificationReadState(models.Model):
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_read_state'
+    )
+    # Highest notification id covered by the user's last "mark all as read"
+    read_through = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'notification_read_states'
+
+    def __str__(self):
+        return f"{self.user_id} read through #{self.read_through}"
+
+
+class NotificationReceipt(models.Model):
+    """A broadcast read by one user, above that user's watermark"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='notification_receipts'
+    )
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='receipts')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'notification_receipts'
+        unique_together = ['user', 'notification']
+
+    def __str__(self):
+        return f"{self.user_id} read #{self.notification_id}"
@@ -16,6 +16,17 @@ class Order(models.Model):
         ('refunded', 'Refunded'),
     ]
 
+    # Allowed status transitions (source -> targets)
+    STATUS_TRANSITIONS = {
+        'pending': ['confirmed', 'cancelled'],
+        'confirmed': ['processing', 'shipped', 'cancelled'],
+        'processing': ['shipped', 'cancelled'],
+        'shipped': ['delivered'],
+        'delivered': ['refunded'],
+        'cancelled': ['refunded'],
+        'refunded': [],
+    }
+
     PAYMENT_STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('paid', 'Paid'),
@@ -53,6 +64,23 @@ class Order(models.Model):
     class Meta:
         db_table = 'orders'
         ordering = ['-created_at']
+        indexes = [
+            # Analytics rollups find touched days by updated_at
+            models.Index(fields=['updated_at'], name='orders_updated_at_idx'),
+            models.Index(fields=['created_at'], name='orders_created_at_idx'),
+            # Covering index for the sales time series (index-only scans)
+            models.Index(
+                fields=['payment_status', 'created_at'],
+                include=['total_amount'],
+                name='orders_payment_created_idx'
+            ),
+            # Dashboard pending count without scanning every order
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status='pending'),
+                name='orders_pending_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Order {self.order_number}"
@@ -61,6 +89,18 @@ class Order(models.Model):
     def items_count(self):
         return self.items.count()
 
+    @classmethod
+    def can_transition(cls, from_status, to_status):
+        return to_status in cls.STATUS_TRANSITIONS.get(from_status, [])
+
+    @classmethod
+    def source_statuses(cls, to_status):
+        """Statuses an order may move to `to_status` from"""
+        return [
+            source for source, targets in cls.STATUS_TRANSITIONS.items()
+            if to_status in targets
+        ]
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -77,11 +117,22 @@ class OrderItem(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     
     size = models.CharField(max_length=50, blank=True)  # e.g., "50ml", "100ml"
+
+    # Cost basis snapshot at sale time (services.margins); null until costed
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'order_items'
+        indexes = [
+            # Cost backfill only visits lines still missing a cost basis
+            models.Index(
+                fields=['order'],
+                condition=models.Q(unit_cost__isnull=True),
+                name='order_items_uncosted_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.product_name} x {self.quantity}"
@@ -0,0 +1,32 @@
+"""
+Outbox Model - side effects recorded in the same transaction as the change
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEvent(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'outbox_events'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk} ({self.status})"
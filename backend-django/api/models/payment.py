@@ -3,6 +3,7 @@ Payment Model
 """
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class Payment(models.Model):
@@ -31,7 +32,8 @@ class Payment(models.Model):
     
     # Payment gateway response
     gateway_response = models.JSONField(default=dict, blank=True)
-    gateway_transaction_id = models.CharField(max_length=200, blank=True)
+    # Webhooks and settlement reconciliation look payments up by it
+    gateway_transaction_id = models.CharField(max_length=200, blank=True, db_index=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -42,3 +44,41 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"Payment {self.transaction_id} - {self.status}"
+
+
+class PaymentWebhookEvent(models.Model):
+    """Gateway webhook events, queued for the webhook worker"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+
+    SHARD_COUNT = 64
+
+    event_type = models.CharField(max_length=50)
+    gateway_transaction_id = models.CharField(max_length=200)
+    transaction_id = models.CharField(max_length=100, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    # Events for one transaction always land on the same shard, so a single
+    # worker applies them in arrival order
+    shard = models.SmallIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    # Failed events are retried with backoff from this time
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'payment_webhook_events'
+        ordering = ['id']
+        unique_together = ['gateway_transaction_id', 'event_type']
+        indexes = [
+            models.Index(fields=['status', 'shard', 'id'], name='webhook_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.gateway_transaction_id} ({self.status})"
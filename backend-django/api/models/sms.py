@@ -0,0 +1,51 @@
+"""
+SMS Model - outbound text messages queued for the dispatch worker
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class SmsMessage(models.Model):
+    # Lower numbers are sent first; OTPs have their own worker lane
+    PRIORITY_OTP = 0
+    PRIORITY_TRANSACTIONAL = 5
+    PRIORITY_PROMOTIONAL = 9
+
+    PRIORITY_CHOICES = [
+        (PRIORITY_OTP, 'OTP'),
+        (PRIORITY_TRANSACTIONAL, 'Transactional'),
+        (PRIORITY_PROMOTIONAL, 'Promotional'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    phone = models.CharField(max_length=15)
+    body = models.TextField()
+    priority = models.SmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_TRANSACTIONAL)
+    # Bodies of sensitive messages (OTPs) are blanked once sent
+    sensitive = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    provider_message_id = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'sms_messages'
+        ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['priority', 'available_at'],
+                condition=models.Q(status='pending'),
+                name='sms_pending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"SMS #{self.pk} to {self.phone} ({self.status})"
@@ -42,6 +42,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_email_verified = models.BooleanField(default=False)
     
     notifications_enabled = models.BooleanField(default=True)
+
+    # Carried in JWTs; bumping it revokes every token issued before
+    token_version = models.PositiveIntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -61,6 +64,10 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 
 class OTP(models.Model):
+    """
+    Audit trail of issued codes (settings.OTP_AUDIT); live codes are kept
+    in the cache by services.otp
+    """
     phone = models.CharField(max_length=15)
     otp = models.CharField(max_length=6)
     is_verified = models.BooleanField(default=False)
@@ -73,3 +80,16 @@ class OTP(models.Model):
     @classmethod
     def generate_otp(cls):
         return str(random.randint(100000, 999999))
+
+
+class RevokedToken(models.Model):
+    """Denylisted JWT ids (logout), kept until the token would expire anyway"""
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'revoked_tokens'
+
+    def __str__(self):
+        return f"{self.jti} (until {self.expires_at})"
@@ -0,0 +1,3 @@
+"""
+RIMAE Services - business logic shared by views and management commands
+"""
@@ -0,0 +1,470 @@
+"""
+Analytics Rollups - analytics_daily and analytics_products
+
+The rollup job recomputes only the local days touched since its last run
+(orders updated, customers joined, rows deleted) and upserts them. Readers
+take days before the last run from the rollups and everything from that
+run's day onward (live_from()) from the raw tables, so dashboards stay
+current without scanning history, even when the job has fallen behind. The sales time series reads paid orders
+straight from a covering index instead, so any granularity is exact.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import (
+    AnalyticsDaily, AnalyticsProduct, AnalyticsStaleDay, Order, Product, RollupWatermark, User
+)
+from .hll import HyperLogLog
+
+
+WATERMARK = 'analytics'
+
+# Re-read this much before the watermark so rows committed late are not missed
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+DAYS_PER_QUERY = 31
+
+EXCLUDED_ORDER_STATUSES = ['cancelled', 'refunded']
+
+DAILY_FIELDS = [
+    'total_orders', 'paid_orders', 'completed_orders', 'cancelled_orders',
+    'gross_revenue', 'net_revenue', 'refunded_amount',
+    'new_users', 'active_users',
+]
+
+DAILY_SQL = """
+    WITH days AS (
+        SELECT unnest(%(days)s::date[]) AS day
+    ),
+    o AS (
+        SELECT (created_at AT TIME ZONE %(tz)s)::date AS day,
+               COUNT(*) AS total_orders,
+               COUNT(*) FILTER (WHERE payment_status = 'paid') AS paid_orders,
+               COUNT(*) FILTER (WHERE status = 'delivered') AS completed_orders,
+               COUNT(*) FILTER (WHERE status = 'cancelled') AS cancelled_orders,
+               SUM(total_amount) FILTER (WHERE payment_status IN ('paid', 'refunded')) AS gross_revenue,
+               SUM(total_amount) FILTER (WHERE payment_status = 'paid') AS net_revenue,
+               SUM(total_amount) FILTER (WHERE payment_status = 'refunded') AS refunded_amount,
+               COUNT(DISTINCT user_id) AS active_users
+        FROM orders
+        WHERE created_at >= %(start)s AND created_at < %(end)s
+          AND (created_at AT TIME ZONE %(tz)s)::date = ANY(%(days)s::date[])
+        GROUP BY 1
+    ),
+    u AS (
+        SELECT (created_at AT TIME ZONE %(tz)s)::date AS day, COUNT(*) AS new_users
+        FROM users
+        WHERE role = 'customer'
+          AND created_at >= %(start)s AND created_at < %(end)s
+          AND (created_at AT TIME ZONE %(tz)s)::date = ANY(%(days)s::date[])
+        GROUP BY 1
+    )
+    SELECT d.day,
+           COALESCE(o.total_orders, 0),
+           COALESCE(o.paid_orders, 0),
+           COALESCE(o.completed_orders, 0),
+           COALESCE(o.cancelled_orders, 0),
+           COALESCE(o.gross_revenue, 0),
+           COALESCE(o.net_revenue, 0),
+           COALESCE(o.refunded_amount, 0),
+           COALESCE(u.new_users, 0),
+           COALESCE(o.active_users, 0)
+    FROM days d
+    LEFT JOIN o ON o.day = d.day
+    LEFT JOIN u ON u.day = d.day
+"""
+
+UPSERT_DAILY_SQL = f"""
+    INSERT INTO analytics_daily (
+        date, {', '.join(DAILY_FIELDS)}, avg_order_value,
+        custom_perfumes, page_views, unique_visitors, cart_additions,
+        checkouts_started, checkouts_completed, conversion_rate,
+        created_at, updated_at
+    )
+    SELECT r.*, COALESCE(ROUND(r.net_revenue / NULLIF(r.paid_orders, 0), 2), 0),
+           0, 0, 0, 0, 0, 0, 0, NOW(), NOW()
+    FROM ({DAILY_SQL}) AS r (date, {', '.join(DAILY_FIELDS)})
+    ON CONFLICT (date) DO UPDATE SET
+        {', '.join(f'{field} = EXCLUDED.{field}' for field in DAILY_FIELDS)},
+        avg_order_value = EXCLUDED.avg_order_value,
+        updated_at = NOW()
+"""
+
+PRODUCT_SQL = """
+    SELECT (o.created_at AT TIME ZONE %(tz)s)::date AS day,
+           oi.product_id,
+           f.id AS fragrance_id,
+           SUM(oi.quantity) AS purchases,
+           SUM(oi.total_price) AS revenue,
+           COALESCE(SUM(oi.quantity * oi.unit_cost), 0) AS cogs,
+           COALESCE(SUM(oi.total_price) FILTER (WHERE oi.unit_cost IS NOT NULL), 0) AS costed_revenue
+    FROM order_items oi
+    JOIN orders o ON o.id = oi.order_id
+    LEFT JOIN fragrances f ON oi.product_id IS NULL AND f.sku = oi.product_sku
+    WHERE o.created_at >= %(start)s AND o.created_at < %(end)s
+      AND (o.created_at AT TIME ZONE %(tz)s)::date = ANY(%(days)s::date[])
+      AND o.status <> ALL(%(excluded)s)
+      AND (oi.product_id IS NOT NULL OR f.id IS NOT NULL)
+    GROUP BY 1, 2, 3
+"""
+
+PRODUCT_SALES_FIELDS = ['purchases', 'revenue', 'cogs', 'costed_revenue']
+
+PRODUCT_SALES_UPDATE = ', '.join(f'{field} = EXCLUDED.{field}' for field in PRODUCT_SALES_FIELDS)
+
+# Lines for catalogue products count against the product; lines without
+# one are matched to a fragrance by SKU. Each kind upserts on its own
+# partial unique index.
+UPSERT_PRODUCTS_SQL = f"""
+    WITH sales AS ({PRODUCT_SQL}),
+    by_product AS (
+        INSERT INTO analytics_products
+            (date, product_id, fragrance_id, views, cart_adds, purchases, revenue,
+             cogs, costed_revenue, created_at)
+        SELECT day, product_id, NULL, 0, 0, purchases, revenue, cogs, costed_revenue, NOW()
+        FROM sales WHERE product_id IS NOT NULL
+        ON CONFLICT (date, product_id) WHERE product_id IS NOT NULL
+        DO UPDATE SET {PRODUCT_SALES_UPDATE}
+    )
+    INSERT INTO analytics_products
+        (date, product_id, fragrance_id, views, cart_adds, purchases, revenue,
+         cogs, costed_revenue, created_at)
+    SELECT day, NULL, fragrance_id, 0, 0, purchases, revenue, cogs, costed_revenue, NOW()
+    FROM sales WHERE product_id IS NULL
+    ON CONFLICT (date, fragrance_id) WHERE fragrance_id IS NOT NULL AND product_id IS NULL
+    DO UPDATE SET {PRODUCT_SALES_UPDATE}
+"""
+
+ACTIVE_USERS_SQL = """
+    SELECT (created_at AT TIME ZONE %(tz)s)::date, array_agg(DISTINCT user_id)
+    FROM orders
+    WHERE created_at >= %(start)s AND created_at < %(end)s
+      AND (created_at AT TIME ZONE %(tz)s)::date = ANY(%(days)s::date[])
+    GROUP BY 1
+"""
+
+GRANULARITIES = {'day': '1 day', 'week': '1 week', 'month': '1 month'}
+
+# Buckets are local (TIME_ZONE) calendar periods; weeks start on Monday.
+# Paid/refunded orders are read from the (payment_status, created_at)
+# covering index, and generate_series supplies the empty periods.
+SALES_SERIES_SQL = """
+    WITH buckets AS (
+        SELECT generate_series(
+            date_trunc(%(unit)s, %(first)s::timestamp),
+            date_trunc(%(unit)s, %(last)s::timestamp),
+            %(step)s::interval
+        ) AS bucket
+    ),
+    sales AS (
+        SELECT date_trunc(%(unit)s, created_at AT TIME ZONE %(tz)s) AS bucket,
+               COUNT(*) FILTER (WHERE payment_status = 'paid') AS orders,
+               SUM(total_amount) FILTER (WHERE payment_status = 'paid') AS revenue,
+               COUNT(*) FILTER (WHERE payment_status = 'refunded') AS refunds,
+               SUM(total_amount) FILTER (WHERE payment_status = 'refunded') AS refunded_amount
+        FROM orders
+        WHERE payment_status IN ('paid', 'refunded')
+          AND created_at >= %(start)s AND created_at < %(end)s
+        GROUP BY 1
+    )
+    SELECT b.bucket::date,
+           COALESCE(s.orders, 0),
+           COALESCE(s.revenue, 0),
+           COALESCE(s.refunds, 0),
+           COALESCE(s.refunded_amount, 0)
+    FROM buckets b
+    LEFT JOIN sales s ON s.bucket = b.bucket
+    ORDER BY 1
+"""
+
+TOUCHED_DAYS_SQL = """
+    SELECT DISTINCT (created_at AT TIME ZONE %(tz)s)::date FROM orders WHERE updated_at > %(since)s
+    UNION
+    SELECT DISTINCT (created_at AT TIME ZONE %(tz)s)::date FROM users WHERE created_at > %(since)s
+"""
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _params(days, **extra):
+    return dict(
+        days=list(days),
+        tz=settings.TIME_ZONE,
+        start=_day_start(min(days)),
+        end=_day_start(max(days) + timedelta(days=1)),
+        excluded=EXCLUDED_ORDER_STATUSES,
+        **extra
+    )
+
+
+def rollup_days(days):
+    """Recompute and upsert daily and product rows for the given local dates"""
+    days = sorted(set(days))
+    for i in range(0, len(days), DAYS_PER_QUERY):
+        chunk = days[i:i + DAYS_PER_QUERY]
+        params = _params(chunk)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(UPSERT_DAILY_SQL, params)
+            # Days can lose sales (cancellations), so clear before upserting
+            cursor.execute(
+                f"UPDATE analytics_products SET {', '.join(f'{field} = 0' for field in PRODUCT_SALES_FIELDS)} "
+                "WHERE date = ANY(%(days)s::date[])",
+                params
+            )
+            cursor.execute(UPSERT_PRODUCTS_SQL, params)
+
+            cursor.execute(ACTIVE_USERS_SQL, params)
+            users = dict(cursor.fetchall())
+            cursor.execute(
+                """
+                UPDATE analytics_daily a SET active_users_sketch = s.sketch
+                FROM unnest(%s::date[], %s::bytea[]) AS s (date, sketch)
+                WHERE a.date = s.date
+                """,
+                [chunk, [
+                    HyperLogLog().update(users[day]).to_bytes() if day in users else None
+                    for day in chunk
+                ]]
+            )
+    return len(days)
+
+
+def touched_days(since):
+    with connection.cursor() as cursor:
+        cursor.execute(TOUCHED_DAYS_SQL, {'tz': settings.TIME_ZONE, 'since': since})
+        return {row[0] for row in cursor.fetchall()}
+
+
+def all_days():
+    first = [
+        value for value in (
+            Order.objects.order_by('created_at').values_list('created_at', flat=True).first(),
+            User.objects.order_by('created_at').values_list('created_at', flat=True).first(),
+        ) if value
+    ]
+    if not first:
+        return set()
+    day, today = timezone.localdate(min(first)), timezone.localdate()
+    return {day + timedelta(days=n) for n in range((today - day).days + 1)}
+
+
+def mark_stale(moment):
+    """Have the next run recompute the local day of `moment` (for deleted rows)"""
+    AnalyticsStaleDay.objects.bulk_create(
+        [AnalyticsStaleDay(date=timezone.localdate(moment), marked_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=['marked_at']
+    )
+
+
+def run(full=False, extra_days=()):
+    """
+    Roll up every day touched since the last run (all days on the first
+    run or with full=True), days marked stale, and `extra_days`. Returns
+    the number of days recomputed.
+    """
+    started = timezone.now()
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+    if full or watermark is None:
+        days = all_days()
+    else:
+        days = touched_days(watermark.value - WATERMARK_OVERLAP)
+    stale = set(AnalyticsStaleDay.objects.filter(marked_at__lte=started).values_list('date', flat=True))
+    days |= stale | set(extra_days)
+
+    count = rollup_days(days) if days else 0
+    # Days marked again during the run stay for the next one
+    AnalyticsStaleDay.objects.filter(date__in=stale, marked_at__lte=started).delete()
+    RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'value': started})
+    return count
+
+
+def live_from():
+    """
+    First local day the rollups may not cover yet: the day the last run
+    started (less the overlap), or today if the job has never run
+    """
+    today = timezone.localdate()
+    value = RollupWatermark.objects.filter(name=WATERMARK).values_list('value', flat=True).first()
+    if value is None:
+        return today
+    return min(today, timezone.localdate(value - WATERMARK_OVERLAP))
+
+
+def live_products(first, last):
+    """
+    Sales per local day from raw rows for dates first..last inclusive:
+    [(day, (product_id, fragrance_id), {purchases, revenue, cogs,
+    costed_revenue}), ...]
+    """
+    days = [first + timedelta(days=n) for n in range((last - first).days + 1)]
+    if not days:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(PRODUCT_SQL, _params(days))
+        return [
+            (row[0], (row[1], row[2]), dict(zip(PRODUCT_SALES_FIELDS, row[3:])))
+            for row in cursor.fetchall()
+        ]
+
+
+def sales_series(granularity, first, last):
+    """
+    Paid orders, revenue, AOV and refunds per local day/week/month for
+    dates first..last inclusive, with zero rows for empty periods.
+    Partial periods at either end only count orders within the range.
+    """
+    params = {
+        'unit': granularity,
+        'step': GRANULARITIES[granularity],
+        'first': first,
+        'last': last,
+        'tz': settings.TIME_ZONE,
+        'start': _day_start(first),
+        'end': _day_start(last + timedelta(days=1)),
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(SALES_SERIES_SQL, params)
+        return [
+            {
+                'period': period,
+                'orders': orders,
+                'revenue': revenue,
+                'avg_order_value': round(revenue / orders, 2) if orders else 0,
+                'refunds': refunds,
+                'refunded_amount': refunded_amount,
+            }
+            for period, orders, revenue, refunds, refunded_amount in cursor.fetchall()
+        ]
+
+
+def dashboard():
+    """
+    Admin dashboard figures with one aggregate query per table: days before
+    live_from() from analytics_daily, pending orders and orders, sign-ups
+    and active users from live_from() on, the product catalogue, plus the
+    last 30 days' distinct-count sketches.
+    """
+    today = timezone.localdate()
+    live = live_from()
+    last_30_days = today - timedelta(days=30)
+    placed_today = Q(created_at__gte=_day_start(today))
+    placed_live = Q(created_at__gte=_day_start(live))
+    recent = Q(created_at__gte=_day_start(last_30_days))
+    paid = Q(payment_status='paid')
+    decimal_zero = Value(Decimal('0'))
+
+    closed = AnalyticsDaily.objects.filter(date__lt=live).aggregate(
+        orders=Coalesce(Sum('total_orders'), 0),
+        revenue=Coalesce(Sum('net_revenue'), decimal_zero),
+        monthly_revenue=Coalesce(Sum('net_revenue', filter=Q(date__gte=last_30_days)), decimal_zero),
+        customers=Coalesce(Sum('new_users'), 0),
+        new_customers=Coalesce(Sum('new_users', filter=Q(date__gte=last_30_days)), 0),
+    )
+    orders = Order.objects.filter(Q(status='pending') | placed_live).aggregate(
+        pending=Count('id', filter=Q(status='pending')),
+        live=Count('id', filter=placed_live),
+        revenue_live=Coalesce(Sum('total_amount', filter=placed_live & paid), decimal_zero),
+        monthly_revenue_live=Coalesce(Sum('total_amount', filter=placed_live & recent & paid), decimal_zero),
+        users_today=ArrayAgg('user_id', distinct=True, filter=placed_today, default=Value([])),
+        users_live=ArrayAgg('user_id', distinct=True, filter=placed_live & recent, default=Value([])),
+    )
+    customers = User.objects.filter(placed_live, role='customer').aggregate(
+        total=Count('id'),
+        new=Count('id', filter=recent),
+    )
+    products = Product.objects.filter(is_active=True).aggregate(
+        total=Count('id'),
+        low_stock=Count('id', filter=Q(stock_quantity__lte=10)),
+    )
+    visitors, active_users = distinct_counts(last_30_days, today, live, orders['users_live'])
+
+    return {
+        'orders': {
+            'total': closed['orders'] + orders['live'],
+            'pending': orders['pending'],
+        },
+        'revenue': {
+            'total': float(closed['revenue'] + orders['revenue_live']),
+            'monthly': float(closed['monthly_revenue'] + orders['monthly_revenue_live']),
+        },
+        'customers': {
+            'total': closed['customers'] + customers['total'],
+            'new': closed['new_customers'] + customers['new'],
+        },
+        'products': products,
+        'visitors': {
+            'last_30_days': visitors,
+        },
+        'active_users': {
+            'today': len(orders['users_today']),
+            'last_30_days': active_users,
+        },
+    }
+
+
+def distinct_counts(start, end, live, active_live=()):
+    """
+    Approximate unique visitors and active (ordering) users over
+    [start, end] as unions of the daily HyperLogLog sketches. Active-user
+    sketches are only trusted before `live`; the users in `active_live`
+    (read from the raw orders) cover the days after.
+    """
+    visitors, active_users = HyperLogLog(), HyperLogLog()
+    for day, visitors_sketch, active_sketch in AnalyticsDaily.objects.filter(
+        date__gte=start, date__lte=end
+    ).values_list('date', 'visitors_sketch', 'active_users_sketch'):
+        visitors.merge(HyperLogLog.from_bytes(visitors_sketch))
+        if day < live:
+            active_users.merge(HyperLogLog.from_bytes(active_sketch))
+    active_users.update(active_live)
+    return visitors.count(), active_users.count()
+
+
+def product_totals(start=None):
+    """
+    Funnel and sales per product/fragrance since `start` (all time when
+    None): {(product_id, fragrance_id): {views, cart_adds, purchases,
+    revenue, cogs, costed_revenue}}.
+    Views and cart adds are already in the daily rows (written by the
+    event flusher); purchases from live_from() on come from the raw order
+    tables.
+    """
+    today = timezone.localdate()
+    live = live_from()
+    rollups = AnalyticsProduct.objects.filter(date__lte=today)
+    if start is not None:
+        rollups = rollups.filter(date__gte=start)
+        live = max(live, start)
+    closed = Q(date__lt=live)
+    money = {
+        field: Coalesce(Sum(field, filter=closed), Decimal('0'), output_field=DecimalField())
+        for field in ('revenue', 'cogs', 'costed_revenue')
+    }
+    result = {
+        (row.pop('product_id'), row.pop('fragrance_id')): row
+        for row in rollups.order_by().values('product_id', 'fragrance_id').annotate(
+            views=Coalesce(Sum('views'), 0),
+            cart_adds=Coalesce(Sum('cart_adds'), 0),
+            purchases=Coalesce(Sum('purchases', filter=closed), 0),
+            **money
+        )
+    }
+    for _, key, sales in live_products(live, today):
+        row = result.setdefault(key, {
+            'views': 0, 'cart_adds': 0, 'purchases': 0,
+            'revenue': Decimal('0'), 'cogs': Decimal('0'), 'costed_revenue': Decimal('0'),
+        })
+        for field, value in sales.items():
+            row[field] += value
+    return result
@@ -0,0 +1,16 @@
+"""
+Retry Backoff - exponential delays with jitter for queued work
+
+Shared by the outbox, SMS and payment webhook workers.
+"""
+import random
+from datetime import timedelta
+
+
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 3600
+
+
+def backoff_delay(attempts):
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
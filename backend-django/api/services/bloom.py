@@ -0,0 +1,39 @@
+"""
+Bloom filter - compact set membership with false positives but no false negatives
+
+Bits live in a NumPy array sized for `capacity` items at `error_rate`.
+Item positions come from one 128-bit blake2b digest split into two
+halves and combined as h1 + i * h2 (double hashing).
+"""
+import hashlib
+import math
+
+import numpy as np
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return np.array([(h1 + i * h2) % self.size for i in range(self.hash_count)])
+
+    def add(self, value):
+        positions = self._positions(value)
+        np.bitwise_or.at(self.bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def __contains__(self, value):
+        positions = self._positions(value)
+        return bool(np.all(self.bits[positions >> 3] & (1 << (positions & 7)).astype(np.uint8)))
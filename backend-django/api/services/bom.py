@@ -0,0 +1,165 @@
+"""
+Ingredient Bill of Materials
+
+FragranceNote percentages form a (fragrance x ingredient) matrix of ml of
+ingredient per ml of product. Order lines (fragrance x size x qty) become a
+vector of ml per fragrance, and ingredient demand is one matrix product.
+
+Order lines are matched to fragrances on product_sku == Fragrance.sku; the
+line's size ("50ml") gives the volume, defaulting to DEFAULT_SIZE_ML.
+"""
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import FragranceNote, Ingredient, IngredientConsumption, Order, OrderItem
+
+
+DEFAULT_SIZE_ML = 8
+
+# Orders whose ingredients are committed to production
+CONSUMING_STATUSES = ['confirmed', 'processing', 'shipped', 'delivered']
+
+SIZE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*ml', re.IGNORECASE)
+
+
+def parse_size_ml(size):
+    match = SIZE_PATTERN.search(size or '')
+    return float(match.group(1)) if match else DEFAULT_SIZE_ML
+
+
+class BillOfMaterials:
+    """Fragrance x ingredient matrix (fraction of product volume)"""
+
+    def __init__(self):
+        notes = list(FragranceNote.objects.values_list(
+            'fragrance__sku', 'ingredient_id', 'percentage'
+        ))
+        self.fragrance_rows = {sku: i for i, sku in enumerate(sorted({n[0] for n in notes}))}
+        self.ingredient_ids = sorted({n[1] for n in notes})
+        columns = {pk: j for j, pk in enumerate(self.ingredient_ids)}
+
+        self.matrix = np.zeros((len(self.fragrance_rows), len(self.ingredient_ids)))
+        if notes:
+            np.add.at(
+                self.matrix,
+                (
+                    np.array([self.fragrance_rows[n[0]] for n in notes]),
+                    np.array([columns[n[1]] for n in notes]),
+                ),
+                np.array([float(n[2]) for n in notes]) / 100
+            )
+
+    def explode(self, lines):
+        """
+        Ingredient ml needed for `lines` of (sku, size, quantity).
+        Returns an array aligned with self.ingredient_ids.
+        """
+        rows, volumes = [], []
+        for sku, size, quantity in lines:
+            row = self.fragrance_rows.get(sku)
+            if row is not None:
+                rows.append(row)
+                volumes.append(parse_size_ml(size) * quantity)
+        product_ml = np.bincount(
+            np.array(rows, dtype=int), weights=np.array(volumes, dtype=float),
+            minlength=len(self.fragrance_rows)
+        )
+        return product_ml @ self.matrix
+
+
+def consume_batch(batch_size=500, since=None, bom=None):
+    """
+    Deduct ingredients for up to `batch_size` orders not yet consumed, in
+    one transaction: one F() update per ingredient and one consumption row
+    per order. Stock may go negative, which marks a shortfall.
+    `since` skips orders placed before stock tracking started.
+    Returns the number of orders consumed.
+    """
+    bom = bom or BillOfMaterials()
+    orders = Order.objects.filter(
+        status__in=CONSUMING_STATUSES,
+        ingredient_consumption__isnull=True
+    )
+    if since is not None:
+        orders = orders.filter(created_at__gte=since)
+
+    with transaction.atomic():
+        order_ids = list(
+            orders.select_for_update(skip_locked=True, of=('self',))
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+
+        lines_by_order = {}
+        for order_id, sku, size, quantity in OrderItem.objects.filter(
+            order_id__in=order_ids
+        ).values_list('order_id', 'product_sku', 'size', 'quantity'):
+            lines_by_order.setdefault(order_id, []).append((sku, size, quantity))
+
+        totals = np.zeros(len(bom.ingredient_ids))
+        consumptions = []
+        for order_id in order_ids:
+            demand = bom.explode(lines_by_order.get(order_id, []))
+            totals += demand
+            consumptions.append(IngredientConsumption(
+                order_id=order_id,
+                quantities={
+                    str(pk): round(float(ml), 4)
+                    for pk, ml in zip(bom.ingredient_ids, demand) if ml > 0
+                }
+            ))
+
+        for pk, ml in zip(bom.ingredient_ids, totals):
+            if ml > 0:
+                Ingredient.objects.filter(pk=pk).update(
+                    stock_quantity=F('stock_quantity') - Decimal(f"{ml:.2f}"),
+                    updated_at=timezone.now()
+                )
+        IngredientConsumption.objects.bulk_create(consumptions, batch_size=1000)
+    return len(order_ids)
+
+
+def forecast(days=30):
+    """
+    Project days until each active ingredient runs out, from the ingredient
+    demand of the last `days` days of orders.
+    """
+    bom = BillOfMaterials()
+    since = timezone.now() - timedelta(days=days)
+    lines = OrderItem.objects.filter(
+        order__created_at__gte=since
+    ).exclude(
+        order__status__in=['cancelled', 'refunded']
+    ).values_list('product_sku', 'size', 'quantity').iterator(chunk_size=5000)
+    daily = dict(zip(bom.ingredient_ids, bom.explode(lines) / days))
+
+    ingredients = list(Ingredient.objects.filter(is_active=True).values(
+        'id', 'name', 'unit', 'stock_quantity'
+    ))
+    stock = np.array([float(i['stock_quantity']) for i in ingredients])
+    usage = np.array([daily.get(i['id'], 0.0) for i in ingredients])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_left = np.where(usage > 0, np.maximum(stock, 0) / usage, np.nan)
+
+    today = timezone.localdate()
+    result = []
+    for i, ingredient in enumerate(ingredients):
+        runs_out = None if np.isnan(days_left[i]) else days_left[i]
+        result.append({
+            'id': ingredient['id'],
+            'name': ingredient['name'],
+            'unit': ingredient['unit'],
+            'stock_quantity': float(stock[i]),
+            'daily_usage': round(float(usage[i]), 4),
+            'days_left': None if runs_out is None else round(float(runs_out), 1),
+            'runs_out_on': None if runs_out is None else today + timedelta(days=int(runs_out)),
+        })
+    result.sort(key=lambda row: (row['days_left'] is None, row['days_left'] or 0))
+    return result
@@ -0,0 +1,197 @@
+"""
+Cohort Retention - monthly acquisition cohorts x months since first order
+
+Cells are computed with one window-function query: per-customer monthly
+order totals, with MIN(order month) over the customer as the cohort.
+Refreshes are incremental: when any of a customer's orders change, every
+month that customer ordered in is recomputed (their cohort may have moved),
+and only those months' cells are replaced.
+
+The table is built by `manage.py rollup_analytics` (run it once on deploy);
+requests never build it. Until it exists, matrix() computes the cells with
+the same query without storing them, and repeat_summary() falls back to one
+aggregate query over orders.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from ..models import CohortRetention, RollupWatermark
+from .analytics import EXCLUDED_ORDER_STATUSES, WATERMARK_OVERLAP
+
+
+WATERMARK = 'cohorts'
+
+CELLS_SQL = """
+    WITH monthly AS (
+        SELECT o.user_id,
+               date_trunc('month', o.created_at AT TIME ZONE %(tz)s)::date AS order_month,
+               COUNT(*) AS orders,
+               SUM(o.total_amount) AS revenue
+        FROM orders o
+        JOIN users u ON u.id = o.user_id AND u.role = 'customer'
+        WHERE o.status <> ALL(%(excluded)s) {user_filter}
+        GROUP BY 1, 2
+    ),
+    cohorts AS (
+        SELECT monthly.*,
+               MIN(order_month) OVER (PARTITION BY user_id) AS cohort_month,
+               SUM(orders) OVER (PARTITION BY user_id) AS lifetime_orders
+        FROM monthly
+    )
+    SELECT cohort_month,
+           order_month,
+           ((EXTRACT(YEAR FROM order_month) - EXTRACT(YEAR FROM cohort_month)) * 12
+            + EXTRACT(MONTH FROM order_month) - EXTRACT(MONTH FROM cohort_month))::int,
+           COUNT(*),
+           SUM(orders),
+           SUM(revenue),
+           COUNT(*) FILTER (WHERE order_month = cohort_month AND lifetime_orders >= 2)
+    FROM cohorts
+    {month_filter}
+    GROUP BY 1, 2
+"""
+
+REPEAT_CUSTOMERS_SQL = """
+    SELECT COUNT(*), COUNT(*) FILTER (WHERE orders >= 2)
+    FROM (
+        SELECT o.user_id, COUNT(*) AS orders
+        FROM orders o
+        JOIN users u ON u.id = o.user_id AND u.role = 'customer'
+        WHERE o.status <> ALL(%(excluded)s)
+        GROUP BY o.user_id
+    ) customers
+"""
+
+TOUCHED_MONTHS_SQL = """
+    SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE %(tz)s)::date
+    FROM orders
+    WHERE user_id IN (SELECT user_id FROM orders WHERE updated_at > %(since)s)
+"""
+
+
+def _cells(months=None):
+    params = {'tz': settings.TIME_ZONE, 'excluded': EXCLUDED_ORDER_STATUSES}
+    user_filter = month_filter = ''
+    if months is not None:
+        # Customers active in these months, with all their history (for MIN)
+        user_filter = """AND o.user_id IN (
+            SELECT user_id FROM orders
+            WHERE date_trunc('month', created_at AT TIME ZONE %(tz)s)::date = ANY(%(months)s::date[])
+        )"""
+        month_filter = 'WHERE order_month = ANY(%(months)s::date[])'
+        params['months'] = list(months)
+
+    with connection.cursor() as cursor:
+        cursor.execute(CELLS_SQL.format(user_filter=user_filter, month_filter=month_filter), params)
+        return [
+            CohortRetention(
+                cohort_month=row[0], order_month=row[1], months_since=row[2],
+                customers=row[3], orders=row[4], revenue=row[5], repeat_customers=row[6]
+            )
+            for row in cursor.fetchall()
+        ]
+
+
+def touched_months(since):
+    with connection.cursor() as cursor:
+        cursor.execute(TOUCHED_MONTHS_SQL, {'tz': settings.TIME_ZONE, 'since': since})
+        return {row[0] for row in cursor.fetchall()}
+
+
+def built():
+    return RollupWatermark.objects.filter(name=WATERMARK).exists()
+
+
+def run(full=False):
+    """Refresh cells for months affected since the last run (all with full=True)"""
+    started = timezone.now()
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+
+    if full or watermark is None:
+        cells = _cells()
+        with transaction.atomic():
+            CohortRetention.objects.all().delete()
+            CohortRetention.objects.bulk_create(cells, batch_size=1000)
+        count = len({cell.order_month for cell in cells})
+    else:
+        months = touched_months(watermark.value - WATERMARK_OVERLAP)
+        if months:
+            cells = _cells(months)
+            with transaction.atomic():
+                CohortRetention.objects.filter(order_month__in=months).delete()
+                CohortRetention.objects.bulk_create(cells, batch_size=1000)
+        count = len(months)
+
+    RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'value': started})
+    return count
+
+
+def matrix(start=None, end=None):
+    """
+    Retention matrix for cohorts in [start, end] (first-of-month dates).
+    Returns one dict per cohort with its size and per-month customers,
+    retention (% of size), orders and revenue, indexed by months since.
+    """
+    if built():
+        cells = CohortRetention.objects.all()
+        if start is not None:
+            cells = cells.filter(cohort_month__gte=start)
+        if end is not None:
+            cells = cells.filter(cohort_month__lte=end)
+        rows = list(cells.values_list('cohort_month', 'months_since', 'customers', 'orders', 'revenue'))
+    else:
+        rows = [
+            (cell.cohort_month, cell.months_since, cell.customers, cell.orders, cell.revenue)
+            for cell in _cells()
+            if (start is None or cell.cohort_month >= start) and (end is None or cell.cohort_month <= end)
+        ]
+    if not rows:
+        return []
+
+    cohort_months = sorted({row[0] for row in rows})
+    index = {month: i for i, month in enumerate(cohort_months)}
+    width = max(row[1] for row in rows) + 1
+    customers = np.zeros((len(cohort_months), width), dtype=np.int64)
+    orders = np.zeros_like(customers)
+    revenue = np.zeros((len(cohort_months), width))
+    for cohort_month, months_since, count, order_count, amount in rows:
+        i = index[cohort_month]
+        customers[i, months_since] = count
+        orders[i, months_since] = order_count
+        revenue[i, months_since] = float(amount)
+
+    sizes = customers[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retention = np.where(sizes[:, None] > 0, customers * 100.0 / sizes[:, None], 0.0)
+
+    current = timezone.localdate().replace(day=1)
+    result = []
+    for i, cohort_month in enumerate(cohort_months):
+        # Months after the current month have not happened yet
+        span = (current.year - cohort_month.year) * 12 + current.month - cohort_month.month + 1
+        span = max(1, min(span, width))
+        result.append({
+            'cohort': cohort_month.strftime('%Y-%m'),
+            'size': int(sizes[i]),
+            'customers': customers[i, :span].tolist(),
+            'retention': np.round(retention[i, :span], 2).tolist(),
+            'orders': orders[i, :span].tolist(),
+            'revenue': np.round(revenue[i, :span], 2).tolist(),
+        })
+    return result
+
+
+def repeat_summary():
+    """Customers with a (non-cancelled) order, and those with two or more"""
+    if not built():
+        with connection.cursor() as cursor:
+            cursor.execute(REPEAT_CUSTOMERS_SQL, {'excluded': EXCLUDED_ORDER_STATUSES})
+            return cursor.fetchone()
+
+    totals = CohortRetention.objects.filter(months_since=0).aggregate(
+        customers=Sum('customers'), repeat=Sum('repeat_customers')
+    )
+    return totals['customers'] or 0, totals['repeat'] or 0
@@ -0,0 +1,165 @@
+"""
+Inventory Rollups - per-location and per-size totals kept in step with
+stock changes, so the inventory dashboard reads a handful of rows instead
+of scanning every SKU.
+
+Writers call record_changes() with (before, after) states of the items they
+touched; deltas are merged per rollup key and applied as F() increments.
+rebuild() recomputes everything with grouped aggregate queries.
+
+Until the rollups have been built (rebuild_inventory_rollups, or the first
+summary() on an empty table) writers skip their deltas, and summary()
+answers from one aggregate query and seeds the table. Writers hold a shared
+advisory lock and seeding an exclusive one, so a change is either counted
+by the seed's read or applied as a delta on top of it, never both or
+neither.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from ..models import Inventory, InventoryRollup
+
+
+STATE_FIELDS = ['location', 'size', 'current_stock', 'cost_per_unit', 'reorder_level']
+
+DIMENSIONS = ['location', 'size']
+
+COUNTER_FIELDS = ['item_count', 'total_units', 'total_value', 'low_stock_count', 'out_of_stock_count']
+
+# pg_advisory_xact_lock key shared by writers and rebuilds
+ROLLUP_LOCK = 7301
+
+
+def _lock(shared=False):
+    function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {function}(%s)', [ROLLUP_LOCK])
+
+
+def state(item):
+    """Rollup-relevant fields of an Inventory instance"""
+    return {field: getattr(item, field) for field in STATE_FIELDS}
+
+
+def _contribution(item_state, sign):
+    stock = item_state['current_stock']
+    return {
+        'item_count': sign,
+        'total_units': sign * stock,
+        'total_value': sign * stock * Decimal(item_state['cost_per_unit']),
+        'low_stock_count': sign * int(stock <= item_state['reorder_level']),
+        'out_of_stock_count': sign * int(stock == 0),
+    }
+
+
+def record_changes(changes):
+    """
+    Apply rollup deltas for an iterable of (before, after) states.
+    Use None for `before` on create and for `after` on delete. Nothing is
+    applied before the rollups have been built; the build counts the change.
+    """
+    deltas = {}
+    for before, after in changes:
+        for item_state, sign in ((before, -1), (after, 1)):
+            if item_state is None:
+                continue
+            contribution = _contribution(item_state, sign)
+            for dimension in DIMENSIONS:
+                delta = deltas.setdefault(
+                    (dimension, item_state[dimension] or ''),
+                    dict.fromkeys(COUNTER_FIELDS, 0)
+                )
+                for field, amount in contribution.items():
+                    delta[field] += amount
+
+    deltas = {key: delta for key, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        _lock(shared=True)
+        if not InventoryRollup.objects.exists():
+            return
+        InventoryRollup.objects.bulk_create(
+            [InventoryRollup(dimension=d, key=k) for d, k in deltas],
+            ignore_conflicts=True
+        )
+        for (dimension, key), delta in deltas.items():
+            InventoryRollup.objects.filter(dimension=dimension, key=key).update(**{
+                field: F(field) + amount for field, amount in delta.items() if amount
+            })
+
+
+def record_change(before, after):
+    record_changes([(before, after)])
+
+
+def aggregates():
+    """Inventory totals as aggregate expressions (one query per use)"""
+    return {
+        'item_count': Count('id'),
+        'total_units': Coalesce(Sum('current_stock'), 0),
+        'total_value': Coalesce(
+            Sum(F('current_stock') * F('cost_per_unit'), output_field=DecimalField()),
+            Value(Decimal('0')),
+            output_field=DecimalField()
+        ),
+        'low_stock_count': Count('id', filter=Q(current_stock__lte=F('reorder_level'))),
+        'out_of_stock_count': Count('id', filter=Q(current_stock=0)),
+    }
+
+
+def _build():
+    rows = []
+    for dimension in DIMENSIONS:
+        for group in Inventory.objects.order_by().values(dimension).annotate(**aggregates()):
+            key = group.pop(dimension) or ''
+            rows.append(InventoryRollup(dimension=dimension, key=key, **group))
+    return rows
+
+
+def rebuild():
+    """Recompute all rollups from Inventory with one grouped query per dimension"""
+    with transaction.atomic():
+        _lock()
+        rows = _build()
+        InventoryRollup.objects.all().delete()
+        InventoryRollup.objects.bulk_create(rows)
+    return rows
+
+
+def seed():
+    """Build the rollups if nobody has yet; returns the current rows"""
+    with transaction.atomic():
+        _lock()
+        rows = list(InventoryRollup.objects.all())
+        if not rows:
+            rows = InventoryRollup.objects.bulk_create(_build())
+    return rows
+
+
+def summary():
+    """
+    Totals plus per-location and per-size breakdowns from the rollups.
+    When they have not been built yet, totals come from one aggregate query
+    over Inventory and the rollups are seeded for the next call.
+    """
+    rollups = list(InventoryRollup.objects.all())
+    totals = None
+    if not rollups:
+        totals = Inventory.objects.aggregate(**aggregates())
+        if totals['item_count']:
+            rollups = seed()
+
+    breakdown = {dimension: [] for dimension in DIMENSIONS}
+    location_totals = dict.fromkeys(COUNTER_FIELDS, 0)
+    for rollup in rollups:
+        values = {field: getattr(rollup, field) for field in COUNTER_FIELDS}
+        breakdown[rollup.dimension].append(dict(values, key=rollup.key))
+        if rollup.dimension == 'location':
+            for field in COUNTER_FIELDS:
+                location_totals[field] += values[field]
+    return totals or location_totals, breakdown
@@ -0,0 +1,206 @@
+"""
+Gross Margin - cost of goods sold against revenue
+
+Each order line keeps the unit cost that applied when it was sold
+(OrderItem.unit_cost): the matching Inventory.cost_per_unit (same SKU, or
+same product/fragrance and size), else the fragrance's ingredient cost
+per ml from its notes times the line's volume. Costs are snapshotted when
+the order is placed; lines from before that are backfilled by the rollup
+job. The rollup carries COGS into analytics_products, so the period
+series reads one row per product per day rather than every order line.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .analytics import EXCLUDED_ORDER_STATUSES, GRANULARITIES, _day_start, live_from, live_products
+from .bom import DEFAULT_SIZE_ML
+
+
+COST_BASIS_SQL = """
+    WITH lines AS (
+        SELECT oi.id, oi.product_id, oi.product_sku, oi.size, f.id AS fragrance_id,
+               COALESCE(
+                   SUBSTRING(LOWER(oi.size) FROM '([0-9]+(?:\\.[0-9]+)?)\\s*ml')::numeric,
+                   %(default_ml)s
+               ) AS size_ml
+        FROM order_items oi
+        LEFT JOIN fragrances f ON f.sku = oi.product_sku
+        WHERE oi.unit_cost IS NULL AND {scope}
+    ),
+    costs AS (
+        SELECT l.id, COALESCE(inv.cost_per_unit, bom.cost_per_ml * l.size_ml) AS unit_cost
+        FROM lines l
+        LEFT JOIN LATERAL (
+            SELECT i.cost_per_unit
+            FROM inventory i
+            WHERE i.cost_per_unit > 0
+              AND (i.sku = l.product_sku
+                   OR (REPLACE(LOWER(i.size), ' ', '') = REPLACE(LOWER(l.size), ' ', '')
+                       AND (i.product_id = l.product_id OR i.fragrance_id = l.fragrance_id)))
+            ORDER BY i.sku = l.product_sku DESC, i.id
+            LIMIT 1
+        ) inv ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT SUM(n.percentage / 100 * g.cost_per_unit) AS cost_per_ml
+            FROM fragrance_notes n
+            JOIN ingredients g ON g.id = n.ingredient_id
+            WHERE n.fragrance_id = l.fragrance_id
+        ) bom ON TRUE
+    ),
+    costed AS (
+        UPDATE order_items oi
+        SET unit_cost = ROUND(c.unit_cost, 2)
+        FROM costs c
+        WHERE oi.id = c.id AND c.unit_cost IS NOT NULL
+        RETURNING oi.order_id
+    )
+    SELECT DISTINCT (o.created_at AT TIME ZONE %(tz)s)::date
+    FROM orders o
+    WHERE o.id IN (SELECT order_id FROM costed)
+"""
+
+SNAPSHOT_SQL = COST_BASIS_SQL.format(scope='oi.order_id = ANY(%(orders)s)')
+
+BACKFILL_SQL = COST_BASIS_SQL.format(scope='TRUE')
+
+# Gap-filled local periods from the rollup (days before analytics.live_from())
+MARGIN_SERIES_SQL = """
+    WITH buckets AS (
+        SELECT generate_series(
+            date_trunc(%(unit)s, %(first)s::timestamp),
+            date_trunc(%(unit)s, %(last)s::timestamp),
+            %(step)s::interval
+        ) AS bucket
+    ),
+    sales AS (
+        SELECT date_trunc(%(unit)s, date::timestamp) AS bucket,
+               SUM(revenue) AS revenue,
+               SUM(cogs) AS cogs,
+               SUM(costed_revenue) AS costed_revenue
+        FROM analytics_products
+        WHERE date >= %(first)s AND date <= %(last)s AND date < %(live_from)s
+        GROUP BY 1
+    )
+    SELECT b.bucket::date,
+           COALESCE(s.revenue, 0),
+           COALESCE(s.cogs, 0),
+           COALESCE(s.costed_revenue, 0)
+    FROM buckets b
+    LEFT JOIN sales s ON s.bucket = b.bucket
+    ORDER BY 1
+"""
+
+BREAKDOWN_SQL = """
+    SELECT oi.product_id,
+           f.id AS fragrance_id,
+           oi.product_sku,
+           MAX(oi.product_name),
+           oi.size,
+           SUM(oi.quantity),
+           SUM(oi.total_price),
+           COALESCE(SUM(oi.quantity * oi.unit_cost), 0),
+           COALESCE(SUM(oi.total_price) FILTER (WHERE oi.unit_cost IS NOT NULL), 0)
+    FROM order_items oi
+    JOIN orders o ON o.id = oi.order_id
+    LEFT JOIN fragrances f ON oi.product_id IS NULL AND f.sku = oi.product_sku
+    WHERE o.created_at >= %(start)s AND o.created_at < %(end)s
+      AND o.status <> ALL(%(excluded)s)
+    GROUP BY oi.product_id, f.id, oi.product_sku, oi.size
+    ORDER BY 7 DESC
+"""
+
+
+def snapshot_costs(order_ids):
+    """Fix the cost basis of the given orders' lines (call when placing them)"""
+    with connection.cursor() as cursor:
+        cursor.execute(SNAPSHOT_SQL, {
+            'orders': list(order_ids),
+            'default_ml': DEFAULT_SIZE_ML,
+            'tz': settings.TIME_ZONE,
+        })
+
+
+def backfill_costs():
+    """
+    Cost lines that have no cost basis yet, at today's costs. Returns the
+    local days of the orders that changed, for the rollup to recompute.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(BACKFILL_SQL, {'default_ml': DEFAULT_SIZE_ML, 'tz': settings.TIME_ZONE})
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _margins(revenue, cogs, costed_revenue):
+    gross_margin = costed_revenue - cogs
+    return {
+        'revenue': revenue,
+        'cogs': cogs,
+        'gross_margin': gross_margin,
+        'margin_percent': round(gross_margin / costed_revenue * 100, 2) if costed_revenue else None,
+        'uncosted_revenue': revenue - costed_revenue,
+    }
+
+
+def period_start(granularity, day):
+    """The bucket date date_trunc() gives `day` (weeks start on Monday)"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def series(granularity, first, last):
+    """
+    Revenue, COGS and gross margin per local day/week/month for dates
+    first..last inclusive. Days the rollup covers come from
+    analytics_products, later ones from the raw order lines. Margin is taken over lines with a cost
+    basis; revenue from lines without one is reported as uncosted_revenue.
+    """
+    live = live_from()
+    params = {
+        'unit': granularity,
+        'step': GRANULARITIES[granularity],
+        'first': first,
+        'last': last,
+        'live_from': live,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(MARGIN_SERIES_SQL, params)
+        rows = {row[0]: list(row) for row in cursor.fetchall()}
+
+    for day, _, sales in live_products(max(first, live), min(last, timezone.localdate())):
+        row = rows[period_start(granularity, day)]
+        for column, field in enumerate(('revenue', 'cogs', 'costed_revenue'), start=1):
+            row[column] += sales[field]
+
+    return [
+        {'period': period, **_margins(revenue, cogs, costed_revenue)}
+        for period, revenue, cogs, costed_revenue in rows.values()
+    ]
+
+
+def breakdown(first, last):
+    """Revenue, COGS and margin per product/fragrance and size over first..last"""
+    with connection.cursor() as cursor:
+        cursor.execute(BREAKDOWN_SQL, {
+            'start': _day_start(first),
+            'end': _day_start(last + timedelta(days=1)),
+            'excluded': EXCLUDED_ORDER_STATUSES,
+        })
+        return [
+            {
+                'product_id': product_id,
+                'fragrance_id': fragrance_id,
+                'sku': sku,
+                'name': name,
+                'size': size,
+                'quantity': quantity,
+                **_margins(revenue, cogs, costed_revenue),
+            }
+            for product_id, fragrance_id, sku, name, size, quantity, revenue, cogs, costed_revenue
+            in cursor.fetchall()
+        ]
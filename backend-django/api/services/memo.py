@@ -0,0 +1,44 @@
+"""
+Memoization - short-TTL cached results with stale-while-revalidate
+
+Within `ttl` seconds the cached value is returned as-is. For a further
+`stale_ttl` seconds the stale value is still returned immediately while one
+background thread recomputes it, so readers never wait on a refresh and
+concurrent readers trigger at most one. Older (or missing) values are
+computed inline.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections
+
+
+def memoize(key, compute, ttl, stale_ttl=0):
+    entry = cache.get(key)
+    if entry is not None:
+        value, computed_at = entry
+        age = time.time() - computed_at
+        if age < ttl:
+            return value
+        if age < ttl + stale_ttl:
+            if cache.add(f'{key}:refreshing', True, timeout=max(ttl, 10)):
+                threading.Thread(
+                    target=_refresh_in_background, args=(key, compute, ttl, stale_ttl), daemon=True
+                ).start()
+            return value
+    return refresh(key, compute, ttl, stale_ttl)
+
+
+def refresh(key, compute, ttl, stale_ttl=0):
+    value = compute()
+    cache.set(key, (value, time.time()), timeout=ttl + stale_ttl)
+    return value
+
+
+def _refresh_in_background(key, compute, ttl, stale_ttl):
+    try:
+        refresh(key, compute, ttl, stale_ttl)
+    finally:
+        cache.delete(f'{key}:refreshing')
+        connections.close_all()
@@ -0,0 +1,193 @@
+"""
+Notification Inbox - per-user read state over shared broadcast rows
+
+A user's inbox is their own notifications plus every broadcast. The two
+are listed as a UNION ALL of two index-backed scans (notifications_user_idx
+and the partial notifications_broadcast_idx) rather than one OR filter.
+
+Read state: a user's own rows carry is_read; broadcasts are shared, so a
+broadcast counts as read for a user when its id is at or below the user's
+watermark (NotificationReadState.read_through) or the user has a
+NotificationReceipt for it. "Mark all as read" just moves the watermark to
+the newest notification id, whatever the size of the inbox.
+
+Unread badge: unread_count() answers from two cache entries - the user's
+read state and unread own notifications, and the shared, sorted list of
+broadcast ids - and counts unread broadcasts by bisecting the list at the
+watermark. Entries are keyed by a per-user and a broadcast version token;
+any change (a new or deleted notification, a read, a bulk insert) deletes
+the token instead of editing the entries in place, so a recount racing a
+change can only land under a version nobody reads again. Everything
+expires after NOTIFICATION_COUNTER_TTL. Notifications are mostly created
+by the outbox worker: with a shared cache (REDIS_URL) the badge sees them
+at once; with the default per-process cache a web process sees them when
+its entries expire, which is why the TTL defaults to 30 seconds there.
+"""
+import time
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q
+
+from ..models import Notification, NotificationReadState, NotificationReceipt
+
+
+def read_through(user):
+    return NotificationReadState.objects.filter(user=user).values_list(
+        'read_through', flat=True
+    ).first() or 0
+
+
+def _receipt(user):
+    return Exists(NotificationReceipt.objects.filter(user=user, notification=OuterRef('pk')))
+
+
+class Inbox:
+    """
+    The user's notifications and all broadcasts, newest first, annotated
+    with read_state. Countable and sliceable, so it pages like a queryset.
+    A slice is one UNION ALL whose arms are each cut to the slice end on
+    their own index, so a page reads at most `stop` rows from either side.
+    """
+    ORDERING = ('-created_at', '-id')
+
+    def __init__(self, user):
+        self.user = user
+        self.watermark = read_through(user)
+
+    def own(self):
+        return Notification.objects.filter(user=self.user)
+
+    def broadcasts(self):
+        return Notification.objects.filter(is_broadcast=True)
+
+    def count(self):
+        return self.own().count() + self.broadcasts().count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        own = self.own().annotate(read_state=ExpressionWrapper(
+            Q(is_read=True) | Q(pk__lte=self.watermark),
+            output_field=BooleanField()
+        )).order_by(*self.ORDERING)
+        broadcasts = self.broadcasts().annotate(read_state=ExpressionWrapper(
+            Q(pk__lte=self.watermark) | Q(_receipt(self.user)),
+            output_field=BooleanField()
+        )).order_by(*self.ORDERING)
+        if index.stop is not None:
+            own, broadcasts = own[:index.stop], broadcasts[:index.stop]
+        return own.union(broadcasts, all=True).order_by(*self.ORDERING)[index]
+
+
+def visible(user):
+    """Filterable form of Inbox for single-notification lookups"""
+    watermark = read_through(user)
+    return Notification.objects.filter(
+        Q(user=user) | Q(is_broadcast=True)
+    ).annotate(read_state=ExpressionWrapper(
+        Q(user=user, is_read=True) | Q(pk__lte=watermark) | Q(_receipt(user)),
+        output_field=BooleanField()
+    ))
+
+
+def mark_read(user, notification):
+    watermark = read_through(user)
+    if notification.user_id == user.pk:
+        updated = Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True)
+        notification.is_read = True
+        if updated and notification.pk > watermark:
+            _invalidate(user.pk)
+    elif notification.is_broadcast and notification.pk > watermark:
+        _, created = NotificationReceipt.objects.get_or_create(user=user, notification=notification)
+        if created:
+            _invalidate(user.pk)
+    notification.read_state = True
+
+
+def mark_all_read(user):
+    """Move the user's watermark to the newest notification"""
+    latest = Notification.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    NotificationReadState.objects.update_or_create(user=user, defaults={'read_through': latest})
+    _invalidate(user.pk)
+    return latest
+
+
+BROADCASTS_VERSION_KEY = 'notifications:broadcasts:version'
+
+
+def _version_key(user_id):
+    return f'notifications:version:{user_id}'
+
+
+def _invalidate(user_id):
+    cache.delete(_version_key(user_id))
+
+
+def _version(key, cached):
+    """The key's current token, starting a new one if it has none"""
+    if key not in cached:
+        cache.add(key, time.time_ns(), timeout=settings.NOTIFICATION_COUNTER_TTL)
+        # Deleted again in between: count now and cache under a throwaway token
+        return cache.get(key) or time.time_ns()
+    return cached[key]
+
+
+def _read_state(user):
+    watermark = read_through(user)
+    receipts = frozenset(NotificationReceipt.objects.filter(
+        user=user, notification_id__gt=watermark
+    ).values_list('notification_id', flat=True))
+    own = Notification.objects.filter(user=user, is_read=False, pk__gt=watermark).count()
+    return watermark, receipts, own
+
+
+def unread_count(user):
+    """Unread notifications for the badge; a cache lookup when the entries are warm"""
+    user_key = _version_key(user.pk)
+    versions = cache.get_many([user_key, BROADCASTS_VERSION_KEY])
+    state_key = f'notifications:read:{user.pk}:{_version(user_key, versions)}'
+    broadcasts_key = f'notifications:broadcasts:{_version(BROADCASTS_VERSION_KEY, versions)}'
+    cached = cache.get_many([state_key, broadcasts_key])
+
+    state = cached.get(state_key)
+    if state is None:
+        state = _read_state(user)
+        cache.set(state_key, state, timeout=settings.NOTIFICATION_COUNTER_TTL)
+    watermark, receipts, own = state
+
+    broadcasts = cached.get(broadcasts_key)
+    if broadcasts is None:
+        broadcasts = tuple(Notification.objects.filter(
+            is_broadcast=True
+        ).order_by('pk').values_list('pk', flat=True))
+        cache.set(broadcasts_key, broadcasts, timeout=settings.NOTIFICATION_COUNTER_TTL)
+
+    # Receipts of since-deleted broadcasts are simply not found here
+    unread_broadcasts = sum(
+        1 for pk in broadcasts[bisect_right(broadcasts, watermark):] if pk not in receipts
+    )
+    return own + unread_broadcasts
+
+
+def notification_created(notification):
+    if notification.is_broadcast:
+        cache.delete(BROADCASTS_VERSION_KEY)
+    elif notification.user_id and not notification.is_read:
+        _invalidate(notification.user_id)
+
+
+def notification_deleted(notification):
+    if notification.is_broadcast:
+        cache.delete(BROADCASTS_VERSION_KEY)
+    elif notification.user_id:
+        _invalidate(notification.user_id)
+
+
+def recipients_added(user_ids, batch_size=1000):
+    """Recount the badges of users who got rows inserted in bulk (no signals)"""
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), batch_size):
+        cache.delete_many([_version_key(user_id) for user_id in user_ids[start:start + batch_size]])
@@ -0,0 +1,81 @@
+"""
+Order Status - bulk status changes
+
+bulk_transition() locks the requested orders, reads their current status
+and moves the ones in a valid source state in a single statement, so the
+status it reports (and publishes as from_status) is the one the update
+actually replaced, even when another request changes the same orders.
+"""
+from django.db import connection, transaction
+
+from ..models import Order
+from .outbox import publish_many, order_status_payload
+
+
+BULK_TRANSITION_SQL = """
+    WITH old AS (
+        SELECT id, status FROM {table}
+        WHERE id = ANY(%(ids)s)
+        ORDER BY id
+        FOR UPDATE
+    ),
+    moved AS (
+        UPDATE {table} o SET {assignments}
+        FROM old
+        WHERE o.id = old.id AND old.status = ANY(%(sources)s)
+        RETURNING o.id, o.order_number, o.user_id
+    )
+    SELECT old.id, old.status, moved.id IS NOT NULL, moved.order_number, moved.user_id
+    FROM old
+    LEFT JOIN moved ON moved.id = old.id
+"""
+
+
+def bulk_transition(order_ids, to_status):
+    """
+    Move many orders to `to_status` in one guarded UPDATE.
+
+    Orders whose current status is not a valid source state are left alone
+    and reported as unchanged or invalid_transition. An order.status_changed
+    outbox event is written for every updated order in the same transaction.
+    Returns a list of per-order outcomes in request order.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    sources = Order.source_statuses(to_status)
+
+    assignments = 'status = %(status)s, updated_at = NOW()'
+    if to_status == 'delivered':
+        assignments += ', delivered_at = NOW()'
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                BULK_TRANSITION_SQL.format(table=Order._meta.db_table, assignments=assignments),
+                {'ids': order_ids, 'sources': sources, 'status': to_status}
+            )
+            rows = cursor.fetchall()
+
+        current = {pk: status for pk, status, _, _, _ in rows}
+        updated = {pk for pk, _, moved, _, _ in rows if moved}
+        publish_many('order.status_changed', [
+            order_status_payload(pk, number, user_id, to_status, status)
+            for pk, status, moved, number, user_id in rows if moved
+        ])
+
+    results = []
+    for pk in order_ids:
+        from_status = current.get(pk)
+        if from_status is None:
+            outcome = 'not_found'
+        elif pk in updated:
+            outcome = 'updated'
+        elif from_status == to_status:
+            outcome = 'unchanged'
+        else:
+            outcome = 'invalid_transition'
+        results.append({
+            'id': pk,
+            'from_status': from_status,
+            'outcome': outcome,
+        })
+    return results
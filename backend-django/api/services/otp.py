@@ -0,0 +1,172 @@
+"""
+OTP Backend - one-time codes kept in the cache, with rate limits
+
+Codes live under a per-phone cache key that expires with the code, so
+issuing and verifying never touch the database and nothing needs cleaning
+up. Only an HMAC of the code is stored; the code itself reaches the
+database only inside the queued SMS that delivers it, which is blanked
+once sent or expired (see services.sms). Each code allows a fixed number
+of wrong guesses (an atomic cache counter; correct ones are not counted);
+sends and verifications are also throttled per phone and per client IP
+with token buckets. With the default local-memory cache all of this is per
+process; point CACHES (REDIS_URL) at a shared cache when running several
+workers.
+
+The backend class is chosen by settings.OTP_BACKEND. When OTP_AUDIT is on,
+issued and verified codes are also recorded as OTP rows (without the code).
+"""
+import hashlib
+import hmac
+import secrets
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from ..models import OTP
+
+
+class OTPError(Exception):
+    """Code is wrong, expired, or out of attempts"""
+
+
+class OTPRateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f'Rate limited, retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    `capacity` tokens refilled at one per `refill_seconds`, stored as
+    (tokens, updated_at) in the cache. The read-modify-write runs under a
+    short cache.add() lock so concurrent workers cannot both spend the last
+    token; if the lock stays busy the request is treated as limited.
+    """
+    LOCK_RETRIES = 5
+    LOCK_WAIT_SECONDS = 0.01
+
+    def __init__(self, cache, prefix, capacity, refill_seconds):
+        self.cache = cache
+        self.prefix = prefix
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+
+    def consume(self, key):
+        """Take one token for `key`, or raise OTPRateLimited"""
+        bucket_key = f'{self.prefix}:{key}'
+        lock_key = f'{bucket_key}:lock'
+        for _ in range(self.LOCK_RETRIES):
+            if self.cache.add(lock_key, True, timeout=1):
+                break
+            time.sleep(self.LOCK_WAIT_SECONDS)
+        else:
+            raise OTPRateLimited(1)
+
+        try:
+            now = time.time()
+            tokens, updated_at = self.cache.get(bucket_key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) / self.refill_seconds)
+            if tokens < 1:
+                raise OTPRateLimited(int((1 - tokens) * self.refill_seconds) + 1)
+            self.cache.set(
+                bucket_key, (tokens - 1, now),
+                timeout=int(self.capacity * self.refill_seconds) + 1
+            )
+        finally:
+            self.cache.delete(lock_key)
+
+
+class BaseOTPBackend:
+    """Issue and check one-time codes for a phone number"""
+
+    def issue(self, phone, ip=None):
+        """Create a new code for `phone` (replacing any previous one) and return it"""
+        raise NotImplementedError
+
+    def verify(self, phone, code, ip=None, consume=True):
+        """
+        Check `code`. Consuming it makes it unusable afterwards; otherwise
+        it stays valid (marked verified) until it expires. Raises OTPError
+        or OTPRateLimited.
+        """
+        raise NotImplementedError
+
+
+class CacheOTPBackend(BaseOTPBackend):
+
+    def __init__(self):
+        self.cache = caches[settings.OTP_CACHE_ALIAS]
+        self.ttl = settings.OTP_TTL_SECONDS
+        self.send_limits = {
+            'phone': TokenBucket(self.cache, 'otp:send:phone', *settings.OTP_SEND_LIMIT_PER_PHONE),
+            'ip': TokenBucket(self.cache, 'otp:send:ip', *settings.OTP_SEND_LIMIT_PER_IP),
+        }
+        self.verify_limits = {
+            'ip': TokenBucket(self.cache, 'otp:verify:ip', *settings.OTP_VERIFY_LIMIT_PER_IP),
+        }
+
+    def _digest(self, phone, code):
+        return hmac.new(settings.SECRET_KEY.encode(), f'{phone}:{code}'.encode(), hashlib.sha256).hexdigest()
+
+    def _throttle(self, limits, phone, ip):
+        if 'phone' in limits:
+            limits['phone'].consume(phone)
+        if ip and 'ip' in limits:
+            limits['ip'].consume(ip)
+
+    def issue(self, phone, ip=None):
+        self._throttle(self.send_limits, phone, ip)
+        code = f'{secrets.randbelow(900000) + 100000}'
+        self.cache.set_many({
+            f'otp:code:{phone}': {
+                'digest': self._digest(phone, code),
+                'expires_at': time.time() + self.ttl,
+                'verified': False,
+            },
+            f'otp:attempts:{phone}': 0,
+        }, timeout=self.ttl)
+        if settings.OTP_AUDIT:
+            OTP.objects.create(
+                phone=phone,
+                otp='',
+                expires_at=timezone.now() + timedelta(seconds=self.ttl)
+            )
+        return code
+
+    def verify(self, phone, code, ip=None, consume=True):
+        self._throttle(self.verify_limits, phone, ip)
+        entry = self.cache.get(f'otp:code:{phone}')
+        if entry is None:
+            raise OTPError('Invalid or expired OTP')
+
+        if not hmac.compare_digest(entry['digest'], self._digest(phone, code)):
+            # Only wrong guesses count, so verify followed by login costs nothing
+            try:
+                attempts = self.cache.incr(f'otp:attempts:{phone}')
+            except ValueError:
+                # Counter expired together with the code
+                raise OTPError('Invalid or expired OTP')
+            if attempts >= settings.OTP_MAX_ATTEMPTS:
+                self.cache.delete_many([f'otp:code:{phone}', f'otp:attempts:{phone}'])
+                raise OTPError('Too many attempts, request a new OTP')
+            raise OTPError('Invalid or expired OTP')
+
+        if consume:
+            self.cache.delete_many([f'otp:code:{phone}', f'otp:attempts:{phone}'])
+        elif not entry['verified']:
+            # Keep the code for the login that follows, without extending it
+            remaining = entry['expires_at'] - time.time()
+            if remaining > 0:
+                self.cache.set(f'otp:code:{phone}', dict(entry, verified=True), timeout=remaining)
+        if settings.OTP_AUDIT and not entry['verified']:
+            OTP.objects.filter(phone=phone, is_verified=False).update(is_verified=True)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.OTP_BACKEND)()
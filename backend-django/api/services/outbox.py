@@ -0,0 +1,139 @@
+"""
+Transactional Outbox
+
+Call publish() inside the transaction that changes orders/payments; the
+event row commits (or rolls back) together with the change. A worker
+(`manage.py run_outbox_worker`) drains pending events in batches and runs
+the registered handlers, retrying failures with exponential backoff.
+Delivery is at-least-once, so handlers must be idempotent.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import OutboxEvent, Notification, SmsMessage, User
+from . import sms
+from .backoff import backoff_delay
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+
+HANDLERS = {}
+
+
+def register(topic):
+    """Decorator registering a handler(payload) for a topic"""
+    def decorator(func):
+        HANDLERS.setdefault(topic, []).append(func)
+        return func
+    return decorator
+
+
+def publish(topic, payload):
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def publish_many(topic, payloads):
+    return OutboxEvent.objects.bulk_create(
+        [OutboxEvent(topic=topic, payload=payload) for payload in payloads]
+    )
+
+
+def drain(batch_size=100):
+    """
+    Process one batch of due events. Returns the number of events claimed.
+
+    Rows are claimed with SKIP LOCKED so several workers can drain in
+    parallel without handing out the same event twice.
+    """
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True).filter(
+                status='pending',
+                available_at__lte=timezone.now()
+            ).order_by('id')[:batch_size]
+        )
+
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    for handler in HANDLERS.get(event.topic, []):
+                        handler(event.payload)
+            except Exception as exc:
+                logger.exception('Outbox event %s (%s) failed', event.pk, event.topic)
+                event.last_error = f"{type(exc).__name__}: {exc}"
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = 'failed'
+                else:
+                    event.available_at = timezone.now() + backoff_delay(event.attempts)
+            else:
+                event.status = 'done'
+                event.processed_at = timezone.now()
+
+        OutboxEvent.objects.bulk_update(
+            events,
+            ['status', 'attempts', 'available_at', 'last_error', 'processed_at']
+        )
+    return len(events)
+
+
+# ===== Handlers =====
+
+ORDER_STATUS_MESSAGES = {
+    'confirmed': 'Your order {order_number} has been confirmed.',
+    'processing': 'Your order {order_number} is being prepared.',
+    'shipped': 'Your order {order_number} has been shipped.',
+    'delivered': 'Your order {order_number} has been delivered.',
+    'cancelled': 'Your order {order_number} has been cancelled.',
+    'refunded': 'Your order {order_number} has been refunded.',
+}
+
+
+@register('order.status_changed')
+def notify_order_status(payload):
+    template = ORDER_STATUS_MESSAGES.get(payload['status'])
+    if not template:
+        return
+    Notification.objects.create(
+        user_id=payload['user_id'],
+        type='order',
+        title=f"Order {payload['status']}",
+        message=template.format(order_number=payload['order_number']),
+        metadata={'order_id': payload['order_id'], 'status': payload['status']}
+    )
+
+
+@register('order.status_changed')
+def text_order_status(payload):
+    template = ORDER_STATUS_MESSAGES.get(payload['status'])
+    if not template:
+        return
+    phone = User.objects.filter(
+        pk=payload['user_id'], notifications_enabled=True
+    ).values_list('phone', flat=True).first()
+    if phone:
+        sms.enqueue(
+            phone,
+            template.format(order_number=payload['order_number']),
+            priority=SmsMessage.PRIORITY_TRANSACTIONAL
+        )
+
+
+def order_status_payload(order_id, order_number, user_id, status, from_status):
+    return {
+        'order_id': order_id,
+        'order_number': order_number,
+        'user_id': user_id,
+        'status': status,
+        'from_status': from_status,
+    }
+
+
+def publish_order_status(order, from_status):
+    return publish('order.status_changed', order_status_payload(
+        order.pk, order.order_number, order.user_id, order.status, from_status
+    ))
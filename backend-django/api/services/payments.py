@@ -0,0 +1,255 @@
+"""
+Payment Services - order confirmation and gateway webhook processing
+
+Webhooks are verified and stored by PaymentViewSet.webhook, which answers
+immediately. `manage.py run_payment_webhook_worker` applies them to
+Payment/Order rows; each transaction hashes to a fixed shard so its events
+are applied by one worker thread, in arrival order.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import uuid
+import zlib
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from ..models import Order, Payment, PaymentWebhookEvent
+from .backoff import backoff_delay
+from .outbox import publish, publish_order_status
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+EVENT_TYPES = ['payment.captured', 'payment.failed', 'refund.processed']
+
+
+def confirm_order(payment):
+    """
+    Mark the payment's order paid/confirmed and record the side effects in
+    the outbox. Must run inside the caller's transaction.
+    """
+    order = payment.order
+    from_status = order.status
+    order.payment_status = 'paid'
+    if Order.can_transition(from_status, 'confirmed'):
+        order.status = 'confirmed'
+    order.save()
+
+    publish('payment.succeeded', {
+        'payment_id': payment.pk,
+        'transaction_id': payment.transaction_id,
+        'order_id': order.pk,
+        'user_id': payment.user_id,
+        'amount': str(payment.amount),
+        'method': payment.method,
+    })
+    if from_status != order.status:
+        publish_order_status(order, from_status)
+
+
+# ===== Webhook ingestion =====
+
+def sign(body, secret=None):
+    secret = secret if secret is not None else settings.PAYMENT_WEBHOOK_SECRET
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, signature):
+    if not settings.PAYMENT_WEBHOOK_SECRET or not signature:
+        return False
+    return hmac.compare_digest(sign(body), signature)
+
+
+def shard_for(gateway_transaction_id):
+    return zlib.crc32(gateway_transaction_id.encode()) % PaymentWebhookEvent.SHARD_COUNT
+
+
+def ingest(payload):
+    """
+    Queue a webhook payload. Returns (event, created); a repeat of an
+    already-seen (gateway_transaction_id, event) pair is not stored again.
+    """
+    data = payload.get('data') or {}
+    event_type = payload.get('event')
+    gateway_transaction_id = str(data.get('gateway_transaction_id') or '')
+    if event_type not in EVENT_TYPES or not gateway_transaction_id:
+        raise ValueError('Webhook must carry a known event and data.gateway_transaction_id')
+
+    try:
+        with transaction.atomic():
+            event = PaymentWebhookEvent.objects.create(
+                event_type=event_type,
+                gateway_transaction_id=gateway_transaction_id,
+                transaction_id=str(data.get('transaction_id') or ''),
+                payload=payload,
+                shard=shard_for(gateway_transaction_id)
+            )
+    except IntegrityError:
+        return None, False
+    return event, True
+
+
+# ===== Webhook processing =====
+
+def _find_payment(event):
+    payments = Payment.objects.select_for_update().select_related('order')
+    if event.transaction_id:
+        payment = payments.filter(transaction_id=event.transaction_id).first()
+        if payment:
+            return payment
+    return payments.filter(gateway_transaction_id=event.gateway_transaction_id).first()
+
+
+def mark_captured(payment, data):
+    """pending/failed -> success, confirming the order. Returns False if not allowed."""
+    if payment.status not in ('pending', 'failed'):
+        return False
+    payment.status = 'success'
+    payment.gateway_response = data
+    payment.save()
+    confirm_order(payment)
+    return True
+
+
+def mark_failed(payment, data):
+    if payment.status != 'pending':
+        return False
+    payment.status = 'failed'
+    payment.gateway_response = data
+    payment.save()
+    order = payment.order
+    order.payment_status = 'failed'
+    order.save()
+    return True
+
+
+def mark_refunded(payment):
+    if payment.status != 'success':
+        return False
+    payment.status = 'refunded'
+    payment.save()
+    order = payment.order
+    from_status = order.status
+    order.payment_status = 'refunded'
+    if Order.can_transition(from_status, 'refunded'):
+        order.status = 'refunded'
+    order.save()
+    if from_status != order.status:
+        publish_order_status(order, from_status)
+    return True
+
+
+def apply_event(event):
+    """Apply one webhook event. Returns the resulting event status."""
+    payment = _find_payment(event)
+    if payment is None:
+        event.last_error = 'Unknown transaction'
+        return 'ignored'
+
+    data = event.payload.get('data') or {}
+
+    if event.event_type == 'payment.captured':
+        if payment.status not in ('pending', 'failed'):
+            return 'ignored'
+        try:
+            amount = Decimal(str(data.get('amount')))
+        except InvalidOperation:
+            amount = None
+        if amount != payment.amount:
+            event.last_error = f"Amount mismatch: gateway {data.get('amount')}, expected {payment.amount}"
+            return 'ignored'
+        payment.gateway_transaction_id = event.gateway_transaction_id
+        applied = mark_captured(payment, data)
+
+    elif event.event_type == 'payment.failed':
+        payment.gateway_transaction_id = event.gateway_transaction_id
+        applied = mark_failed(payment, data)
+
+    elif event.event_type == 'refund.processed':
+        applied = mark_refunded(payment)
+
+    return 'processed' if applied else 'ignored'
+
+
+def process_batch(shards, batch_size=100):
+    """
+    Claim and apply pending events from `shards` in id order.
+
+    A failed event is retried with exponential backoff. Until it succeeds,
+    later events of the same transaction stay pending, in this batch and in
+    later ones, so the failed one is always applied first.
+    Returns the number of events claimed.
+    """
+    now = timezone.now()
+    waiting = PaymentWebhookEvent.objects.filter(
+        gateway_transaction_id=OuterRef('gateway_transaction_id'),
+        status='pending',
+        id__lt=OuterRef('id'),
+        available_at__gt=now
+    )
+    with transaction.atomic():
+        events = list(
+            PaymentWebhookEvent.objects.select_for_update(skip_locked=True).filter(
+                status='pending',
+                shard__in=shards,
+                available_at__lte=now
+            ).exclude(Exists(waiting)).order_by('id')[:batch_size]
+        )
+
+        blocked = set()
+        for event in events:
+            if event.gateway_transaction_id in blocked:
+                continue
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    event.status = apply_event(event)
+                    event.processed_at = timezone.now()
+            except Exception as exc:
+                logger.exception('Webhook event %s failed', event.pk)
+                event.last_error = f"{type(exc).__name__}: {exc}"
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = 'failed'
+                else:
+                    event.status = 'pending'
+                    event.available_at = timezone.now() + backoff_delay(event.attempts)
+                blocked.add(event.gateway_transaction_id)
+
+        PaymentWebhookEvent.objects.bulk_update(
+            events, ['status', 'attempts', 'available_at', 'last_error', 'processed_at']
+        )
+    return len(events)
+
+
+# ===== Local stand-in for the gateway =====
+
+class FakeGateway:
+    """
+    Produces signed webhook deliveries shaped like the real gateway's, for
+    local replay and load runs (see `manage.py replay_fake_gateway`).
+    """
+
+    def __init__(self, secret=None):
+        self.secret = secret if secret is not None else settings.PAYMENT_WEBHOOK_SECRET
+
+    def event(self, payment, event_type='payment.captured', gateway_transaction_id=None):
+        payload = {
+            'id': f"evt_{uuid.uuid4().hex[:16]}",
+            'event': event_type,
+            'data': {
+                'transaction_id': payment.transaction_id,
+                'gateway_transaction_id': gateway_transaction_id or f"pay_{payment.transaction_id}",
+                'amount': str(payment.amount),
+                'method': payment.method,
+            },
+        }
+        body = json.dumps(payload).encode()
+        return body, {'HTTP_X_SIGNATURE': sign(body, self.secret)}
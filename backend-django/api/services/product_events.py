@@ -0,0 +1,193 @@
+"""
+Product Events - views, cart adds and checkouts without a write per event
+
+The ingestion endpoint offers events to a bounded in-process queue and
+returns immediately. A daemon flusher drains the queue every few seconds
+(or sooner once a batch fills), counts events per (date, product) and adds
+the counts to analytics_products and analytics_daily in one transaction.
+When the queue is full, offer() refuses the events so the endpoint can
+shed load instead of blocking. Distinct visitors per day are kept as
+HyperLogLog sketches. Each worker process has its own buffer;
+events still queued when a process is killed are lost, which is
+acceptable for traffic metrics.
+"""
+import atexit
+import logging
+import queue
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import AnalyticsDaily
+from .hll import HyperLogLog
+
+
+logger = logging.getLogger(__name__)
+
+# Event type -> (analytics_products column, analytics_daily column)
+EVENT_COLUMNS = {
+    'view': ('views', 'page_views'),
+    'cart_add': ('cart_adds', 'cart_additions'),
+    'checkout': (None, 'checkouts_started'),
+}
+
+UPSERT_SQL = """
+    INSERT INTO analytics_products
+        (date, product_id, fragrance_id, views, cart_adds, purchases, revenue,
+         cogs, costed_revenue, created_at)
+    SELECT e.date, {product}, {fragrance}, e.views, e.cart_adds, 0, 0, 0, 0, NOW()
+    FROM unnest(%s::date[], %s::int[], %s::int[], %s::int[]) AS e (date, target_id, views, cart_adds)
+    WHERE EXISTS (SELECT 1 FROM {table} t WHERE t.id = e.target_id)
+    ON CONFLICT {conflict}
+    DO UPDATE SET views = analytics_products.views + EXCLUDED.views,
+                  cart_adds = analytics_products.cart_adds + EXCLUDED.cart_adds
+"""
+
+UPSERT_PRODUCT_SQL = UPSERT_SQL.format(
+    product='e.target_id', fragrance='NULL', table='products',
+    conflict='(date, product_id) WHERE product_id IS NOT NULL'
+)
+
+UPSERT_FRAGRANCE_SQL = UPSERT_SQL.format(
+    product='NULL', fragrance='e.target_id', table='fragrances',
+    conflict='(date, fragrance_id) WHERE fragrance_id IS NOT NULL AND product_id IS NULL'
+)
+
+
+def aggregate(events):
+    """
+    Pre-aggregate (date, type, product_id, fragrance_id, visitor) events
+    into per-target and per-day counters plus each day's distinct visitors.
+    """
+    targets = {}
+    daily = {}
+    visitors = {}
+    for day, _, _, _, visitor in events:
+        visitors.setdefault(day, set()).add(visitor)
+    counts = Counter(event[:4] for event in events)
+    for (day, event_type, product_id, fragrance_id), count in counts.items():
+        product_column, daily_column = EVENT_COLUMNS[event_type]
+        if product_column:
+            key = ('product', product_id) if product_id else ('fragrance', fragrance_id)
+            counters = targets.setdefault((day,) + key, {'views': 0, 'cart_adds': 0})
+            counters[product_column] += count
+        day_counters = daily.setdefault(day, Counter())
+        day_counters[daily_column] += count
+    return targets, daily, visitors
+
+
+def write(targets, daily, visitors):
+    """
+    Add aggregated counters to the analytics tables and merge visitors into
+    each day's HyperLogLog sketch, in one transaction
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for kind, sql in (('product', UPSERT_PRODUCT_SQL), ('fragrance', UPSERT_FRAGRANCE_SQL)):
+                rows = [
+                    (day, target_id, counters['views'], counters['cart_adds'])
+                    for (day, target_kind, target_id), counters in targets.items()
+                    if target_kind == kind
+                ]
+                if rows:
+                    cursor.execute(sql, [list(column) for column in zip(*rows)])
+
+        AnalyticsDaily.objects.bulk_create(
+            [AnalyticsDaily(date=day) for day in daily], ignore_conflicts=True
+        )
+        for day, counters in daily.items():
+            AnalyticsDaily.objects.filter(date=day).update(**{
+                column: F(column) + count for column, count in counters.items()
+            })
+
+        # Sketches merge read-modify-write, so lock the day rows
+        for row in AnalyticsDaily.objects.select_for_update().filter(
+            date__in=list(visitors)
+        ).only('date', 'visitors_sketch'):
+            sketch = HyperLogLog.from_bytes(row.visitors_sketch).update(visitors[row.date])
+            row.visitors_sketch = sketch.to_bytes()
+            row.unique_visitors = sketch.count()
+            row.save(update_fields=['visitors_sketch', 'unique_visitors'])
+
+
+class EventBuffer:
+    """Bounded queue plus a background thread that flushes it in batches"""
+
+    def __init__(self, max_size, batch_size, flush_interval):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batch_ready = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def offer(self, events, visitor):
+        """
+        Queue (type, product_id, fragrance_id) events from one visitor for
+        today. Returns how many were accepted; the rest were refused
+        (queue full).
+        """
+        self.start()
+        day = timezone.localdate()
+        accepted = 0
+        for event_type, product_id, fragrance_id in events:
+            try:
+                self.queue.put_nowait((day, event_type, product_id, fragrance_id, visitor))
+            except queue.Full:
+                break
+            accepted += 1
+        if self.queue.qsize() >= self.batch_size:
+            self.batch_ready.set()
+        return accepted
+
+    def start(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='product-event-flusher', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush_all)
+
+    def run(self):
+        while True:
+            self.batch_ready.wait(self.flush_interval)
+            self.batch_ready.clear()
+            self.flush_all()
+
+    def drain(self):
+        events = []
+        while len(events) < self.batch_size:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def flush(self):
+        """Write one batch of queued events. Returns the number written."""
+        events = self.drain()
+        if not events:
+            return 0
+        close_old_connections()
+        try:
+            write(*aggregate(events))
+        except Exception:
+            logger.exception('Dropped %s product events', len(events))
+        return len(events)
+
+    def flush_all(self):
+        while self.flush() >= self.batch_size:
+            pass
+
+
+buffer = EventBuffer(
+    max_size=settings.ANALYTICS_EVENT_QUEUE_SIZE,
+    batch_size=settings.ANALYTICS_EVENT_BATCH_SIZE,
+    flush_interval=settings.ANALYTICS_EVENT_FLUSH_SECONDS,
+)
+
@@ -0,0 +1,188 @@
+"""
+Payment Reconciliation against gateway settlement files
+
+The settlement CSV is read as a stream; rows are matched against Payment in
+keyed chunks (one query per chunk on transaction_id/gateway_transaction_id),
+so memory is bounded by the chunk size, not the file size.
+
+Expected columns: transaction_id, gateway_transaction_id, amount, status.
+Either id column may be empty, but not both.
+
+Successful gateway (non-COD) payments created on the local days the matched
+rows span but absent from the file are reported as not_settled; only
+their ids are kept in memory while the file is read.
+
+Corrections go through the same transitions as gateway webhooks
+(services.payments), so orders are confirmed or refunded through the state
+machine and the outbox, and a payment whose amount disagrees with the
+settlement is never corrected.
+"""
+import csv
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import Payment
+from .analytics import _day_start
+from .payments import mark_captured, mark_failed, mark_refunded
+
+
+CHUNK_SIZE = 5000
+
+# Gateway settlement status -> Payment.status
+SETTLEMENT_STATUSES = {
+    'captured': 'success',
+    'settled': 'success',
+    'success': 'success',
+    'failed': 'failed',
+    'refunded': 'refunded',
+}
+
+REPORT_COLUMNS = [
+    'line', 'issue', 'transaction_id', 'gateway_transaction_id',
+    'payment_id', 'expected_amount', 'settled_amount',
+    'expected_status', 'settled_status',
+]
+
+
+def read_settlement(handle):
+    """Yield (line_number, row) from a settlement CSV file object"""
+    for line, row in enumerate(csv.DictReader(handle), start=2):
+        yield line, row
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _load_payments(rows):
+    transaction_ids = {(r.get('transaction_id') or '').strip() for _, r in rows} - {''}
+    gateway_ids = {(r.get('gateway_transaction_id') or '').strip() for _, r in rows} - {''}
+    by_transaction, by_gateway = {}, {}
+    for payment in Payment.objects.filter(
+        Q(transaction_id__in=transaction_ids) | Q(gateway_transaction_id__in=gateway_ids)
+    ).values('id', 'transaction_id', 'gateway_transaction_id', 'amount', 'status', 'created_at'):
+        by_transaction[payment['transaction_id']] = payment
+        if payment['gateway_transaction_id']:
+            by_gateway[payment['gateway_transaction_id']] = payment
+    return by_transaction, by_gateway
+
+
+def reconcile(lines, chunk_size=CHUNK_SIZE):
+    """
+    Yield one mismatch dict per problem found in `lines` (as produced by
+    read_settlement). Issues: missing, amount_mismatch, status_mismatch,
+    invalid_row, not_settled. A status_mismatch carries corrected_status
+    only when the amounts agree.
+    """
+    seen = set()
+    first = last = None
+    for rows in chunked(lines, chunk_size):
+        by_transaction, by_gateway = _load_payments(rows)
+        for line, row in rows:
+            transaction_id = (row.get('transaction_id') or '').strip()
+            gateway_id = (row.get('gateway_transaction_id') or '').strip()
+            mismatch = {
+                'line': line,
+                'transaction_id': transaction_id,
+                'gateway_transaction_id': gateway_id,
+                'settled_amount': row.get('amount'),
+                'settled_status': row.get('status'),
+            }
+
+            settled_status = SETTLEMENT_STATUSES.get((row.get('status') or '').strip().lower())
+            try:
+                settled_amount = Decimal((row.get('amount') or '').strip())
+            except InvalidOperation:
+                settled_amount = None
+            if settled_status is None or settled_amount is None or not (transaction_id or gateway_id):
+                yield dict(mismatch, issue='invalid_row')
+                continue
+
+            payment = by_transaction.get(transaction_id) or by_gateway.get(gateway_id)
+            if payment is None:
+                yield dict(mismatch, issue='missing')
+                continue
+
+            seen.add(payment['id'])
+            first = min(first or payment['created_at'], payment['created_at'])
+            last = max(last or payment['created_at'], payment['created_at'])
+
+            mismatch.update(
+                payment_id=payment['id'],
+                expected_amount=payment['amount'],
+                expected_status=payment['status'],
+            )
+            amount_matches = settled_amount == payment['amount']
+            if not amount_matches:
+                yield dict(mismatch, issue='amount_mismatch')
+            if settled_status != payment['status']:
+                yield dict(
+                    mismatch, issue='status_mismatch',
+                    corrected_status=settled_status if amount_matches else None
+                )
+
+    if first is None:
+        return
+    unsettled = Payment.objects.filter(
+        created_at__gte=_day_start(timezone.localdate(first)),
+        created_at__lt=_day_start(timezone.localdate(last) + timedelta(days=1)),
+        status='success'
+    ).exclude(method='cod').values(
+        'id', 'transaction_id', 'gateway_transaction_id', 'amount', 'status'
+    ).order_by('id')
+    for payment in unsettled.iterator(chunk_size=chunk_size):
+        if payment['id'] not in seen:
+            yield {
+                'line': None,
+                'issue': 'not_settled',
+                'transaction_id': payment['transaction_id'],
+                'gateway_transaction_id': payment['gateway_transaction_id'],
+                'payment_id': payment['id'],
+                'expected_amount': payment['amount'],
+                'expected_status': payment['status'],
+            }
+
+
+def apply_corrections(mismatches):
+    """
+    Move every correctable status_mismatch to its settled status through
+    the webhook transitions, one transaction per chunk. Payments with an
+    amount mismatch, and transitions the webhook path would refuse (e.g.
+    refunded -> success), are left alone.
+    Returns the number of payments updated.
+    """
+    amount_mismatches = set()
+    targets = {}
+    for mismatch in mismatches:
+        if mismatch['issue'] == 'amount_mismatch':
+            amount_mismatches.add(mismatch['payment_id'])
+        elif mismatch['issue'] == 'status_mismatch' and mismatch.get('corrected_status'):
+            targets[mismatch['payment_id']] = mismatch['corrected_status']
+    for payment_id in amount_mismatches:
+        targets.pop(payment_id, None)
+
+    updated = 0
+    for chunk in chunked(sorted(targets), CHUNK_SIZE):
+        with transaction.atomic():
+            payments = Payment.objects.select_for_update().select_related('order').filter(id__in=chunk)
+            for payment in payments.order_by('id'):
+                status = targets[payment.pk]
+                if status == 'success':
+                    applied = mark_captured(payment, payment.gateway_response)
+                elif status == 'failed':
+                    applied = mark_failed(payment, payment.gateway_response)
+                else:
+                    applied = mark_refunded(payment)
+                updated += applied
+    return updated
@@ -0,0 +1,128 @@
+"""
+Reorder Suggestions - sales velocity and variability per SKU, computed for
+all SKUs at once as a (SKU x day) demand matrix.
+
+Order lines map to inventory the way margins costs them: the Inventory row
+with the line's SKU if there is one, else every row of the same size and
+the same product - or, for fragrance lines without a product, the
+fragrance whose sku is the line's SKU. Orders do not record which location
+shipped them, so when several rows match (the same item stocked at several
+locations) each gets an equal share of the line's units.
+
+Reorder point is expected lead-time demand plus safety stock
+(z * daily std * sqrt(lead time)); the suggested quantity tops stock up to
+the reorder point plus one review period of demand once stock is at or
+below the reorder point.
+"""
+import math
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import Fragrance, Inventory, OrderItem, ReorderSuggestion
+from . import inventory_rollups
+from .analytics import EXCLUDED_ORDER_STATUSES
+
+
+def _size(size):
+    return (size or '').lower().replace(' ', '')
+
+
+def demand_matrix(items, start, days):
+    """Daily units sold per item over `days` days from `start` (local dates)"""
+    rows_by_sku = {item.sku: [row] for row, item in enumerate(items)}
+    rows_by_owner = {}
+    for row, item in enumerate(items):
+        for owner in (('product', item.product_id), ('fragrance', item.fragrance_id)):
+            if owner[1]:
+                rows_by_owner.setdefault((*owner, _size(item.size)), []).append(row)
+    demand = np.zeros((len(items), days))
+
+    start_at = timezone.make_aware(datetime.combine(start, time.min))
+    sales = OrderItem.objects.filter(
+        order__created_at__gte=start_at,
+        order__created_at__lt=start_at + timedelta(days=days)
+    ).exclude(
+        order__status__in=EXCLUDED_ORDER_STATUSES
+    ).annotate(
+        day=TruncDate('order__created_at'),
+        fragrance_id=Subquery(Fragrance.objects.filter(sku=OuterRef('product_sku')).values('id')[:1])
+    ).order_by().values('product_id', 'fragrance_id', 'product_sku', 'size', 'day').annotate(
+        units=Sum('quantity')
+    ).values_list('product_id', 'fragrance_id', 'product_sku', 'size', 'day', 'units')
+
+    rows, cols, units = [], [], []
+    for product_id, fragrance_id, sku, size, day, quantity in sales:
+        owner = ('product', product_id) if product_id else ('fragrance', fragrance_id)
+        targets = rows_by_sku.get(sku) or rows_by_owner.get((*owner, _size(size)), [])
+        for row in targets:
+            rows.append(row)
+            cols.append((day - start).days)
+            units.append(quantity / len(targets))
+    if rows:
+        np.add.at(demand, (np.array(rows), np.array(cols)), np.array(units, dtype=float))
+    return demand
+
+
+def compute(window_days=90, lead_time_days=7, review_days=14, service_z=1.65):
+    """Recompute and store suggestions for every SKU. Returns the rows written."""
+    items = list(Inventory.objects.only(
+        'id', 'sku', 'product_id', 'fragrance_id', *inventory_rollups.STATE_FIELDS
+    ).order_by('id'))
+    if not items:
+        ReorderSuggestion.objects.all().delete()
+        return []
+
+    today = timezone.localdate()
+    demand = demand_matrix(items, today - timedelta(days=window_days), window_days)
+
+    velocity = demand.mean(axis=1)
+    spread = demand.std(axis=1, ddof=1) if window_days > 1 else np.zeros(len(items))
+    stock = np.array([item.current_stock for item in items], dtype=float)
+
+    safety = np.ceil(service_z * spread * math.sqrt(lead_time_days))
+    reorder_point = np.ceil(velocity * lead_time_days) + safety
+    target = reorder_point + velocity * review_days
+    suggested = np.where(stock <= reorder_point, np.maximum(np.ceil(target - stock), 0), 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(velocity > 0, stock / velocity, np.nan)
+
+    now = timezone.now()
+    suggestions = [
+        ReorderSuggestion(
+            inventory_id=item.pk,
+            avg_daily_sales=float(velocity[i]),
+            demand_std=float(spread[i]),
+            safety_stock=int(safety[i]),
+            reorder_point=int(reorder_point[i]),
+            suggested_quantity=int(suggested[i]),
+            days_of_cover=None if np.isnan(cover[i]) else float(cover[i]),
+            window_days=window_days,
+            lead_time_days=lead_time_days,
+            computed_at=now
+        )
+        for i, item in enumerate(items)
+    ]
+    with transaction.atomic():
+        ReorderSuggestion.objects.all().delete()
+        ReorderSuggestion.objects.bulk_create(suggestions, batch_size=1000)
+    return suggestions
+
+
+def apply_reorder_levels(suggestions):
+    """Copy dynamic reorder points into Inventory.reorder_level for selling SKUs"""
+    points = {s.inventory_id: s.reorder_point for s in suggestions if s.avg_daily_sales > 0}
+    with transaction.atomic():
+        items = list(Inventory.objects.select_for_update().filter(pk__in=points).order_by('id'))
+        changes = []
+        for item in items:
+            before = inventory_rollups.state(item)
+            item.reorder_level = points[item.pk]
+            changes.append((before, inventory_rollups.state(item)))
+        Inventory.objects.bulk_update(items, ['reorder_level'], batch_size=1000)
+        inventory_rollups.record_changes(changes)
+    return len(items)
@@ -0,0 +1,122 @@
+"""
+Token Revocation - cached JWT users and a denylist checked in memory
+
+Authenticated requests resolve their user from the cache, keyed by user id
+and the token's `ver` claim, instead of loading the users row each time.
+Saving a user drops its cache entry; bumping User.token_version (revoke_all)
+makes every older token fail the version check.
+
+Single tokens (logout) are revoked by jti. Each process keeps the live
+revoked jtis as a Bloom filter plus an exact set, so checking a token is a
+memory lookup: the filter answers "not revoked" for almost every token
+and the set settles the rare filter hits. The structure is rebuilt from
+revoked_tokens when the shared revision counter moves (checked every
+AUTH_DENYLIST_SYNC_SECONDS) and at least every AUTH_DENYLIST_REFRESH_SECONDS,
+which bounds how long other workers take to see a revocation when the
+cache is per process.
+"""
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import RevokedToken, User
+from .bloom import BloomFilter
+
+
+REVISION_KEY = 'auth:denylist:revision'
+
+# Headroom so a rebuilt filter keeps its error rate while revocations accumulate
+BLOOM_MIN_CAPACITY = 10000
+
+
+def _user_key(user_id, version):
+    return f'auth:user:{user_id}:{version}'
+
+
+def get_user(user_id, version):
+    """
+    The user for a token's (user id, version) claims, from the cache when
+    possible. Returns None when the user is gone or the version is stale.
+    """
+    key = _user_key(user_id, version)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.filter(pk=user_id).first()
+        if user is None or user.token_version != version:
+            return None
+        cache.set(key, user, timeout=settings.AUTH_USER_CACHE_TTL)
+    return user
+
+
+def invalidate_user(user):
+    cache.delete(_user_key(user.pk, user.token_version))
+
+
+def revoke_all(user):
+    """Revoke every token issued to `user` so far"""
+    invalidate_user(user)
+    User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.refresh_from_db(fields=['token_version'])
+
+
+class Denylist:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = BloomFilter(BLOOM_MIN_CAPACITY)
+        self.exact = set()
+        self.revision = None
+        self.built_at = 0
+        self.synced_at = 0
+
+    def rebuild(self, revision):
+        jtis = set(RevokedToken.objects.filter(
+            expires_at__gt=timezone.now()
+        ).values_list('jti', flat=True))
+        bloom = BloomFilter(max(BLOOM_MIN_CAPACITY, 2 * len(jtis))).update(jtis)
+        self.bloom, self.exact = bloom, jtis
+        self.revision = revision
+        self.built_at = time.monotonic()
+
+    def sync(self):
+        now = time.monotonic()
+        if now - self.synced_at < settings.AUTH_DENYLIST_SYNC_SECONDS:
+            return
+        with self.lock:
+            if now - self.synced_at < settings.AUTH_DENYLIST_SYNC_SECONDS:
+                return
+            revision = cache.get(REVISION_KEY, 0)
+            if revision != self.revision or now - self.built_at >= settings.AUTH_DENYLIST_REFRESH_SECONDS:
+                self.rebuild(revision)
+            self.synced_at = now
+
+    def add(self, jti):
+        with self.lock:
+            self.bloom.add(jti)
+            self.exact.add(jti)
+
+    def __contains__(self, jti):
+        self.sync()
+        return jti in self.bloom and jti in self.exact
+
+
+denylist = Denylist()
+
+
+def is_revoked(jti):
+    return jti in denylist
+
+
+def revoke(token):
+    """Denylist one token (anything with `jti` and `exp` claims) until it expires"""
+    expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    RevokedToken.objects.get_or_create(jti=token['jti'], defaults={'expires_at': expires_at})
+    denylist.add(token['jti'])
+    if not cache.add(REVISION_KEY, 1, timeout=None):
+        cache.incr(REVISION_KEY)
@@ -0,0 +1,89 @@
+"""
+RFM Segmentation - recency, frequency and monetary scores for all customers
+
+One aggregate query returns (user, last order, orders, spend) per customer;
+NumPy assigns 1-5 quintile scores and maps (R, F) onto the usual segment
+grid. Results replace customer_segments wholesale via COPY.
+"""
+import csv
+import io
+from itertools import repeat
+
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .analytics import EXCLUDED_ORDER_STATUSES
+
+
+CUSTOMER_TOTALS_SQL = """
+    SELECT o.user_id,
+           FLOOR(EXTRACT(EPOCH FROM %(now)s - MAX(o.created_at)) / 86400)::int,
+           COUNT(*)::int,
+           SUM(o.total_amount)::float8
+    FROM orders o
+    JOIN users u ON u.id = o.user_id AND u.role = 'customer'
+    WHERE o.status <> ALL(%(excluded)s)
+    GROUP BY o.user_id
+"""
+
+# SEGMENT_GRID[r_score - 1][f_score - 1]
+SEGMENT_GRID = [
+    ['hibernating', 'hibernating', 'at_risk', 'at_risk', 'cant_lose'],
+    ['hibernating', 'hibernating', 'at_risk', 'at_risk', 'cant_lose'],
+    ['about_to_sleep', 'about_to_sleep', 'need_attention', 'loyal', 'loyal'],
+    ['promising', 'potential_loyalists', 'potential_loyalists', 'loyal', 'loyal'],
+    ['new_customers', 'potential_loyalists', 'potential_loyalists', 'champions', 'champions'],
+]
+
+COLUMNS = [
+    'user_id', 'recency_days', 'frequency', 'monetary',
+    'r_score', 'f_score', 'm_score', 'segment', 'computed_at',
+]
+
+
+def quintile_scores(values, higher_is_better=True):
+    """1-5 by quintile; ties share a score"""
+    if not len(values):
+        return np.zeros(0, dtype=np.int64)
+    edges = np.quantile(values, [0.2, 0.4, 0.6, 0.8])
+    if higher_is_better:
+        return 1 + np.searchsorted(edges, values, side='left')
+    return 5 - np.searchsorted(edges, values, side='right')
+
+
+def score(recency, frequency, monetary):
+    """Vectorized R, F, M scores and segment names"""
+    r = quintile_scores(recency, higher_is_better=False)
+    f = quintile_scores(frequency)
+    m = quintile_scores(monetary)
+    segments = np.array(SEGMENT_GRID, dtype=object)[r - 1, f - 1]
+    return r, f, m, segments
+
+
+def compute():
+    """Recompute every customer's segment. Returns the number of customers."""
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(CUSTOMER_TOTALS_SQL, {'now': now, 'excluded': EXCLUDED_ORDER_STATUSES})
+        rows = cursor.fetchall()
+
+    # Casts in the query keep psycopg2 from building a Decimal per row
+    table = np.array(rows, dtype=np.float64).reshape(-1, 4)
+    users, recency, frequency = table[:, :3].astype(np.int64).T
+    monetary = table[:, 3]
+    r, f, m, segments = score(recency, frequency, monetary)
+
+    data = io.StringIO()
+    csv.writer(data).writerows(zip(
+        users.tolist(), recency.tolist(), frequency.tolist(), np.round(monetary, 2).tolist(),
+        r.tolist(), f.tolist(), m.tolist(), segments.tolist(), repeat(now.isoformat())
+    ))
+    data.seek(0)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('TRUNCATE customer_segments')
+        cursor.copy_expert(
+            f"COPY customer_segments ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", data
+        )
+    return len(rows)
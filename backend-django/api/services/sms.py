@@ -0,0 +1,264 @@
+"""
+SMS Dispatch - queued outbound texts delivered in batches
+
+enqueue() stores a pending sms_messages row. The worker
+(`manage.py run_sms_worker`) claims due rows with SKIP LOCKED, lowest
+priority number first, and hands each batch to the configured provider,
+which keeps its connection open across batches. Failed messages are retried
+with exponential backoff. OTPs can be given a dedicated worker
+(`--lane otp`) so a promotional backlog never delays a login.
+
+An OTP message is the one place a code is written to the database in
+plaintext: its row holds the text only while it waits for the worker
+(normally well under a second on the OTP lane). Sensitive bodies are
+blanked once the message is sent or fails, and pending OTPs are failed and
+blanked as soon as their code expires, even if they were never attempted.
+
+settings.SMS_PROVIDER picks the provider: HttpSmsProvider for a JSON batch
+gateway, or FakeSmsProvider, which only records messages (development,
+tests and load benchmarks). The fake is the default only with DEBUG and is
+refused otherwise, so the worker fails at start-up rather than dropping
+texts when no gateway is configured.
+"""
+import http.client
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import timedelta
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from ..models import SmsMessage
+from .backoff import backoff_delay
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+OTP_MESSAGE = 'Your RIMAE verification code is {code}. It expires in {minutes} minutes.'
+
+
+class SmsProviderError(Exception):
+    """The provider refused or failed the whole batch"""
+
+
+class SmsProvider:
+    """Delivers batches of (phone, body); one instance serves many batches"""
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_batch(self, messages):
+        """
+        Send [(phone, body), ...]. Returns [(provider_message_id, error), ...]
+        in the same order, with error None for accepted messages. Raises
+        SmsProviderError when nothing in the batch was sent.
+        """
+        raise NotImplementedError
+
+
+class HttpSmsProvider(SmsProvider):
+    """
+    JSON batch gateway over one persistent HTTP(S) connection:
+    POST {"sender": ..., "messages": [{"to": ..., "body": ...}]} answered
+    with {"messages": [{"id": ...} | {"error": ...}]}.
+    """
+
+    def __init__(self):
+        if not settings.SMS_GATEWAY_URL:
+            raise ImproperlyConfigured('SMS_GATEWAY_URL is not set')
+        url = urlsplit(settings.SMS_GATEWAY_URL)
+        self.connection_class = (
+            http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        )
+        self.host = url.netloc
+        self.path = url.path or '/'
+        self.connection = None
+
+    def open(self):
+        if self.connection is None:
+            self.connection = self.connection_class(self.host, timeout=settings.SMS_GATEWAY_TIMEOUT)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _post(self, body):
+        self.open()
+        self.connection.request('POST', self.path, body=body, headers={
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {settings.SMS_GATEWAY_API_KEY}',
+        })
+        response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def send_batch(self, messages):
+        body = json.dumps({
+            'sender': settings.SMS_SENDER_ID,
+            'messages': [{'to': phone, 'body': text} for phone, text in messages],
+        })
+        try:
+            status, data = self._post(body)
+        except (http.client.HTTPException, OSError):
+            # The kept-alive connection may have been dropped; retry once on a new one
+            self.close()
+            try:
+                status, data = self._post(body)
+            except (http.client.HTTPException, OSError) as exc:
+                self.close()
+                raise SmsProviderError(f'{type(exc).__name__}: {exc}') from exc
+
+        if status >= 400:
+            raise SmsProviderError(f'Gateway returned HTTP {status}: {data[:200]!r}')
+        results = json.loads(data).get('messages', [])
+        if len(results) != len(messages):
+            raise SmsProviderError(f'Gateway answered {len(results)} of {len(messages)} messages')
+        return [(str(result.get('id', '')), result.get('error')) for result in results]
+
+
+class FakeSmsProvider(SmsProvider):
+    """
+    Records the last `max_recorded` messages in `self.sent` instead of
+    sending them; for DEBUG and tests only (see get_provider_class).
+    `latency` (seconds per batch) and `failure_rate` (per message) make it
+    usable for load tests of the worker.
+    """
+    def __init__(self, latency=0, failure_rate=0, max_recorded=1000):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = deque(maxlen=max_recorded)
+        self.lock = threading.Lock()
+
+    def send_batch(self, messages):
+        if self.latency:
+            time.sleep(self.latency)
+        results = []
+        with self.lock:
+            for phone, body in messages:
+                if self.failure_rate and random.random() < self.failure_rate:
+                    results.append((None, 'Simulated failure'))
+                    continue
+                message_id = uuid.uuid4().hex
+                self.sent.append({'id': message_id, 'to': phone, 'body': body})
+                results.append((message_id, None))
+        return results
+
+    def reset(self):
+        with self.lock:
+            self.sent.clear()
+
+
+@lru_cache(maxsize=None)
+def get_provider_class():
+    """
+    The configured provider class. Raises ImproperlyConfigured when none is
+    set, or when it is the fake outside DEBUG, so a worker never marks
+    messages delivered without sending them.
+    """
+    if not settings.SMS_PROVIDER:
+        raise ImproperlyConfigured('SMS_PROVIDER is not set')
+    provider_class = import_string(settings.SMS_PROVIDER)
+    if issubclass(provider_class, FakeSmsProvider) and not settings.DEBUG:
+        raise ImproperlyConfigured('FakeSmsProvider does not send anything; it is only allowed with DEBUG')
+    return provider_class
+
+
+def enqueue(phone, body, priority=SmsMessage.PRIORITY_TRANSACTIONAL, sensitive=False):
+    return SmsMessage.objects.create(phone=phone, body=body, priority=priority, sensitive=sensitive)
+
+
+def enqueue_many(phones, body, priority=SmsMessage.PRIORITY_PROMOTIONAL):
+    return SmsMessage.objects.bulk_create(
+        [SmsMessage(phone=phone, body=body, priority=priority) for phone in phones],
+        batch_size=1000
+    )
+
+
+def enqueue_otp(phone, code):
+    return enqueue(
+        phone,
+        OTP_MESSAGE.format(code=code, minutes=settings.OTP_TTL_SECONDS // 60),
+        priority=SmsMessage.PRIORITY_OTP,
+        sensitive=True
+    )
+
+
+def _expired(message, retry_at):
+    """An OTP is not worth delivering after the code has expired"""
+    return (
+        message.priority == SmsMessage.PRIORITY_OTP
+        and retry_at > message.created_at + timedelta(seconds=settings.OTP_TTL_SECONDS)
+    )
+
+
+def expire_otps():
+    """Fail and blank pending OTP messages whose code has already expired"""
+    return SmsMessage.objects.filter(
+        status='pending',
+        priority=SmsMessage.PRIORITY_OTP,
+        created_at__lt=timezone.now() - timedelta(seconds=settings.OTP_TTL_SECONDS)
+    ).update(status='failed', body='', last_error='OTP expired before delivery')
+
+
+def dispatch(provider, batch_size=100, max_priority=None):
+    """
+    Send one batch of due messages, most urgent first; with `max_priority`
+    only messages at or above that urgency. Returns the number claimed.
+    """
+    expire_otps()
+    with transaction.atomic():
+        messages = SmsMessage.objects.select_for_update(skip_locked=True).filter(
+            status='pending',
+            available_at__lte=timezone.now()
+        )
+        if max_priority is not None:
+            messages = messages.filter(priority__lte=max_priority)
+        messages = list(messages.order_by('priority', 'available_at', 'id')[:batch_size])
+        if not messages:
+            return 0
+
+        try:
+            results = provider.send_batch([(message.phone, message.body) for message in messages])
+        except Exception as exc:
+            logger.exception('SMS batch of %s failed', len(messages))
+            results = [(None, f'{type(exc).__name__}: {exc}')] * len(messages)
+
+        now = timezone.now()
+        for message, (message_id, error) in zip(messages, results):
+            message.attempts += 1
+            if error is None:
+                message.status = 'sent'
+                message.provider_message_id = message_id or ''
+                message.sent_at = now
+                if message.sensitive:
+                    message.body = ''
+            else:
+                message.last_error = str(error)
+                retry_at = now + backoff_delay(message.attempts)
+                if message.attempts >= MAX_ATTEMPTS or _expired(message, retry_at):
+                    message.status = 'failed'
+                    if message.sensitive:
+                        message.body = ''
+                else:
+                    message.available_at = retry_at
+
+        SmsMessage.objects.bulk_update(messages, [
+            'status', 'attempts', 'available_at', 'last_error',
+            'provider_message_id', 'sent_at', 'body',
+        ])
+    return len(messages)
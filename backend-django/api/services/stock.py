@@ -0,0 +1,100 @@
+"""
+Stock Adjustments - single and bulk, with movement ledger rows and rollups
+written in the same transaction.
+
+Stock never goes below zero; the recorded movement quantity is the change
+actually applied, so the ledger always sums to current_stock.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Now
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from ..models import Inventory, StockMovement
+from . import inventory_rollups
+
+
+def adjust_stock(inventory_id, movement_type, quantity, reason='', performed_by='System'):
+    """Apply one adjustment as an atomic F() update. Returns the refreshed item."""
+    delta = -quantity if movement_type == 'out' else quantity
+
+    with transaction.atomic():
+        # The row lock makes the before/after pair exact for the ledger
+        # and rollups; the update itself is a guarded F() expression
+        inventory = Inventory.objects.select_for_update().get(pk=inventory_id)
+        before = inventory_rollups.state(inventory)
+
+        fields = {
+            'current_stock': Greatest(F('current_stock') + delta, 0),
+            'updated_at': Now(),
+        }
+        if movement_type == 'in':
+            fields['last_restocked'] = Now()
+        Inventory.objects.filter(pk=inventory_id).update(**fields)
+        inventory.refresh_from_db()
+
+        StockMovement.objects.create(
+            inventory=inventory,
+            type=movement_type,
+            quantity=inventory.current_stock - before['current_stock'],
+            reason=reason,
+            performed_by=performed_by
+        )
+        inventory_rollups.record_change(before, inventory_rollups.state(inventory))
+    return inventory
+
+
+def bulk_adjust(rows, performed_by='System'):
+    """
+    Apply many adjustments in one transaction.
+
+    `rows` are dicts with sku, type ('in', 'out', 'adjustment' or 'count'),
+    quantity and optional reason. 'count' sets stock to the counted quantity
+    (recorded as an adjustment). Rows for the same SKU apply in order.
+    Raises ValidationError, applying nothing, if any SKU is unknown.
+    """
+    skus = {row['sku'] for row in rows}
+
+    with transaction.atomic():
+        items = {
+            item.sku: item
+            for item in Inventory.objects.select_for_update().filter(sku__in=skus).order_by('id')
+        }
+        missing = sorted(skus - items.keys())
+        if missing:
+            raise ValidationError({'unknown_skus': missing})
+
+        before = {sku: inventory_rollups.state(item) for sku, item in items.items()}
+        now = timezone.now()
+        movements = []
+        for row in rows:
+            item = items[row['sku']]
+            previous = item.current_stock
+            if row['type'] == 'count':
+                item.current_stock = row['quantity']
+            elif row['type'] == 'out':
+                item.current_stock = max(0, previous - row['quantity'])
+            else:
+                item.current_stock = previous + row['quantity']
+            if row['type'] == 'in':
+                item.last_restocked = now
+            item.updated_at = now
+
+            movements.append(StockMovement(
+                inventory=item,
+                type='adjustment' if row['type'] == 'count' else row['type'],
+                quantity=item.current_stock - previous,
+                reason=row.get('reason', ''),
+                performed_by=performed_by
+            ))
+
+        Inventory.objects.bulk_update(
+            items.values(), ['current_stock', 'last_restocked', 'updated_at'], batch_size=1000
+        )
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+        inventory_rollups.record_changes(
+            (before[sku], inventory_rollups.state(item)) for sku, item in items.items()
+        )
+
+    return {'items_updated': len(items), 'movements_created': len(movements)}
@@ -0,0 +1,112 @@
+"""
+Stock Ledger - point-in-time stock from checkpoints plus movements
+
+Stock at time T = latest checkpoint at or before T + movements in
+(checkpoint, T]. Items with no checkpoint replay their ledger from zero.
+All functions here are single set-based queries over every requested item.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import StockMovement
+
+
+LEDGER_SQL = """
+    SELECT i.id,
+           COALESCE(cp.stock, 0) + COALESCE(SUM(m.quantity), 0) AS stock,
+           cp.taken_at
+    FROM inventory i
+    LEFT JOIN LATERAL (
+        SELECT c.stock, c.taken_at
+        FROM stock_checkpoints c
+        WHERE c.inventory_id = i.id {checkpoint_bound}
+        ORDER BY c.taken_at DESC
+        LIMIT 1
+    ) cp ON TRUE
+    LEFT JOIN stock_movements m
+        ON m.inventory_id = i.id
+        AND (cp.taken_at IS NULL OR m.created_at > cp.taken_at)
+        {movement_bound}
+    {where}
+    GROUP BY i.id, cp.stock, cp.taken_at
+"""
+
+
+def _ledger_query(at=None, inventory_ids=None):
+    params = []
+    checkpoint_bound = movement_bound = where = ''
+    if at is not None:
+        checkpoint_bound = 'AND c.taken_at <= %s'
+        movement_bound = 'AND m.created_at <= %s'
+        params += [at, at]
+    if inventory_ids is not None:
+        where = 'WHERE i.id = ANY(%s)'
+        params.append(list(inventory_ids))
+    sql = LEDGER_SQL.format(
+        checkpoint_bound=checkpoint_bound, movement_bound=movement_bound, where=where
+    )
+    return sql, params
+
+
+def stock_at(at, inventory_ids=None):
+    """Return {inventory_id: (stock, checkpoint_taken_at)} as of `at`"""
+    sql, params = _ledger_query(at, inventory_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {pk: (stock, taken_at) for pk, stock, taken_at in cursor.fetchall()}
+
+
+def create_checkpoints(lag=timedelta(minutes=5)):
+    """
+    Write one checkpoint per item, derived from the previous checkpoint and
+    the movements since. `lag` keeps the cut-off behind transactions that
+    may still be committing movements. Returns (rows inserted, taken_at).
+    """
+    taken_at = timezone.now() - lag
+    sql, params = _ledger_query(taken_at)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO stock_checkpoints (inventory_id, stock, taken_at)
+            SELECT ledger.id, ledger.stock, %s FROM ({sql}) ledger
+            ON CONFLICT (inventory_id, taken_at) DO NOTHING
+            """,
+            [taken_at] + params
+        )
+        return cursor.rowcount, taken_at
+
+
+def find_drift():
+    """Items whose current_stock differs from the ledger, in one pass"""
+    sql, params = _ledger_query()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT i.id, i.sku, i.current_stock, ledger.stock
+            FROM inventory i
+            JOIN ({sql}) ledger ON ledger.id = i.id
+            WHERE i.current_stock <> ledger.stock
+            ORDER BY i.id
+            """,
+            params
+        )
+        return [
+            {'id': pk, 'sku': sku, 'current_stock': current, 'ledger_stock': ledger}
+            for pk, sku, current, ledger in cursor.fetchall()
+        ]
+
+
+def fix_drift(drift, performed_by='System'):
+    """Record adjustment movements that bring the ledger to current_stock"""
+    return StockMovement.objects.bulk_create([
+        StockMovement(
+            inventory_id=row['id'],
+            type='adjustment',
+            quantity=row['current_stock'] - row['ledger_stock'],
+            reason='Ledger reconciliation',
+            performed_by=performed_by
+        )
+        for row in drift
+    ], batch_size=1000)
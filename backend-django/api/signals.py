@@ -0,0 +1,35 @@
+"""
+Signal handlers, connected in ApiConfig.ready()
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Notification, Order, User
+from .services import analytics, notifications, revocation
+
+
+@receiver([post_save, post_delete], sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    # Authenticated requests must see profile, role and is_active changes
+    revocation.invalidate_user(instance)
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=User)
+def mark_analytics_day_stale(sender, instance, **kwargs):
+    # The rollup's change scan cannot see deleted rows
+    if sender is Order or instance.role == 'customer':
+        analytics.mark_stale(instance.created_at)
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    # Unread badges; after commit so a recount never misses the row
+    if created:
+        transaction.on_commit(lambda: notifications.notification_created(instance))
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_notification(sender, instance, **kwargs):
+    transaction.on_commit(lambda: notifications.notification_deleted(instance))
@@ -0,0 +1,193 @@
+"""
+Payment webhooks - fake-gateway deliveries replayed through the webhook
+endpoint and applied by the worker
+"""
+import json
+import random
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import Order, OutboxEvent, Payment, PaymentWebhookEvent, User
+from ..services import payments
+from ..services.payments import FakeGateway
+
+
+WEBHOOK_URL = '/api/v1/payments/webhook/'
+
+ALL_SHARDS = range(PaymentWebhookEvent.SHARD_COUNT)
+
+
+@override_settings(PAYMENT_WEBHOOK_SECRET='test-secret')
+class PaymentWebhookTests(TestCase):
+
+    def setUp(self):
+        self.gateway = FakeGateway()
+        self.user = User.objects.create(username='buyer', phone='9000000001', role='customer')
+
+    def payment(self, number):
+        order = Order.objects.create(
+            order_number=f'ORD-{number}',
+            user=self.user,
+            shipping_name='Buyer',
+            shipping_phone='9000000001',
+            shipping_address='1 Street',
+            shipping_city='City',
+            shipping_state='State',
+            shipping_pincode='110001',
+            subtotal=100,
+            total_amount=100,
+            payment_method='upi'
+        )
+        return Payment.objects.create(
+            transaction_id=f'TXN-{number}',
+            order=order,
+            user=self.user,
+            amount=100,
+            method='upi'
+        )
+
+    def deliver(self, delivery):
+        body, headers = delivery
+        response = self.client.post(WEBHOOK_URL, data=body, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['status']
+
+    def work(self):
+        while payments.process_batch(ALL_SHARDS):
+            pass
+
+    def events(self, payment):
+        return list(PaymentWebhookEvent.objects.filter(
+            transaction_id=payment.transaction_id
+        ).order_by('id').values_list('event_type', 'status'))
+
+    def test_rejects_bad_signature(self):
+        body, _ = self.gateway.event(self.payment(1))
+        response = self.client.post(
+            WEBHOOK_URL, data=body, content_type='application/json',
+            HTTP_X_SIGNATURE='0' * 64
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+    def test_duplicate_deliveries_are_ignored(self):
+        payment = self.payment(1)
+        delivery = self.gateway.event(payment)
+
+        self.assertEqual(self.deliver(delivery), 'queued')
+        self.assertEqual(self.deliver(delivery), 'duplicate')
+        self.work()
+        # A redelivery after the event was applied changes nothing either
+        self.assertEqual(self.deliver(delivery), 'duplicate')
+        self.work()
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'success')
+        self.assertEqual(self.events(payment), [('payment.captured', 'processed')])
+        self.assertEqual(OutboxEvent.objects.filter(topic='payment.succeeded').count(), 1)
+
+    def test_events_apply_in_arrival_order_per_transaction(self):
+        first, second = self.payment(1), self.payment(2)
+        # Interleaved: the first transaction's refund arrives after its
+        # capture, the second's arrives before its capture
+        for delivery in [
+            self.gateway.event(second, 'refund.processed'),
+            self.gateway.event(first, 'payment.captured'),
+            self.gateway.event(second, 'payment.captured'),
+            self.gateway.event(first, 'refund.processed'),
+        ]:
+            self.assertEqual(self.deliver(delivery), 'queued')
+        self.work()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'refunded')
+        self.assertEqual(self.events(first), [
+            ('payment.captured', 'processed'),
+            ('refund.processed', 'processed'),
+        ])
+        self.assertEqual(second.status, 'success')
+        self.assertEqual(self.events(second), [
+            ('refund.processed', 'ignored'),
+            ('payment.captured', 'processed'),
+        ])
+
+    def test_failed_event_holds_back_later_events_of_its_transaction(self):
+        first, second = self.payment(1), self.payment(2)
+        for delivery in [
+            self.gateway.event(first, 'payment.captured'),
+            self.gateway.event(first, 'refund.processed'),
+            self.gateway.event(second, 'payment.captured'),
+        ]:
+            self.deliver(delivery)
+
+        mark_captured = payments.mark_captured
+        calls = []
+
+        def flaky(payment, data):
+            calls.append(payment.transaction_id)
+            if len(calls) == 1:
+                raise RuntimeError('Gateway timeout')
+            return mark_captured(payment, data)
+
+        with mock.patch.object(payments, 'mark_captured', side_effect=flaky):
+            with self.assertLogs('api.services.payments', 'ERROR'):
+                self.work()
+
+            capture = PaymentWebhookEvent.objects.get(
+                transaction_id=first.transaction_id, event_type='payment.captured'
+            )
+            self.assertEqual((capture.status, capture.attempts), ('pending', 1))
+            self.assertGreater(capture.available_at, timezone.now())
+            # The refund waits behind the failed capture; other transactions do not
+            self.assertEqual(self.events(first)[1], ('refund.processed', 'pending'))
+            self.assertEqual(self.events(second), [('payment.captured', 'processed')])
+
+            # Once the backoff has passed, both apply in arrival order
+            PaymentWebhookEvent.objects.filter(pk=capture.pk).update(
+                available_at=timezone.now() - timedelta(seconds=1)
+            )
+            self.work()
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'refunded')
+        self.assertEqual(self.events(first), [
+            ('payment.captured', 'processed'),
+            ('refund.processed', 'processed'),
+        ])
+
+    def test_shuffled_replay_with_duplicates(self):
+        captured = [self.payment(n) for n in range(20)]
+        deliveries = [self.gateway.event(payment) for payment in captured]
+        deliveries += random.Random(1).sample(deliveries, 10)
+        random.Random(2).shuffle(deliveries)
+
+        statuses = [self.deliver(delivery) for delivery in deliveries]
+        self.assertEqual(statuses.count('queued'), 20)
+        self.assertEqual(statuses.count('duplicate'), 10)
+        self.work()
+
+        self.assertEqual(
+            set(Payment.objects.values_list('status', flat=True)), {'success'}
+        )
+        succeeded = OutboxEvent.objects.filter(topic='payment.succeeded')
+        self.assertEqual(
+            sorted(event.payload['transaction_id'] for event in succeeded),
+            sorted(payment.transaction_id for payment in captured)
+        )
+
+    def test_amount_mismatch_is_not_applied(self):
+        payment = self.payment(1)
+        body, _ = self.gateway.event(payment)
+        payload = json.loads(body)
+        payload['data']['amount'] = '1.00'
+        body = json.dumps(payload).encode()
+        self.deliver((body, {'HTTP_X_SIGNATURE': payments.sign(body)}))
+        self.work()
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+        self.assertEqual(self.events(payment), [('payment.captured', 'ignored')])
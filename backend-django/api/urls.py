@@ -46,6 +46,7 @@ POST   /ingredients/                - Create new ingredient
 GET    /ingredients/<id>/           - Get single ingredient
 PUT    /ingredients/<id>/           - Update ingredient
 DELETE /ingredients/<id>/           - Delete ingredient
+GET    /ingredients/forecast/       - Days until each ingredient runs out (?days=30)
 
 =============================================================================
 BANNER ENDPOINTS
@@ -74,7 +75,11 @@ GET    /inventory/<id>/             - Get single inventory item
 PUT    /inventory/<id>/             - Update inventory item
 DELETE /inventory/<id>/             - Delete inventory item
 POST   /inventory/<id>/adjust/      - Adjust stock level
+POST   /inventory/bulk-adjust/      - Bulk adjust stock (JSON or CSV upload)
+GET    /inventory/<id>/stock-at/    - Stock of one item at ?at= (datetime/date)
+GET    /inventory/stock-at/         - Stock of all items at ?at=
 GET    /inventory/stats/            - Get inventory statistics
+GET    /inventory/reorder-suggestions/ - Reorder recommendations (nightly)
 GET    /stock-movements/            - List all stock movements
 
 =============================================================================
@@ -96,6 +101,8 @@ POST   /orders/                     - Create new order
 GET    /orders/<id>/                - Get single order
 PUT    /orders/<id>/status/         - Update order status (Admin)
 GET    /orders/admin/               - List all orders (Admin)
+POST   /orders/admin/bulk-status/   - Update status for many orders (Admin)
+GET    /orders/admin/export/        - Stream orders as CSV/JSONL (Admin)
 
 =============================================================================
 ADDRESS ENDPOINTS
@@ -134,7 +141,7 @@ DELETE /reviews/<id>/               - Delete review
 =============================================================================
 CUSTOMER ENDPOINTS (Admin)
 =============================================================================
-GET    /customers/                  - List all customers (paginated)
+GET    /customers/                  - List all customers (paginated, ?segment=)
 GET    /customers/<id>/             - Get customer details
 GET    /customers/<id>/orders/      - Get customer orders
 PUT    /customers/<id>/status/      - Update customer status
@@ -143,9 +150,12 @@ PUT    /customers/<id>/status/      - Update customer status
 ANALYTICS ENDPOINTS (Admin)
 =============================================================================
 GET    /analytics/dashboard/        - Get dashboard stats
-GET    /analytics/sales/            - Get sales analytics
+GET    /analytics/sales/            - Sales series (?granularity=day|week|month&from=&to=)
 GET    /analytics/products/         - Get product analytics
 GET    /analytics/customers/        - Get customer analytics
+GET    /analytics/cohorts/          - Monthly cohort retention matrix
+GET    /analytics/margins/          - COGS and gross margin series (?granularity=&from=&to=)
+POST   /analytics/events/           - Record product views/cart adds (buffered)
 
 =============================================================================
 PAYMENT ENDPOINTS
@@ -153,14 +163,17 @@ PAYMENT ENDPOINTS
 GET    /payments/                   - List all payments (Admin)
 POST   /payments/initiate/          - Initiate payment
 POST   /payments/verify/            - Verify payment
+POST   /payments/webhook/           - Payment gateway webhook (signed)
 GET    /payments/<id>/              - Get payment details
 
 =============================================================================
 NOTIFICATION ENDPOINTS (Admin)
 =============================================================================
 GET    /notifications/              - List notifications
-POST   /notifications/broadcast/    - Send broadcast notification
+POST   /notifications/broadcast/    - Send broadcast notification (optionally to an RFM segment)
 PUT    /notifications/<id>/read/    - Mark as read
+PUT    /notifications/read_all/     - Mark all as read
+GET    /notifications/unread-count/ - Unread badge count
 
 =============================================================================
 SETTINGS ENDPOINTS (Admin)
@@ -193,7 +206,7 @@ from .views.cart_views import CartViewSet
 from .views.wishlist_views import WishlistViewSet
 from .views.review_views import ReviewViewSet
 from .views.customer_views import CustomerViewSet
-from .views.analytics_views import AnalyticsView
+from .views.analytics_views import AnalyticsView, ProductEventView
 from .views.payment_views import PaymentViewSet
 from .views.notification_views import NotificationViewSet
 from .views.settings_views import SettingsView
@@ -202,7 +215,7 @@ from .views.banner_views import (
     MarqueeSettingViewSet, ActiveMarqueeView
 )
 from .views.inventory_views import (
-    InventoryViewSet, InventoryStatsView, StockMovementViewSet
+    InventoryViewSet, StockMovementViewSet
 )
 from .views.asset_views import AssetViewSet, AssetStatsView
 
@@ -253,9 +266,6 @@ urlpatterns = [
     # ===== Marquee =====
     path('marquee/active/', ActiveMarqueeView.as_view(), name='active-marquee'),
     
-    # ===== Inventory (Admin) =====
-    path('inventory/stats/', InventoryStatsView.as_view(), name='inventory-stats'),
-    
     # ===== Assets (Admin) =====
     path('assets/stats/', AssetStatsView.as_view(), name='asset-stats'),
     
@@ -264,6 +274,8 @@ urlpatterns = [
     
     # ===== Admin Orders =====
     path('orders/admin/', AdminOrderViewSet.as_view({'get': 'list'}), name='admin-orders'),
+    path('orders/admin/bulk-status/', AdminOrderViewSet.as_view({'post': 'bulk_status'}), name='admin-orders-bulk-status'),
+    path('orders/admin/export/', AdminOrderViewSet.as_view({'get': 'export'}), name='admin-orders-export'),
     path('orders/<int:pk>/status/', AdminOrderViewSet.as_view({'put': 'update_status'}), name='order-status'),
     
     # ===== Analytics (Admin) =====
@@ -271,6 +283,9 @@ urlpatterns = [
     path('analytics/sales/', AnalyticsView.as_view(), name='analytics-sales'),
     path('analytics/products/', AnalyticsView.as_view(), name='analytics-products'),
     path('analytics/customers/', AnalyticsView.as_view(), name='analytics-customers'),
+    path('analytics/cohorts/', AnalyticsView.as_view(), name='analytics-cohorts'),
+    path('analytics/margins/', AnalyticsView.as_view(), name='analytics-margins'),
+    path('analytics/events/', ProductEventView.as_view(), name='analytics-events'),
     
     # ===== Settings (Admin) =====
     path('settings/', SettingsView.as_view(), name='settings'),
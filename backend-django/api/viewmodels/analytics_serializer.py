@@ -0,0 +1,26 @@
+"""
+Analytics Serializers
+"""
+from rest_framework import serializers
+
+
+class ProductEventSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=['view', 'cart_add', 'checkout'])
+    product_id = serializers.IntegerField(required=False, min_value=1)
+    fragrance_id = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, data):
+        targets = ('product_id' in data) + ('fragrance_id' in data)
+        if data['type'] == 'checkout':
+            if targets > 1:
+                raise serializers.ValidationError('Give at most one of product_id or fragrance_id')
+        elif targets != 1:
+            raise serializers.ValidationError('Give exactly one of product_id or fragrance_id')
+        return data
+
+
+class ProductEventBatchSerializer(serializers.Serializer):
+    """Events batched by the storefront (flushes on an interval or page hide)"""
+    events = ProductEventSerializer(many=True, allow_empty=False, max_length=500)
+    # Anonymous id the storefront keeps per browser, for unique visitors
+    visitor_id = serializers.CharField(max_length=64, required=False)
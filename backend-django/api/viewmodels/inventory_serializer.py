@@ -1,8 +1,9 @@
 """
 Inventory Serializers
 """
+from django.db.models import Prefetch
 from rest_framework import serializers
-from ..models import Inventory, StockMovement
+from ..models import FragranceImage, Inventory, ProductImage, StockMovement, ReorderSuggestion
 
 
 class StockMovementSerializer(serializers.ModelSerializer):
@@ -15,15 +16,51 @@ class StockMovementSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+RECENT_MOVEMENT_LIMIT = 10
+
+
+def _image_prefetches():
+    """Only the image shown per product: the cover, else the first"""
+    return [
+        Prefetch(
+            'fragrance__images',
+            queryset=FragranceImage.objects.order_by('-is_cover', 'order')[:1],
+            to_attr='display_images'
+        ),
+        Prefetch(
+            'product__images',
+            queryset=ProductImage.objects.order_by('-is_cover', 'order')[:1],
+            to_attr='display_images'
+        ),
+    ]
+
+
+def _product_name(obj):
+    if obj.fragrance:
+        return obj.fragrance.name
+    elif obj.product:
+        return obj.product.name
+    return 'Unknown'
+
+
+def _product_image(obj, cover_only=False):
+    owner = obj.fragrance or obj.product
+    if owner is None:
+        return None
+    images = getattr(owner, 'display_images', None)
+    if images is None:
+        images = owner.images.order_by('-is_cover', 'order')[:1]
+    image = next(iter(images), None)
+    if image is None or (cover_only and not image.is_cover):
+        return None
+    return image.image.url
+
+
 class InventorySerializer(serializers.ModelSerializer):
     product_name = serializers.SerializerMethodField()
     product_image = serializers.SerializerMethodField()
     stock_status = serializers.CharField(read_only=True)
-    recent_movements = StockMovementSerializer(
-        source='movements', 
-        many=True, 
-        read_only=True
-    )
+    recent_movements = serializers.SerializerMethodField()
 
     class Meta:
         model = Inventory
@@ -37,27 +74,28 @@ class InventorySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'stock_status', 'created_at', 'updated_at']
 
+    @staticmethod
+    def eager_load(queryset):
+        return queryset.select_related('fragrance', 'product').prefetch_related(
+            *_image_prefetches(),
+            Prefetch(
+                'movements',
+                queryset=StockMovement.objects.order_by('-created_at', '-id')[:RECENT_MOVEMENT_LIMIT],
+                to_attr='recent_movement_list'
+            )
+        )
+
     def get_product_name(self, obj):
-        if obj.fragrance:
-            return obj.fragrance.name
-        elif obj.product:
-            return obj.product.name
-        return 'Unknown'
+        return _product_name(obj)
 
     def get_product_image(self, obj):
-        if obj.fragrance:
-            cover = obj.fragrance.images.filter(is_cover=True).first()
-            if cover:
-                return cover.image.url
-            first = obj.fragrance.images.first()
-            return first.image.url if first else None
-        elif obj.product:
-            cover = obj.product.images.filter(is_cover=True).first()
-            if cover:
-                return cover.image.url
-            first = obj.product.images.first()
-            return first.image.url if first else None
-        return None
+        return _product_image(obj)
+
+    def get_recent_movements(self, obj):
+        movements = getattr(obj, 'recent_movement_list', None)
+        if movements is None:
+            movements = obj.movements.order_by('-created_at', '-id')[:RECENT_MOVEMENT_LIMIT]
+        return StockMovementSerializer(movements, many=True).data
 
 
 class InventoryListSerializer(serializers.ModelSerializer):
@@ -74,23 +112,15 @@ class InventoryListSerializer(serializers.ModelSerializer):
             'supplier_name', 'location', 'stock_status', 'last_restocked'
         ]
 
+    @staticmethod
+    def eager_load(queryset):
+        return queryset.select_related('fragrance', 'product').prefetch_related(*_image_prefetches())
+
     def get_product_name(self, obj):
-        if obj.fragrance:
-            return obj.fragrance.name
-        elif obj.product:
-            return obj.product.name
-        return 'Unknown'
+        return _product_name(obj)
 
     def get_product_image(self, obj):
-        if obj.fragrance:
-            cover = obj.fragrance.images.filter(is_cover=True).first()
-            if cover:
-                return cover.image.url
-        elif obj.product:
-            cover = obj.product.images.filter(is_cover=True).first()
-            if cover:
-                return cover.image.url
-        return None
+        return _product_image(obj, cover_only=True)
 
 
 class StockAdjustmentSerializer(serializers.Serializer):
@@ -98,3 +128,36 @@ class StockAdjustmentSerializer(serializers.Serializer):
     type = serializers.ChoiceField(choices=['in', 'out', 'adjustment'])
     quantity = serializers.IntegerField(min_value=1)
     reason = serializers.CharField(required=False, allow_blank=True)
+
+
+class BulkStockAdjustmentRowSerializer(serializers.Serializer):
+    """One row of a bulk adjustment; 'count' sets stock to the counted quantity"""
+    sku = serializers.CharField(max_length=50)
+    type = serializers.ChoiceField(choices=['in', 'out', 'adjustment', 'count'])
+    quantity = serializers.IntegerField(min_value=0)
+    reason = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, data):
+        if data['type'] != 'count' and data['quantity'] < 1:
+            raise serializers.ValidationError({'quantity': 'Must be at least 1'})
+        return data
+
+
+class BulkStockAdjustmentSerializer(serializers.Serializer):
+    """For applying many adjustments (JSON body or parsed CSV upload)"""
+    adjustments = BulkStockAdjustmentRowSerializer(many=True, allow_empty=False, max_length=20000)
+
+
+class ReorderSuggestionSerializer(serializers.ModelSerializer):
+    sku = serializers.CharField(source='inventory.sku', read_only=True)
+    size = serializers.CharField(source='inventory.size', read_only=True)
+    current_stock = serializers.IntegerField(source='inventory.current_stock', read_only=True)
+
+    class Meta:
+        model = ReorderSuggestion
+        fields = [
+            'inventory', 'sku', 'size', 'current_stock',
+            'avg_daily_sales', 'demand_std', 'safety_stock',
+            'reorder_point', 'suggested_quantity', 'days_of_cover',
+            'window_days', 'lead_time_days', 'computed_at'
+        ]
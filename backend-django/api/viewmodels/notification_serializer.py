@@ -2,10 +2,13 @@
 Notification Serializers (ViewModel)
 """
 from rest_framework import serializers
-from ..models import Notification
+from ..models import Notification, CustomerSegment
 
 
 class NotificationSerializer(serializers.ModelSerializer):
+    # Per-user read state when the queryset provides it (services.notifications)
+    is_read = serializers.SerializerMethodField()
+
     class Meta:
         model = Notification
         fields = [
@@ -14,8 +17,12 @@ class NotificationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
 
+    def get_is_read(self, obj):
+        return getattr(obj, 'read_state', obj.is_read)
+
 
 class BroadcastSerializer(serializers.Serializer):
     title = serializers.CharField(max_length=200)
     message = serializers.CharField()
     type = serializers.ChoiceField(choices=['promo', 'system'], default='promo')
+    segment = serializers.ChoiceField(choices=CustomerSegment.SEGMENT_CHOICES, required=False)
@@ -58,3 +58,13 @@ class OrderCreateSerializer(serializers.Serializer):
     address_id = serializers.IntegerField()
     payment_method = serializers.CharField(max_length=50)
     notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class BulkOrderStatusSerializer(serializers.Serializer):
+    """Serializer for bulk order status updates"""
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=5000
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
@@ -3,21 +3,34 @@ Analytics Views (Admin)
 """
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAdminUser
-from django.db.models import Sum, Count, Avg
-from django.db.models.functions import TruncMonth
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser, AllowAny
+from django.conf import settings
+from django.db.models import Count
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date
+from datetime import datetime, timedelta
 
-from ..models import Order, Product, User, Payment
+from ..models import Product, Fragrance, User
+from ..viewmodels import ProductEventBatchSerializer
+from ..services import analytics, cohorts, margins, memo, product_events
+
+
+# About ten years of daily points
+MAX_SALES_RANGE_DAYS = 3660
 
 
 class AnalyticsView(APIView):
     """
     GET /analytics/dashboard/ - Get dashboard stats
-    GET /analytics/sales/     - Get sales analytics
+    GET /analytics/sales/     - Sales time series (?granularity=day|week|month&from=&to=)
     GET /analytics/products/  - Get product analytics
     GET /analytics/customers/ - Get customer analytics
+    GET /analytics/cohorts/   - Monthly cohort retention (?from=YYYY-MM&to=YYYY-MM)
+    GET /analytics/margins/   - COGS and gross margin (?granularity=day|week|month&from=&to=)
+
+    Dashboard and product figures read the rollup_analytics tables for
+    closed days plus today's raw rows.
     """
     permission_classes = [IsAdminUser]
 
@@ -25,120 +38,135 @@ class AnalyticsView(APIView):
         path = request.path
         
         if 'sales' in path:
-            return self.get_sales_analytics()
+            return self.get_sales_analytics(request)
+        elif 'margins' in path:
+            return self.get_margin_analytics(request)
         elif 'products' in path:
             return self.get_product_analytics()
         elif 'customers' in path:
             return self.get_customer_analytics()
+        elif 'cohorts' in path:
+            return self.get_cohort_analytics(request)
         else:
             return self.get_dashboard_stats()
 
     def get_dashboard_stats(self):
-        today = timezone.now().date()
-        last_30_days = today - timedelta(days=30)
-        
-        # Order stats
-        total_orders = Order.objects.count()
-        pending_orders = Order.objects.filter(status='pending').count()
-        
-        # Revenue
-        total_revenue = Order.objects.filter(
-            payment_status='paid'
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        monthly_revenue = Order.objects.filter(
-            payment_status='paid',
-            created_at__date__gte=last_30_days
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        # Customers
-        total_customers = User.objects.filter(role='customer').count()
-        new_customers = User.objects.filter(
-            role='customer',
-            created_at__date__gte=last_30_days
-        ).count()
-        
-        # Products
-        total_products = Product.objects.filter(is_active=True).count()
-        low_stock = Product.objects.filter(
-            is_active=True,
-            stock_quantity__lte=10
-        ).count()
-        
+        # Many admins polling share one computation per TTL window
+        return Response(memo.memoize(
+            'analytics:dashboard',
+            analytics.dashboard,
+            ttl=settings.ANALYTICS_DASHBOARD_TTL,
+            stale_ttl=settings.ANALYTICS_DASHBOARD_STALE_TTL
+        ))
+
+    def parse_series_params(self, request):
+        """
+        ?granularity=day|week|month (default month)
+        &from=YYYY-MM-DD&to=YYYY-MM-DD (default the last 180 days)
+        Returns (granularity, from, to) or an error Response.
+        """
+        granularity = request.query_params.get('granularity', 'month')
+        if granularity not in analytics.GRANULARITIES:
+            return Response(
+                {'error': 'granularity must be day, week or month'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        bounds = {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    bounds[param] = parse_date(value)
+                except ValueError:
+                    bounds[param] = None
+                if bounds[param] is None:
+                    return Response(
+                        {'error': f'{param} must be YYYY-MM-DD'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+        date_to = bounds.get('to') or timezone.localdate()
+        date_from = bounds.get('from') or date_to - timedelta(days=180)
+        if date_from > date_to:
+            return Response({'error': 'from must not be after to'}, status=status.HTTP_400_BAD_REQUEST)
+        if (date_to - date_from).days > MAX_SALES_RANGE_DAYS:
+            return Response(
+                {'error': f'Range is limited to {MAX_SALES_RANGE_DAYS} days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return granularity, date_from, date_to
+
+    def get_sales_analytics(self, request):
+        params = self.parse_series_params(request)
+        if isinstance(params, Response):
+            return params
+        granularity, date_from, date_to = params
+
         return Response({
-            'orders': {
-                'total': total_orders,
-                'pending': pending_orders,
-            },
-            'revenue': {
-                'total': float(total_revenue),
-                'monthly': float(monthly_revenue),
-            },
-            'customers': {
-                'total': total_customers,
-                'new': new_customers,
-            },
-            'products': {
-                'total': total_products,
-                'low_stock': low_stock,
-            }
+            'granularity': granularity,
+            'from': date_from,
+            'to': date_to,
+            'series': analytics.sales_series(granularity, date_from, date_to),
         })
 
-    def get_sales_analytics(self):
-        # Monthly sales for last 6 months
-        six_months_ago = timezone.now() - timedelta(days=180)
-        
-        monthly_sales = Order.objects.filter(
-            payment_status='paid',
-            created_at__gte=six_months_ago
-        ).annotate(
-            month=TruncMonth('created_at')
-        ).values('month').annotate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        ).order_by('month')
-        
+    def get_margin_analytics(self, request):
+        """Revenue and COGS per period plus a per product/fragrance and size breakdown"""
+        params = self.parse_series_params(request)
+        if isinstance(params, Response):
+            return params
+        granularity, date_from, date_to = params
+
         return Response({
-            'monthly_sales': list(monthly_sales)
+            'granularity': granularity,
+            'from': date_from,
+            'to': date_to,
+            'series': margins.series(granularity, date_from, date_to),
+            'items': margins.breakdown(date_from, date_to),
         })
 
     def get_product_analytics(self):
-        # Top selling products
-        from ..models import OrderItem
-        
-        top_products = OrderItem.objects.values(
-            'product__name'
-        ).annotate(
-            total_sold=Sum('quantity'),
-            total_revenue=Sum('total_price')
-        ).order_by('-total_sold')[:10]
-        
+        # Top selling products and fragrances
+        sales = analytics.product_totals()
+        top = sorted(sales.items(), key=lambda item: item[1]['purchases'], reverse=True)[:10]
+        names = dict(Product.objects.filter(
+            pk__in=[product_id for (product_id, _), _ in top if product_id]
+        ).values_list('id', 'name'))
+        fragrance_names = dict(Fragrance.objects.filter(
+            pk__in=[fragrance_id for (_, fragrance_id), _ in top if fragrance_id]
+        ).values_list('id', 'name'))
+
+        top_products = [
+            {
+                'product__name': names.get(product_id) if product_id else fragrance_names.get(fragrance_id),
+                'total_sold': row['purchases'],
+                'total_revenue': row['revenue'],
+                'total_cogs': row['cogs'],
+                'gross_margin': row['costed_revenue'] - row['cogs'],
+                'views': row['views'],
+                'cart_adds': row['cart_adds'],
+                'conversion_rate': round(row['purchases'] / row['views'] * 100, 2) if row['views'] else None,
+            }
+            for (product_id, fragrance_id), row in top
+        ]
+
         # Category distribution
         category_stats = Product.objects.values(
             'category__name'
         ).annotate(
             count=Count('id')
         )
-        
+
         return Response({
-            'top_products': list(top_products),
+            'top_products': top_products,
             'category_distribution': list(category_stats)
         })
 
     def get_customer_analytics(self):
-        # Customer retention
+        # Customer retention, from the precomputed cohort table once built
         total = User.objects.filter(role='customer').count()
-        with_orders = User.objects.filter(
-            role='customer',
-            orders__isnull=False
-        ).distinct().count()
-        
-        repeat_customers = User.objects.filter(
-            role='customer'
-        ).annotate(
-            order_count=Count('orders')
-        ).filter(order_count__gte=2).count()
-        
+        with_orders, repeat_customers = cohorts.repeat_summary()
+
         return Response({
             'total_customers': total,
             'customers_with_orders': with_orders,
@@ -146,3 +174,56 @@ class AnalyticsView(APIView):
             'conversion_rate': round(with_orders / total * 100, 2) if total > 0 else 0,
             'retention_rate': round(repeat_customers / with_orders * 100, 2) if with_orders > 0 else 0
         })
+
+    def get_cohort_analytics(self, request):
+        bounds = {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    bounds[param] = datetime.strptime(value, '%Y-%m').date()
+                except ValueError:
+                    return Response(
+                        {'error': f'{param} must be YYYY-MM'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+        return Response({
+            'cohorts': cohorts.matrix(bounds.get('from'), bounds.get('to'))
+        })
+
+
+class ProductEventView(APIView):
+    """
+    POST /analytics/events/ - Record product views, cart adds and checkouts
+    {"visitor_id": "...", "events": [{"type": "view", "product_id": 1}, ...]}
+
+    Events are buffered in-process and written in aggregated batches.
+    When the buffer is full the request is refused with 503 and
+    Retry-After; partially accepted batches report how many were dropped.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def post(self, request):
+        serializer = ProductEventBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        events = [
+            (event['type'], event.get('product_id'), event.get('fragrance_id'))
+            for event in serializer.validated_data['events']
+        ]
+        visitor = serializer.validated_data.get('visitor_id') or '{}|{}'.format(
+            request.META.get('REMOTE_ADDR', ''), request.META.get('HTTP_USER_AGENT', '')
+        )
+        accepted = product_events.buffer.offer(events, visitor)
+        if not accepted:
+            return Response(
+                {'error': 'Event buffer is full, retry later'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '5'}
+            )
+        return Response(
+            {'accepted': accepted, 'dropped': len(events) - accepted},
+            status=status.HTTP_202_ACCEPTED
+        )
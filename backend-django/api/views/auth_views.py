@@ -5,12 +5,22 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
 
-from ..models import User, OTP
+from ..models import User
 from ..viewmodels import UserSerializer, UserCreateSerializer, OTPSerializer, LoginSerializer
+from ..services import otp, revocation, sms
+from ..authentication import VersionedRefreshToken
+
+
+def rate_limited(exc):
+    return Response(
+        {'error': 'Too many requests, retry later'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(exc.retry_after)}
+    )
 
 
 class RegisterView(APIView):
@@ -21,7 +31,7 @@ class RegisterView(APIView):
         serializer = UserCreateSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = VersionedRefreshToken.for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'tokens': {
@@ -33,38 +43,30 @@ class RegisterView(APIView):
 
 
 class SendOTPView(APIView):
-    """POST /auth/send-otp/ - Send OTP to phone"""
+    """POST /auth/send-otp/ - Send OTP to phone (rate limited per phone and IP)"""
     permission_classes = [AllowAny]
 
     def post(self, request):
         serializer = OTPSerializer(data=request.data)
         if serializer.is_valid():
             phone = serializer.validated_data['phone']
-            
-            # Delete existing OTPs
-            OTP.objects.filter(phone=phone).delete()
-            
-            # Generate new OTP
-            otp_code = OTP.generate_otp()
-            expires_at = timezone.now() + timedelta(minutes=10)
-            
-            OTP.objects.create(
-                phone=phone,
-                otp=otp_code,
-                expires_at=expires_at
-            )
-            
-            # TODO: Send OTP via SMS gateway
-            # For development, return OTP in response
-            return Response({
-                'message': 'OTP sent successfully',
-                'otp': otp_code  # Remove in production
-            })
+
+            try:
+                otp_code = otp.get_backend().issue(phone, ip=request.META.get('REMOTE_ADDR'))
+            except otp.OTPRateLimited as exc:
+                return rate_limited(exc)
+            sms.enqueue_otp(phone, otp_code)
+
+            data = {'message': 'OTP sent successfully'}
+            if settings.DEBUG:
+                # Development only, so the app works without an SMS gateway
+                data['otp'] = otp_code
+            return Response(data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class VerifyOTPView(APIView):
-    """POST /auth/verify-otp/ - Verify OTP"""
+    """POST /auth/verify-otp/ - Verify OTP (stays valid for login until it expires)"""
     permission_classes = [AllowAny]
 
     def post(self, request):
@@ -74,21 +76,15 @@ class VerifyOTPView(APIView):
             otp_code = serializer.validated_data['otp']
             
             try:
-                otp = OTP.objects.get(
-                    phone=phone,
-                    otp=otp_code,
-                    is_verified=False,
-                    expires_at__gt=timezone.now()
-                )
-                otp.is_verified = True
-                otp.save()
-                
-                return Response({'message': 'OTP verified successfully', 'verified': True})
-            except OTP.DoesNotExist:
-                return Response(
-                    {'error': 'Invalid or expired OTP'},
-                    status=status.HTTP_400_BAD_REQUEST
+                otp.get_backend().verify(
+                    phone, otp_code, ip=request.META.get('REMOTE_ADDR'), consume=False
                 )
+            except otp.OTPRateLimited as exc:
+                return rate_limited(exc)
+            except otp.OTPError as exc:
+                return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+            return Response({'message': 'OTP verified successfully', 'verified': True})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -102,18 +98,13 @@ class LoginView(APIView):
             phone = serializer.validated_data['phone']
             otp_code = serializer.validated_data['otp']
             
-            # Verify OTP
+            # Verify and use up the OTP
             try:
-                otp = OTP.objects.get(
-                    phone=phone,
-                    otp=otp_code,
-                    expires_at__gt=timezone.now()
-                )
-            except OTP.DoesNotExist:
-                return Response(
-                    {'error': 'Invalid or expired OTP'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+                otp.get_backend().verify(phone, otp_code, ip=request.META.get('REMOTE_ADDR'))
+            except otp.OTPRateLimited as exc:
+                return rate_limited(exc)
+            except otp.OTPError as exc:
+                return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
             
             # Get or create user
             user, created = User.objects.get_or_create(phone=phone)
@@ -121,11 +112,8 @@ class LoginView(APIView):
             user.last_login_at = timezone.now()
             user.save()
             
-            # Delete used OTP
-            otp.delete()
-            
             # Generate tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = VersionedRefreshToken.for_user(user)
             
             return Response({
                 'user': UserSerializer(user).data,
@@ -139,18 +127,27 @@ class LoginView(APIView):
 
 
 class LogoutView(APIView):
-    """POST /auth/logout/ - Logout user"""
+    """
+    POST /auth/logout/ - Logout user
+    Revokes the access token used and the given refresh token;
+    {"all_devices": true} revokes every token issued to the user.
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        try:
-            refresh_token = request.data.get('refresh')
-            if refresh_token:
-                token = RefreshToken(refresh_token)
-                token.blacklist()
-            return Response({'message': 'Logged out successfully'})
-        except Exception:
-            return Response({'message': 'Logged out'})
+        if request.data.get('all_devices'):
+            revocation.revoke_all(request.user)
+            return Response({'message': 'Logged out of all devices'})
+
+        revocation.revoke(request.auth)
+        refresh_token = request.data.get('refresh')
+        if refresh_token:
+            try:
+                VersionedRefreshToken(refresh_token).blacklist()
+            except TokenError:
+                # Already invalid, expired or revoked
+                pass
+        return Response({'message': 'Logged out successfully'})
 
 
 class ProfileView(APIView):
@@ -7,14 +7,15 @@ from rest_framework.permissions import IsAdminUser
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.exceptions import ValidationError
 
-from ..models import User, Order
+from ..models import User, Order, CustomerSegment
 from ..viewmodels import UserSerializer, OrderListSerializer
 
 
 class CustomerViewSet(viewsets.ModelViewSet):
     """
-    GET    /customers/              - List all customers
+    GET    /customers/              - List all customers (?segment=champions)
     GET    /customers/<id>/         - Get customer details
     GET    /customers/<id>/orders/  - Get customer orders
     PUT    /customers/<id>/status/  - Update customer status
@@ -28,6 +29,15 @@ class CustomerViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'full_name']
     ordering = ['-created_at']
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        segment = self.request.query_params.get('segment')
+        if segment:
+            if segment not in dict(CustomerSegment.SEGMENT_CHOICES):
+                raise ValidationError({'segment': f'Unknown segment: {segment}'})
+            queryset = queryset.filter(segment__segment=segment)
+        return queryset
+
     @action(detail=True, methods=['get'])
     def orders(self, request, pk=None):
         """GET /customers/<id>/orders/ - Get customer orders"""
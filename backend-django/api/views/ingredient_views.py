@@ -1,13 +1,16 @@
 """
 Ingredient Views (Admin)
 """
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 
 from ..models import Ingredient
 from ..viewmodels import IngredientSerializer
+from ..services import bom
 
 
 class IngredientViewSet(viewsets.ModelViewSet):
@@ -17,6 +20,7 @@ class IngredientViewSet(viewsets.ModelViewSet):
     POST   /ingredients/           - Create ingredient
     PUT    /ingredients/<id>/      - Update ingredient
     DELETE /ingredients/<id>/      - Delete ingredient
+    GET    /ingredients/forecast/  - Days until each ingredient runs out
     """
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -26,3 +30,15 @@ class IngredientViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'origin', 'description']
     ordering_fields = ['name', 'category', 'cost_per_unit', 'stock_quantity']
     ordering = ['category', 'name']
+
+    @action(detail=False, methods=['get'])
+    def forecast(self, request):
+        """Project ingredient run-out from recent order demand (?days=30)"""
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= 365:
+            return Response({'error': 'days must be between 1 and 365'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'days': days, 'ingredients': bom.forecast(days)})
@@ -2,22 +2,45 @@
 Inventory Views (Admin)
 """
 from rest_framework import viewsets, status
-from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Sum, Count
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time
+import csv
+import io
 
-from ..models import Inventory, StockMovement
+from ..models import Inventory, StockMovement, ReorderSuggestion
 from ..viewmodels import (
     InventorySerializer, 
     InventoryListSerializer,
     StockMovementSerializer,
-    StockAdjustmentSerializer
+    StockAdjustmentSerializer,
+    BulkStockAdjustmentSerializer,
+    ReorderSuggestionSerializer
 )
+from ..services import inventory_rollups
+from ..services.stock import adjust_stock, bulk_adjust as apply_bulk_adjustments
+from ..services import stock_ledger
+
+
+def parse_point_in_time(value):
+    """ISO datetime, or a plain date meaning the end of that (local) day"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        moment = datetime.combine(day, time.max)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
 
 
 class InventoryViewSet(viewsets.ModelViewSet):
@@ -28,6 +51,11 @@ class InventoryViewSet(viewsets.ModelViewSet):
     PUT    /inventory/<id>/               - Update inventory item
     DELETE /inventory/<id>/               - Delete inventory item
     POST   /inventory/<id>/adjust/        - Adjust stock level
+    POST   /inventory/bulk-adjust/        - Apply many adjustments (JSON or CSV)
+    GET    /inventory/<id>/stock-at/?at=  - Stock of one item at a point in time
+    GET    /inventory/stock-at/?at=       - Stock of all items at a point in time
+    GET    /inventory/reorder-suggestions/ - Precomputed reorder recommendations
+    GET    /inventory/stats/              - Inventory statistics
     """
     queryset = Inventory.objects.all()
     permission_classes = [IsAdminUser]
@@ -42,6 +70,46 @@ class InventoryViewSet(viewsets.ModelViewSet):
             return InventoryListSerializer
         return InventorySerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Fixed query count per page/item: related rows, one display
+            # image and the last few movements are fetched in bulk
+            queryset = self.get_serializer_class().eager_load(queryset)
+        return queryset
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            inventory = serializer.save()
+            if inventory.current_stock:
+                self._record_direct_change(inventory, inventory.current_stock, 'Initial stock')
+            inventory_rollups.record_change(None, inventory_rollups.state(inventory))
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            before = inventory_rollups.state(serializer.instance)
+            inventory = serializer.save()
+            change = inventory.current_stock - before['current_stock']
+            if change:
+                self._record_direct_change(inventory, change, 'Stock edited')
+            inventory_rollups.record_change(before, inventory_rollups.state(inventory))
+
+    def _record_direct_change(self, inventory, quantity, reason):
+        """Keep the ledger complete when stock is set outside adjust"""
+        StockMovement.objects.create(
+            inventory=inventory,
+            type='adjustment',
+            quantity=quantity,
+            reason=reason,
+            performed_by=self.request.user.username or 'Admin'
+        )
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            before = inventory_rollups.state(instance)
+            instance.delete()
+            inventory_rollups.record_change(before, None)
+
     @action(detail=True, methods=['post'])
     def adjust(self, request, pk=None):
         """Adjust stock levels with movement tracking"""
@@ -50,57 +118,113 @@ class InventoryViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
 
         data = serializer.validated_data
-        movement_type = data['type']
-        quantity = data['quantity']
-        reason = data.get('reason', '')
-
-        # Calculate new stock
-        if movement_type == 'out':
-            new_stock = max(0, inventory.current_stock - quantity)
-        else:
-            new_stock = inventory.current_stock + quantity
-
-        # Update inventory
-        inventory.current_stock = new_stock
-        if movement_type == 'in':
-            inventory.last_restocked = timezone.now()
-        inventory.save()
-
-        # Record movement
-        StockMovement.objects.create(
-            inventory=inventory,
-            type=movement_type,
-            quantity=quantity if movement_type != 'out' else -quantity,
-            reason=reason,
+        inventory = adjust_stock(
+            inventory.pk,
+            data['type'],
+            data['quantity'],
+            reason=data.get('reason', ''),
             performed_by=request.user.username or 'Admin'
         )
 
         return Response(InventorySerializer(inventory).data)
 
+    @action(detail=True, methods=['get'], url_path='stock-at')
+    def stock_at(self, request, pk=None):
+        """Reconstruct this item's stock at ?at= from checkpoints + movements"""
+        inventory = self.get_object()
+        at = parse_point_in_time(request.query_params.get('at'))
+        if at is None:
+            return Response(
+                {'error': 'at must be an ISO datetime or YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        stock, checkpoint_at = stock_ledger.stock_at(at, [inventory.pk])[inventory.pk]
+        return Response({
+            'id': inventory.pk,
+            'sku': inventory.sku,
+            'at': at,
+            'stock': stock,
+            'checkpoint_at': checkpoint_at,
+        })
 
-class InventoryStatsView(APIView):
-    """GET /inventory/stats/ - Get inventory statistics"""
-    permission_classes = [IsAdminUser]
-
-    def get(self, request):
-        inventory = Inventory.objects.all()
-        
-        total_units = inventory.aggregate(Sum('current_stock'))['current_stock__sum'] or 0
-        total_value = sum(
-            item.current_stock * float(item.cost_per_unit) 
-            for item in inventory
+    @action(detail=False, methods=['get'], url_path='stock-at')
+    def stock_at_all(self, request):
+        """Stock of every (filtered, paginated) item at ?at="""
+        at = parse_point_in_time(request.query_params.get('at'))
+        if at is None:
+            return Response(
+                {'error': 'at must be an ISO datetime or YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()).only('id', 'sku')
         )
-        low_stock = inventory.filter(current_stock__lte=models.F('reorder_level')).count()
-        out_of_stock = inventory.filter(current_stock=0).count()
+        levels = stock_ledger.stock_at(at, [item.pk for item in page])
+        return self.get_paginated_response([
+            {'id': item.pk, 'sku': item.sku, 'stock': levels[item.pk][0]}
+            for item in page
+        ])
+
+    @action(detail=False, methods=['get'], url_path='reorder-suggestions')
+    def reorder_suggestions(self, request):
+        """
+        Served from the nightly compute_reorder_suggestions table.
+        ?needs_reorder=true limits to items at or below their reorder point.
+        """
+        suggestions = ReorderSuggestion.objects.select_related('inventory')
+        if request.query_params.get('needs_reorder') == 'true':
+            suggestions = suggestions.filter(suggested_quantity__gt=0)
+        suggestions = suggestions.order_by('days_of_cover', 'inventory_id')
+
+        page = self.paginate_queryset(suggestions)
+        return self.get_paginated_response(ReorderSuggestionSerializer(page, many=True).data)
+
+    @action(detail=False, methods=['get'], url_path='stats')
+    def stats(self, request):
+        """Served from the maintained per-location/per-size rollups"""
+        totals, breakdown = inventory_rollups.summary()
 
         return Response({
-            'total_units': total_units,
-            'total_value': total_value,
-            'low_stock_count': low_stock,
-            'out_of_stock_count': out_of_stock,
-            'total_items': inventory.count()
+            'total_units': totals['total_units'],
+            'total_value': float(totals['total_value']),
+            'low_stock_count': totals['low_stock_count'],
+            'out_of_stock_count': totals['out_of_stock_count'],
+            'total_items': totals['item_count'],
+            'by_location': breakdown['location'],
+            'by_size': breakdown['size'],
         })
 
+    @action(detail=False, methods=['post'], url_path='bulk-adjust')
+    def bulk_adjust(self, request):
+        """
+        Apply many adjustments in one transaction.
+        Accepts {"adjustments": [...]} or a CSV upload in `file`
+        with columns sku,type,quantity,reason.
+        """
+        upload = request.FILES.get('file')
+        if upload:
+            try:
+                text = upload.read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                return Response(
+                    {'error': 'CSV must be UTF-8'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            data = {'adjustments': list(csv.DictReader(io.StringIO(text)))}
+        else:
+            data = request.data
+
+        serializer = BulkStockAdjustmentSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+
+        result = apply_bulk_adjustments(
+            serializer.validated_data['adjustments'],
+            performed_by=request.user.username or 'Admin'
+        )
+        return Response(result)
+
 
 class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
     """
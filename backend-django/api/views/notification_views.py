@@ -1,60 +1,101 @@
 """
 Notification Views
 """
+import json
+
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import action
+from django.db import connection
 
 from ..models import Notification, User
+from ..services import notifications
 from ..viewmodels import NotificationSerializer, BroadcastSerializer
 
 
+SEGMENT_NOTIFICATIONS_SQL = """
+    INSERT INTO notifications (user_id, type, title, message, is_read, is_broadcast, metadata, created_at)
+    SELECT s.user_id, %(type)s, %(title)s, %(message)s, FALSE, FALSE, %(metadata)s, NOW()
+    FROM customer_segments s
+    WHERE s.segment = %(segment)s
+    RETURNING user_id
+"""
+
+
 class NotificationViewSet(viewsets.ModelViewSet):
     """
     GET    /notifications/           - List notifications
-    POST   /notifications/broadcast/ - Send broadcast (Admin)
+    POST   /notifications/broadcast/ - Send broadcast (Admin, optionally to one segment)
     PUT    /notifications/<id>/read/ - Mark as read
+    PUT    /notifications/read_all/  - Mark all as read
+    GET    /notifications/unread-count/ - Unread badge count
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        # Get user-specific + broadcast notifications
-        return Notification.objects.filter(
-            user=user
-        ) | Notification.objects.filter(
-            is_broadcast=True
-        )
+        # User-specific + broadcast notifications, with this user's read state
+        return notifications.visible(user)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(notifications.Inbox(request.user))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
 
     @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
     def broadcast(self, request):
-        """POST /notifications/broadcast/ - Send to all users"""
+        """
+        POST /notifications/broadcast/ - Send to all users, or with
+        "segment" to each customer currently in that RFM segment
+        """
         serializer = BroadcastSerializer(data=request.data)
-        if serializer.is_valid():
-            notification = Notification.objects.create(
-                type=serializer.validated_data['type'],
-                title=serializer.validated_data['title'],
-                message=serializer.validated_data['message'],
-                is_broadcast=True
-            )
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        if data.get('segment'):
+            # One row per recipient, inserted set-based from the segment table
+            with connection.cursor() as cursor:
+                cursor.execute(SEGMENT_NOTIFICATIONS_SQL, {
+                    'type': data['type'],
+                    'title': data['title'],
+                    'message': data['message'],
+                    'metadata': json.dumps({'segment': data['segment']}),
+                    'segment': data['segment'],
+                })
+                user_ids = [row[0] for row in cursor.fetchall()]
+            notifications.recipients_added(user_ids)
             return Response(
-                NotificationSerializer(notification).data,
+                {'segment': data['segment'], 'recipients': len(user_ids)},
                 status=status.HTTP_201_CREATED
             )
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        notification = Notification.objects.create(
+            type=data['type'],
+            title=data['title'],
+            message=data['message'],
+            is_broadcast=True
+        )
+        return Response(
+            NotificationSerializer(notification).data,
+            status=status.HTTP_201_CREATED
+        )
 
     @action(detail=True, methods=['put'])
     def read(self, request, pk=None):
         """PUT /notifications/<id>/read/ - Mark as read"""
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        notifications.mark_read(request.user, notification)
         return Response(NotificationSerializer(notification).data)
 
     @action(detail=False, methods=['put'])
     def read_all(self, request):
         """PUT /notifications/read_all/ - Mark all as read"""
-        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        notifications.mark_all_read(request.user)
         return Response({'message': 'All notifications marked as read'})
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """GET /notifications/unread-count/ - Unread badge count, served from the cache when warm"""
+        return Response({'unread': notifications.unread_count(request.user)})
@@ -6,11 +6,18 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import action
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 import uuid
 
 from ..models import Order, OrderItem, Cart, Address
-from ..viewmodels import OrderSerializer, OrderListSerializer
+from ..viewmodels import OrderSerializer, OrderListSerializer, BulkOrderStatusSerializer
+from ..services.order_export import iter_order_rows, EXPORT_FORMATS
+from ..services.outbox import publish, publish_order_status
+from ..services.margins import snapshot_costs
+from ..services.orders import bulk_transition
 
 
 class OrderViewSet(viewsets.ModelViewSet):
@@ -64,39 +71,47 @@ class OrderViewSet(viewsets.ModelViewSet):
         tax = subtotal * 0.18
         total = subtotal + shipping + tax
 
-        # Create order
-        order = Order.objects.create(
-            order_number=f"ORD-{uuid.uuid4().hex[:8].upper()}",
-            user=request.user,
-            shipping_name=address.full_name,
-            shipping_phone=address.phone,
-            shipping_address=address.full_address,
-            shipping_city=address.city,
-            shipping_state=address.state,
-            shipping_pincode=address.pincode,
-            subtotal=subtotal,
-            shipping_amount=shipping,
-            tax_amount=tax,
-            total_amount=total,
-            payment_method=payment_method,
-            notes=notes
-        )
-
-        # Create order items
-        for item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                product_name=item.product.name,
-                product_sku=item.product.sku,
-                quantity=item.quantity,
-                unit_price=item.unit_price,
-                total_price=item.total_price,
-                size=item.size
+        # Create order, items and outbox event in one transaction
+        with transaction.atomic():
+            order = Order.objects.create(
+                order_number=f"ORD-{uuid.uuid4().hex[:8].upper()}",
+                user=request.user,
+                shipping_name=address.full_name,
+                shipping_phone=address.phone,
+                shipping_address=address.full_address,
+                shipping_city=address.city,
+                shipping_state=address.state,
+                shipping_pincode=address.pincode,
+                subtotal=subtotal,
+                shipping_amount=shipping,
+                tax_amount=tax,
+                total_amount=total,
+                payment_method=payment_method,
+                notes=notes
             )
 
-        # Clear cart
-        cart.items.all().delete()
+            # Create order items
+            for item in cart.items.all():
+                OrderItem.objects.create(
+                    order=order,
+                    product=item.product,
+                    product_name=item.product.name,
+                    product_sku=item.product.sku,
+                    quantity=item.quantity,
+                    unit_price=item.unit_price,
+                    total_price=item.total_price,
+                    size=item.size
+                )
+            snapshot_costs([order.pk])
+
+            # Clear cart
+            cart.items.all().delete()
+
+            publish('order.created', {
+                'order_id': order.pk,
+                'order_number': order.order_number,
+                'user_id': order.user_id,
+            })
 
         serializer = OrderSerializer(order)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -104,8 +119,10 @@ class OrderViewSet(viewsets.ModelViewSet):
 
 class AdminOrderViewSet(viewsets.ModelViewSet):
     """
-    GET /orders/admin/          - List all orders
-    PUT /orders/<id>/status/    - Update order status
+    GET  /orders/admin/             - List all orders
+    PUT  /orders/<id>/status/       - Update order status
+    POST /orders/admin/bulk-status/ - Update status for many orders
+    GET  /orders/admin/export/      - Stream orders as CSV/JSONL
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
@@ -126,10 +143,80 @@ class AdminOrderViewSet(viewsets.ModelViewSet):
                 {'error': 'Invalid status'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        if new_status == order.status:
+            return Response(OrderSerializer(order).data)
+
+        if not Order.can_transition(order.status, new_status):
+            return Response(
+                {'error': f'Cannot change status from {order.status} to {new_status}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
+        from_status = order.status
         order.status = new_status
         if new_status == 'delivered':
             order.delivered_at = timezone.now()
-        order.save()
+        with transaction.atomic():
+            order.save()
+            publish_order_status(order, from_status)
         
         return Response(OrderSerializer(order).data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    def bulk_status(self, request):
+        """POST /orders/admin/bulk-status/ - Apply one status to many orders"""
+        serializer = BulkOrderStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        new_status = serializer.validated_data['status']
+        results = bulk_transition(
+            serializer.validated_data['order_ids'],
+            new_status
+        )
+
+        return Response({
+            'status': new_status,
+            'updated': sum(1 for r in results if r['outcome'] == 'updated'),
+            'results': results
+        })
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        GET /orders/admin/export/?output=csv|jsonl&from=YYYY-MM-DD&to=YYYY-MM-DD&status=a,b
+        One row per order item, streamed straight from a server-side cursor.
+        """
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {'error': 'output must be csv or jsonl'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dates = {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            try:
+                dates[param] = parse_date(value) if value else None
+            except ValueError:
+                dates[param] = None
+            if value and dates[param] is None:
+                return Response(
+                    {'error': f'{param} must be YYYY-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        statuses = [s for s in request.query_params.get('status', '').split(',') if s]
+        if any(s not in dict(Order.STATUS_CHOICES) for s in statuses):
+            return Response(
+                {'error': 'Invalid status'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        writer, content_type = EXPORT_FORMATS[output]
+        chunks = iter_order_rows(dates['from'], dates['to'], statuses)
+        response = StreamingHttpResponse(writer(chunks), content_type=content_type)
+        filename = f"orders-{timezone.localdate():%Y%m%d}.{output}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -3,12 +3,16 @@ Payment Views
 """
 from rest_framework import viewsets, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.decorators import action
+from django.conf import settings
+from django.db import transaction
+import json
 import uuid
 
 from ..models import Payment, Order
 from ..viewmodels import PaymentSerializer
+from ..services.payments import confirm_order, verify_signature, ingest
 
 
 class PaymentViewSet(viewsets.ModelViewSet):
@@ -16,11 +20,14 @@ class PaymentViewSet(viewsets.ModelViewSet):
     GET    /payments/           - List all payments (Admin)
     POST   /payments/initiate/  - Initiate payment
     POST   /payments/verify/    - Verify payment
+    POST   /payments/webhook/   - Gateway webhook receiver
     GET    /payments/<id>/      - Get payment details
     """
     serializer_class = PaymentSerializer
     
     def get_permissions(self):
+        if self.action == 'webhook':
+            return [AllowAny()]
         if self.action in ['list', 'retrieve']:
             return [IsAdminUser()]
         return [IsAuthenticated()]
@@ -44,23 +51,22 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Create payment record
-        payment = Payment.objects.create(
-            transaction_id=f"TXN-{uuid.uuid4().hex[:12].upper()}",
-            order=order,
-            user=request.user,
-            amount=order.total_amount,
-            method=method,
-            status='pending'
-        )
-        
-        # For COD, mark as success immediately
-        if method == 'cod':
-            payment.status = 'success'
-            payment.save()
-            order.payment_status = 'paid'
-            order.status = 'confirmed'
-            order.save()
+        with transaction.atomic():
+            # Create payment record
+            payment = Payment.objects.create(
+                transaction_id=f"TXN-{uuid.uuid4().hex[:12].upper()}",
+                order=order,
+                user=request.user,
+                amount=order.total_amount,
+                method=method,
+                status='pending'
+            )
+            
+            # For COD, mark as success immediately
+            if method == 'cod':
+                payment.status = 'success'
+                payment.save()
+                confirm_order(payment)
         
         return Response(PaymentSerializer(payment).data)
 
@@ -81,15 +87,43 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # TODO: Verify with actual payment gateway
-        # For now, just mark as success
-        payment.status = 'success'
-        payment.gateway_response = gateway_response
-        payment.save()
-        
-        # Update order
-        payment.order.payment_status = 'paid'
-        payment.order.status = 'confirmed'
-        payment.order.save()
+        # With webhooks configured the gateway's event is the source of
+        # truth; the client's response is only recorded
+        if settings.PAYMENT_WEBHOOK_SECRET:
+            payment.gateway_response = gateway_response
+            payment.save(update_fields=['gateway_response', 'updated_at'])
+            return Response(PaymentSerializer(payment).data)
+
+        # Development without a gateway: mark as success directly
+        with transaction.atomic():
+            payment.status = 'success'
+            payment.gateway_response = gateway_response
+            payment.save()
+            confirm_order(payment)
         
         return Response(PaymentSerializer(payment).data)
+
+    @action(detail=False, methods=['post'], authentication_classes=[])
+    def webhook(self, request):
+        """
+        POST /payments/webhook/ - Gateway webhook receiver
+        Verifies the signature, queues the event and answers immediately;
+        run_payment_webhook_worker applies it.
+        """
+        body = request.body
+        if not verify_signature(body, request.META.get('HTTP_X_SIGNATURE', '')):
+            return Response(
+                {'error': 'Invalid signature'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        try:
+            event, created = ingest(json.loads(body))
+        except (ValueError, AttributeError) as exc:
+            return Response(
+                {'error': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({'status': 'queued' if created else 'duplicate'})
+
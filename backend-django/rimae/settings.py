@@ -90,7 +90,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -109,8 +109,76 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
+    # Rotated refresh tokens go on the api.services.revocation denylist
+    'BLACKLIST_AFTER_ROTATION': True,
+    'AUTH_TOKEN_CLASSES': ('api.authentication.VersionedAccessToken',),
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.VersionedTokenRefreshSerializer',
 }
 
+# Authenticated users are cached this long (seconds) per token version
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '60'))
+# How often each process checks the shared revocation counter, and the
+# longest it keeps its denylist without reloading it
+AUTH_DENYLIST_SYNC_SECONDS = float(os.getenv('AUTH_DENYLIST_SYNC_SECONDS', '5'))
+AUTH_DENYLIST_REFRESH_SECONDS = float(os.getenv('AUTH_DENYLIST_REFRESH_SECONDS', '60'))
+
+# Payment gateway webhooks (HMAC-SHA256 of the raw body, hex, in X-Signature).
+# When unset, /payments/verify/ keeps confirming payments directly (development).
+PAYMENT_WEBHOOK_SECRET = os.getenv('PAYMENT_WEBHOOK_SECRET', '')
+
+# Product event ingestion (per-process buffer, flushed in batches)
+ANALYTICS_EVENT_QUEUE_SIZE = int(os.getenv('ANALYTICS_EVENT_QUEUE_SIZE', '50000'))
+ANALYTICS_EVENT_BATCH_SIZE = int(os.getenv('ANALYTICS_EVENT_BATCH_SIZE', '5000'))
+ANALYTICS_EVENT_FLUSH_SECONDS = float(os.getenv('ANALYTICS_EVENT_FLUSH_SECONDS', '5'))
+
+# Admin dashboard stats: fresh for TTL seconds, then served stale while one
+# request refreshes them in the background for up to STALE_TTL more seconds
+ANALYTICS_DASHBOARD_TTL = int(os.getenv('ANALYTICS_DASHBOARD_TTL', '30'))
+ANALYTICS_DASHBOARD_STALE_TTL = int(os.getenv('ANALYTICS_DASHBOARD_STALE_TTL', '300'))
+
+# Cache - per-process memory by default. Set REDIS_URL (needs the redis
+# package) to share OTPs, rate limits and memoized stats across workers.
+REDIS_URL = os.getenv('REDIS_URL', '')
+CACHES = {
+    'default': (
+        {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+        if REDIS_URL else
+        {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    ),
+}
+
+# Cached unread-notification badges are recounted from the database at least
+# this often (seconds). Without a shared cache this is also how long a web
+# process can miss notifications created by the outbox worker.
+NOTIFICATION_COUNTER_TTL = int(os.getenv('NOTIFICATION_COUNTER_TTL') or ('600' if REDIS_URL else '30'))
+
+
+def _token_bucket(name, default):
+    """'burst/seconds': up to `burst` requests, one more every `seconds`"""
+    capacity, refill_seconds = os.getenv(name, default).split('/')
+    return int(capacity), float(refill_seconds)
+
+
+# OTP codes (api.services.otp)
+OTP_BACKEND = os.getenv('OTP_BACKEND', 'api.services.otp.CacheOTPBackend')
+OTP_CACHE_ALIAS = os.getenv('OTP_CACHE_ALIAS', 'default')
+OTP_TTL_SECONDS = int(os.getenv('OTP_TTL_SECONDS', '600'))
+OTP_MAX_ATTEMPTS = int(os.getenv('OTP_MAX_ATTEMPTS', '5'))
+OTP_SEND_LIMIT_PER_PHONE = _token_bucket('OTP_SEND_LIMIT_PER_PHONE', '3/60')
+OTP_SEND_LIMIT_PER_IP = _token_bucket('OTP_SEND_LIMIT_PER_IP', '20/30')
+OTP_VERIFY_LIMIT_PER_IP = _token_bucket('OTP_VERIFY_LIMIT_PER_IP', '30/10')
+# Also record issued/verified codes (not the codes themselves) in the otps table
+OTP_AUDIT = os.getenv('OTP_AUDIT', 'False') == 'True'
+
+# Outbound SMS (api.services.sms). The fake provider only records messages
+# and is allowed with DEBUG only; the SMS worker refuses to start without a
+# real provider otherwise.
+SMS_PROVIDER = os.getenv('SMS_PROVIDER', 'api.services.sms.FakeSmsProvider' if DEBUG else '')
+SMS_GATEWAY_URL = os.getenv('SMS_GATEWAY_URL', '')
+SMS_GATEWAY_API_KEY = os.getenv('SMS_GATEWAY_API_KEY', '')
+SMS_GATEWAY_TIMEOUT = float(os.getenv('SMS_GATEWAY_TIMEOUT', '10'))
+SMS_SENDER_ID = os.getenv('SMS_SENDER_ID', 'RIMAE')
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:5173',
@@ -361,7 +361,20 @@ export const adminAPI = {
   // Analytics
   analytics: {
     dashboard: () => request<DashboardStats>('/analytics/dashboard/'),
-    sales: () => request<SalesAnalytics>('/analytics/sales/'),
+    sales: (params?: SalesAnalyticsParams) => {
+      const searchParams = new URLSearchParams();
+      if (params?.granularity) searchParams.set('granularity', params.granularity);
+      if (params?.from) searchParams.set('from', params.from);
+      if (params?.to) searchParams.set('to', params.to);
+      return request<SalesAnalytics>(`/analytics/sales/?${searchParams}`);
+    },
+    margins: (params?: SalesAnalyticsParams) => {
+      const searchParams = new URLSearchParams();
+      if (params?.granularity) searchParams.set('granularity', params.granularity);
+      if (params?.from) searchParams.set('from', params.from);
+      if (params?.to) searchParams.set('to', params.to);
+      return request<MarginAnalytics>(`/analytics/margins/?${searchParams}`);
+    },
     products: () => request<ProductAnalytics>('/analytics/products/'),
     customers: () => request<CustomerAnalytics>('/analytics/customers/'),
   },
@@ -789,14 +802,61 @@ export interface DashboardStats {
   revenue: { total: number; monthly: number };
   customers: { total: number; new: number };
   products: { total: number; low_stock: number };
+  visitors: { last_30_days: number };
+  active_users: { today: number; last_30_days: number };
+}
+
+export interface SalesAnalyticsParams {
+  granularity?: 'day' | 'week' | 'month';
+  from?: string;
+  to?: string;
 }
 
 export interface SalesAnalytics {
-  monthly_sales: { month: string; total: number; count: number }[];
+  granularity: 'day' | 'week' | 'month';
+  from: string;
+  to: string;
+  series: {
+    period: string;
+    orders: number;
+    revenue: number;
+    avg_order_value: number;
+    refunds: number;
+    refunded_amount: number;
+  }[];
+}
+
+export interface MarginFigures {
+  revenue: number;
+  cogs: number;
+  gross_margin: number;
+  margin_percent: number | null;
+  uncosted_revenue: number;
+}
+
+export interface MarginAnalytics {
+  granularity: 'day' | 'week' | 'month';
+  from: string;
+  to: string;
+  series: ({ period: string } & MarginFigures)[];
+  items: ({
+    product_id: number | null;
+    fragrance_id: number | null;
+    sku: string;
+    name: string;
+    size: string;
+    quantity: number;
+  } & MarginFigures)[];
 }
 
 export interface ProductAnalytics {
-  top_products: { product__name: string; total_sold: number; total_revenue: number }[];
+  top_products: {
+    product__name: string;
+    total_sold: number;
+    total_revenue: number;
+    total_cogs: number;
+    gross_margin: number;
+  }[];
   category_distribution: { category__name: string; count: number }[];
 }
 